@@ -0,0 +1,506 @@
+"""Vectorized backtest of the live strategies over historical bars.
+
+Usage:
+    python backtest.py data/EURUSD_M5.csv data/USDJPY_M1.parquet ...
+    python backtest.py data/            # every CSV/Parquet file named after a security
+    python backtest.py data/USDCAD_H1.csv data/USDCAD_M15.csv   # H1 bars plus M15 bars for the correlations
+
+The columns a strategy declares are computed once per symbol with compute_window_columns(), which
+reproduces the live window values, and the live strategy rules are evaluated over
+whole histories as boolean arrays. Decisions are modelled on the live scheduler's timing:
+a strategy is evaluated bar_close_delay after a bar closes, when the window holds the
+closed bars plus the next bar forming on its first tick. Row i of the columns is that
+decision, at the open of bar i (see opening_bars()), so entries fill at bar i's open and
+are stamped, counted per day and cooled down at its time. Only the sparse candidate
+entries are then walked in time order to apply cooldown, max_trades_per_day,
+max_open_positions, the correlation filter, the margin and exposure limits and
+SL/TP/time-limit exits.
+
+The correlation filter is the live one: a RollingCorrelation over correlation_window
+correlation_timeframe bars, resampled from each symbol's own bars or loaded from a second
+file where its timeframe is coarser (see correlation_bars()), takes in every bar closed
+by the entry and blocks it at |rho| >= max_correlation with an open position, with the
+static correlated_pairs until it has enough bars.
+
+Lots are sized by the live RiskEngine.lot_size() from the equity (starting equity plus
+the profit of the trades closed so far) and the mid prices of the backtested symbols at
+the entry, on standard-lot specs (default_spec()), and an entry is only taken when the
+engine's can_add(), holding the backtest's open positions, allows it, as the live loop
+requires: max_margin_per_trade, max_margin_usage and max_currency_exposure apply, and a
+margin currency none of the symbols converts to the account currency blocks the entry.
+Profit is in the account currency at the entry's rates; it is NaN, and left out of the
+equity, when the quote currency cannot be converted.
+"""
+import argparse
+import heapq
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from bars import RATES_DTYPE, timeframe_seconds
+from config import (
+    securities, cooldown_seconds, max_trades_per_day, max_open_positions, leverage,
+    max_trade_duration, max_margin_per_trade, margin_per_trade_equity, max_margin_usage,
+    max_currency_exposure, correlated_pairs, correlation_timeframe, correlation_window, max_correlation,
+)
+from correlation import RollingCorrelation, align_closes
+from indicators import IndicatorEngine, compute_window_columns
+from orders import SymbolSpec
+from risk import RiskEngine
+from signals import BUY, SELL, DEFAULT_PARAMS, STRATEGIES, pip_size
+
+
+def load_bars(path):
+    """Load OHLC bars from a CSV or Parquet file into an MT5 rates array."""
+    frame = pd.read_parquet(path) if path.endswith(".parquet") else pd.read_csv(path)
+    frame.columns = [column.lower() for column in frame.columns]
+    if not pd.api.types.is_numeric_dtype(frame['time']):
+        frame['time'] = pd.to_datetime(frame['time']).astype('int64') // 10**9
+    rates = np.zeros(len(frame), dtype=RATES_DTYPE)
+    for name in RATES_DTYPE.names:
+        if name in frame.columns:
+            rates[name] = frame[name].to_numpy()
+    return rates
+
+
+def load_data(paths):
+    """({symbol: rates}, {symbol: correlation rates}) from bar files, or directories of them, named after securities.
+
+    A security has one file on the timeframe it trades in config.securities and, when that
+    timeframe does not divide correlation_timeframe (H1 against M15), a second one on
+    correlation_timeframe for the correlation filter. Raises ValueError on a duplicate
+    file, a median bar spacing that is neither, or missing correlation bars.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += [os.path.join(path, name) for name in sorted(os.listdir(path))
+                      if name.endswith((".csv", ".parquet"))]
+        else:
+            files.append(path)
+    correlation_seconds = timeframe_seconds(correlation_timeframe)
+    data = {}
+    correlation_data = {}
+    sources = {}
+    for path in files:
+        symbol = symbol_for_path(path)
+        if symbol is None:
+            print(f"Skipping {path}: no security matches the file name")
+            continue
+        rates = load_bars(path)
+        expected = timeframe_seconds(securities[symbol]["timeframe"])
+        spacing = bar_spacing(rates)
+        if spacing is None or spacing == expected:
+            target, kind = data, "bars"
+        elif spacing == correlation_seconds:
+            target, kind = correlation_data, "correlation bars"
+        else:
+            raise ValueError(f"{path}: bars are {spacing}s apart, but {symbol} trades {expected}s bars "
+                             f"and correlates on {correlation_seconds}s bars")
+        if symbol in target:
+            raise ValueError(f"{path} and {sources[symbol, kind]} are both {symbol} {kind}; pass one file of each")
+        target[symbol], sources[symbol, kind] = rates, path
+        print(f"Loaded {len(rates)} {kind} for {symbol} from {path}")
+    for symbol in list(correlation_data):
+        if symbol not in data:
+            print(f"Skipping {sources[symbol, 'correlation bars']}: no {symbol} bars to backtest")
+            del correlation_data[symbol]
+    for symbol in data:
+        bar_seconds = timeframe_seconds(securities[symbol]["timeframe"])
+        if correlation_seconds % bar_seconds and symbol not in correlation_data:
+            raise ValueError(f"{symbol} trades {bar_seconds}s bars, which do not make {correlation_seconds}s "
+                             f"correlation bars; add a {symbol} file of {correlation_seconds}s bars")
+    return data, correlation_data
+
+
+def bar_spacing(rates):
+    """Median seconds between consecutive bars (gaps such as weekends do not move it), or None below two bars."""
+    if len(rates) < 2:
+        return None
+    return int(np.median(np.diff(rates['time'].astype(np.int64))))
+
+
+def symbol_for_path(path):
+    """The security a data file belongs to, from a file name such as EURUSD_M5.csv."""
+    stem = os.path.basename(path).upper()
+    for symbol in securities:
+        if stem.startswith(symbol):
+            return symbol
+    return None
+
+
+def default_point(symbol):
+    """Price of one spread point on a 5-digit (3-digit JPY) broker."""
+    return 0.001 if "JPY" in symbol else 0.00001
+
+
+def default_spec(symbol, point):
+    """Standard-lot spec of a security: 100000 units of its base currency, margin in the base currency."""
+    return SymbolSpec(symbol, 3 if "JPY" in symbol else 5, point, 0.01, 100.0, 0.01, 0.0, 0,
+                      100000.0, symbol[:3], symbol[3:6], symbol[:3])
+
+
+def risk_engine(prepared, account_currency):
+    """The live RiskEngine over the specs of the backtested symbols."""
+    specs = [symbol_data["spec"] for symbol_data in prepared.values()]
+    return RiskEngine(specs, account_currency, leverage, max_open_positions, max_margin_per_trade,
+                      margin_per_trade_equity, max_margin_usage, max_currency_exposure)
+
+
+def mark_prices(risk, prepared, event_time):
+    """Give the risk engine every symbol's mid price at the open of its latest bar opened by `event_time`."""
+    for symbol, symbol_data in prepared.items():
+        bars = symbol_data["bars"]
+        k = int(np.searchsorted(bars['time'], event_time, side='right')) - 1
+        if k >= 0:
+            mid = bars['open'][k] + bars['spread'][k] * symbol_data["point"] / 2
+            risk.update_price(symbol, mid, mid)
+
+
+def opening_bars(rates):
+    """Each bar as the live loop sees it when it starts forming: one tick, every price at the open."""
+    forming = rates.copy()
+    for name in ('high', 'low', 'close'):
+        forming[name] = rates['open']
+    return forming
+
+
+def decision_columns(rates, strategy):
+    """The strategy's columns for a decision at the open of every bar (closed bars plus the one-tick forming bar)."""
+    return compute_window_columns(rates, strategy.lookback, strategy.indicators, opening_bars(rates))
+
+
+def correlation_bars(symbol, rates, correlation_rates=None):
+    """The symbol's closes on correlation_timeframe bars, as {"time", "close"} arrays.
+
+    These are `correlation_rates` when given (bars loaded on correlation_timeframe), else
+    resampled from the symbol's own bars, whose timeframe must then divide correlation_timeframe:
+    each correlation bar closes at the last of its bars. A coarser timeframe would leave
+    flat closes (zero returns) where the live RollingCorrelation sees real bars, so it
+    raises ValueError instead.
+    """
+    if correlation_rates is not None:
+        return {"time": correlation_rates['time'].astype(np.int64), "close": correlation_rates['close'].astype(float)}
+    seconds = timeframe_seconds(correlation_timeframe)
+    bar_seconds = timeframe_seconds(securities[symbol]["timeframe"])
+    if seconds % bar_seconds:
+        raise ValueError(f"{symbol} trades {bar_seconds}s bars, which do not make {seconds}s correlation bars")
+    times = rates['time'].astype(np.int64) // seconds * seconds  # Correlation bar each bar falls in
+    last = np.flatnonzero(np.append(times[1:] != times[:-1], True))
+    return {"time": times[last], "close": rates['close'][last].astype(float)}
+
+
+def correlation_history(prepared):
+    """(close times, matrices): the live RollingCorrelation after each correlation bar of the prepared symbols.
+
+    Symbols are in `prepared` order; a matrix is NaN until the rolling window has enough bars.
+    Computed once, so simulate() only looks up the last bar closed before an entry.
+    """
+    symbols = list(prepared)
+    times, closes = align_closes({symbol: prepared[symbol]["correlation"] for symbol in symbols}, symbols, -1)
+    correlations = RollingCorrelation(symbols, correlation_window)
+    matrices = np.full((len(times), len(symbols), len(symbols)), np.nan)
+    for k, (bar_time, row) in enumerate(zip(times, closes)):
+        correlations.update_closes(bar_time, row)
+        if correlations.ready:
+            matrices[k] = correlations.correlation()
+    return np.array(times, dtype=np.int64) + timeframe_seconds(correlation_timeframe), matrices
+
+
+def prepare_symbol(symbol, rates, point, server_offset, columns=None, correlation_rates=None):
+    """Everything about a symbol's history that does not depend on the strategy parameters."""
+    strategy = STRATEGIES[securities[symbol]["strategy"]]
+    if columns is None:
+        columns = decision_columns(rates, strategy)
+    bars = {name: np.ascontiguousarray(rates[name]) for name in ('time', 'open', 'high', 'low', 'close', 'spread')}
+    hours = ((bars['time'] - server_offset) // 3600) % 24
+    return {
+        "bars": bars,
+        "columns": columns,
+        "ask": bars['open'] + bars['spread'] * point,  # Live rules compare against tick.ask at the decision
+        "active": np.isin(hours, list(securities[symbol]["active_hours"])),
+        "warm": np.arange(len(bars['time'])) >= strategy.lookback - 1,
+        "point": point,
+        "spec": default_spec(symbol, point),
+        "correlation": correlation_bars(symbol, rates, correlation_rates),
+    }
+
+
+def entry_candidates(symbol, prepared, params=DEFAULT_PARAMS):
+    """Bars at whose open the symbol's strategy fires, as (bar index, side) arrays."""
+    columns = prepared["columns"]
+    strategy = STRATEGIES[securities[symbol]["strategy"]]
+    buy, sell = strategy.entries(columns, prepared["ask"], prepared["active"], params)
+    tradable = prepared["warm"]
+    if strategy.volatility_filter:
+        tradable = tradable & ~(columns['atr'] < params["min_atr"])
+    buy = np.asarray(buy, dtype=bool) & tradable
+    sell = np.asarray(sell, dtype=bool) & tradable & ~buy
+    index = np.flatnonzero(buy | sell)
+    sides = np.where(buy[index], BUY, SELL)
+    return index, sides
+
+
+def simulate_exit(bars, entry, side, sl, tp, point):
+    """First SL/TP touch from the entry bar on (entries fill at its open), or the max_trade_duration close.
+
+    SL wins ties.
+
+    `bars` holds contiguous time/high/low/close/spread arrays for the symbol.
+    """
+    times = bars['time']
+    horizon = int(np.searchsorted(times, times[entry] + max_trade_duration, side='right'))
+    window = slice(entry, horizon)
+    if side == BUY:  # Long positions close on the bid
+        sl_hit = bars['low'][window] <= sl
+        tp_hit = bars['high'][window] >= tp
+    else:  # Short positions close on the ask
+        spread = bars['spread'][window] * point
+        sl_hit = bars['high'][window] + spread >= sl
+        tp_hit = bars['low'][window] + spread <= tp
+    hit = sl_hit | tp_hit
+    if hit.any():
+        k = int(np.argmax(hit))
+        if sl_hit[k]:
+            return entry + k, sl, "sl"
+        return entry + k, tp, "tp"
+    last = horizon - 1
+    exit_price = bars['close'][last] + (0 if side == BUY else bars['spread'][last] * point)
+    return last, exit_price, "time" if horizon < len(times) else "open"
+
+
+def prepare(data, points=None, server_offset=0, correlation_data=None):
+    """prepare_symbol() for every security in `data` ({symbol: rates}), with load_data()'s correlation bars."""
+    points = points or {}
+    correlation_data = correlation_data or {}
+    return {symbol: prepare_symbol(symbol, rates, points.get(symbol, default_point(symbol)), server_offset,
+                                   correlation_rates=correlation_data.get(symbol))
+            for symbol, rates in data.items()}
+
+
+def run_backtest(data, points=None, server_offset=0, params=DEFAULT_PARAMS, equity=10000.0, account_currency="USD",
+                 correlation_data=None):
+    """Backtest every security in `data` ({symbol: rates}) as one portfolio; returns a trades DataFrame."""
+    prepared = prepare(data, points, server_offset, correlation_data)
+    return simulate(prepared, server_offset, params, equity=equity, account_currency=account_currency)
+
+
+def simulate(prepared, server_offset=0, params=DEFAULT_PARAMS, start=None, end=None, candidates=entry_candidates,
+             equity=10000.0, account_currency="USD", correlation=None, risk=None, blocked=None):
+    """Walk the entries of prepare_symbol() outputs as one portfolio; entries are limited to [start, end).
+
+    `candidates` computes a symbol's entries; the optimizer passes a memoized entry_candidates
+    and correlation_history() computed once. `equity` is the starting equity in `account_currency`.
+    `risk` replaces the risk_engine() with the configured limits, and `blocked`, a list, gets
+    (entry time, symbol, reason) for every entry the risk limits refused.
+    """
+    events = []
+    order = {symbol: n for n, symbol in enumerate(securities)}
+    for symbol, symbol_data in prepared.items():
+        index, sides = candidates(symbol, symbol_data, params)
+        times = symbol_data["bars"]['time'][index]
+        keep = np.ones(len(index), dtype=bool)
+        if start is not None:
+            keep &= times >= start
+        if end is not None:
+            keep &= times < end
+        index, sides, times = index[keep], sides[keep], times[keep]
+        events.extend(zip(times.tolist(), [order[symbol]] * len(index), [symbol] * len(index),
+                          index.tolist(), sides.tolist()))
+    events.sort()
+
+    trades = []
+    open_exits = []  # Heap of (exit time, ticket, symbol, profit) for open positions
+    risk = risk_engine(prepared, account_currency) if risk is None else risk
+    correlation_closed_at, matrices = correlation_history(prepared) if correlation is None else correlation
+    column = {symbol: j for j, symbol in enumerate(prepared)}
+    last_trade_times = {symbol: -np.inf for symbol in prepared}
+    daily_trade_counts = {}
+    for event_time, _, symbol, i, side in events:
+        while open_exits and open_exits[0][0] <= event_time:
+            _, ticket, _, profit = heapq.heappop(open_exits)
+            risk.close(ticket)
+            equity += profit
+        if len(open_exits) >= max_open_positions:
+            continue
+        day = (symbol, (event_time - server_offset) // 86400)
+        if daily_trade_counts.get(day, 0) >= max_trades_per_day:
+            continue
+        if event_time - last_trade_times[symbol] < cooldown_seconds:
+            continue
+        k = int(np.searchsorted(correlation_closed_at, event_time, side='right')) - 1  # Last correlation bar closed
+        if k >= 0 and not np.isnan(matrices[k, 0, 0]):
+            rho = matrices[k, column[symbol]]
+            if any(open_symbol != symbol and abs(rho[column[open_symbol]]) >= max_correlation
+                   for _, _, open_symbol, _ in open_exits):
+                continue
+        elif any(open_symbol in correlated_pairs.get(symbol, ()) for _, _, open_symbol, _ in open_exits):
+            continue
+
+        symbol_data = prepared[symbol]
+        bars, point = symbol_data["bars"], symbol_data["point"]
+        strategy = STRATEGIES[securities[symbol]["strategy"]]
+        latest = {name: values[i] for name, values in symbol_data["columns"].items()}
+        price = symbol_data["ask"][i]
+        mark_prices(risk, prepared, event_time)
+        lot = risk.lot_size(symbol, equity)
+        # The margin and currency exposure limits, checked against the positions still open as live
+        allowed, why = risk.can_add(symbol, side, lot, price, equity)
+        if not allowed:
+            if blocked is not None:
+                blocked.append((event_time, symbol, why))
+            continue
+        sl, tp = strategy.stop_levels(latest, price, side, pip_size(symbol), params["rrr"])
+        fill = price if side == BUY else bars['open'][i]  # Sells fill on the bid
+        exit_index, exit_price, reason = simulate_exit(bars, i, side, sl, tp, point)
+        exit_time = int(bars['time'][exit_index])
+        direction = 1 if side == BUY else -1
+        quote_rate = risk.rates[risk.quote[risk.index[symbol]]]
+        profit = direction * (exit_price - fill) * lot * symbol_data["spec"].contract_size * quote_rate
+        ticket = len(trades)
+        risk.open(ticket, symbol, side, lot, fill)
+        heapq.heappush(open_exits, (exit_time, ticket, symbol, profit if np.isfinite(profit) else 0.0))
+        last_trade_times[symbol] = event_time
+        daily_trade_counts[day] = daily_trade_counts.get(day, 0) + 1
+        trades.append({
+            "symbol": symbol,
+            "strategy": strategy.name,
+            "side": "buy" if side == BUY else "sell",
+            "entry_time": pd.Timestamp(event_time, unit='s'),
+            "entry": fill,
+            "sl": sl,
+            "tp": tp,
+            "lot": lot,
+            "exit_time": pd.Timestamp(exit_time, unit='s'),
+            "exit": exit_price,
+            "reason": reason,
+            "pips": direction * (exit_price - fill) / pip_size(symbol),
+            "profit": profit,  # In the account currency
+        })
+    return pd.DataFrame(trades)
+
+
+def summarize(trades):
+    """Per-symbol trade count, win rate, pips and profit factor."""
+    if trades.empty:
+        return trades
+    grouped = trades.groupby("symbol")
+    summary = pd.DataFrame({
+        "strategy": grouped["strategy"].first(),
+        "trades": grouped.size(),
+        "win_rate": grouped["pips"].apply(lambda pips: (pips > 0).mean()),
+        "pips": grouped["pips"].sum(),
+        "profit": grouped["profit"].sum(),
+        "profit_factor": grouped["profit"].apply(
+            lambda profit: profit[profit > 0].sum() / -profit[profit < 0].sum() if (profit < 0).any() else np.inf),
+    })
+    return summary
+
+
+def verify_against_engine(symbol, rates, point, server_offset, samples=200, seed=0):
+    """Re-evaluate sampled decisions with the live IndicatorEngine and strategy rule; returns the mismatch count.
+
+    Each sample is rebuilt as the live loop sees it: the engine seeded with the closed bars
+    and latest() on the next bar at its first tick.
+    """
+    config = securities[symbol]
+    strategy = STRATEGIES[config["strategy"]]
+    window = strategy.lookback
+    forming = opening_bars(rates)
+    columns = decision_columns(rates, strategy)
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(np.arange(window - 1, len(rates)), size=min(samples, len(rates) - window + 1), replace=False)
+    mismatches = 0
+    for i in picks:
+        engine = IndicatorEngine(window, strategy.indicators)
+        engine.seed(rates[i - window + 1:i])
+        latest = engine.latest(forming[i])
+        price = forming['close'][i] + forming['spread'][i] * point
+        active = ((int(rates['time'][i]) - server_offset) // 3600) % 24 in config["active_hours"]
+        live = strategy.entries(latest, price, active)
+        vectorized = strategy.entries({name: column[i] for name, column in columns.items()}, price, active)
+        if bool(live[0]) != bool(vectorized[0]) or bool(live[1]) != bool(vectorized[1]):
+            mismatches += 1
+            print(f"Decision mismatch for {symbol} at bar {i}: live={live}, backtest={vectorized}")
+    return mismatches
+
+
+def verify_exposure_limit(prepared, server_offset, equity, account_currency):
+    """Re-run the backtest with max_currency_exposure just above and just below the first trade's own exposure;
+    below it the entry must be refused for that currency's exposure, above it taken. Returns the mismatch count."""
+    trades = simulate(prepared, server_offset, equity=equity, account_currency=account_currency)
+    if trades.empty:
+        print("Exposure limit: no trade to check")
+        return 0
+    first = trades.iloc[0]
+    symbol, entry_time = first["symbol"], int(first["entry_time"].timestamp())
+    risk = risk_engine(prepared, account_currency)
+    mark_prices(risk, prepared, entry_time)
+    risk.total_margin()  # Brings the conversion rates up to the marked prices
+    i = risk.index[symbol]
+    amount = first["lot"] * risk.contract_size[i]
+    exposure = max(amount * risk.rates[risk.base[i]], amount * first["entry"] * risk.rates[risk.quote[i]])
+    mismatches = 0
+    for factor, taken in ((1.01, True), (0.99, False)):
+        risk = risk_engine(prepared, account_currency)
+        risk.max_currency_exposure = exposure * factor / equity
+        blocked = []
+        limited = simulate(prepared, server_offset, equity=equity, account_currency=account_currency,
+                           risk=risk, blocked=blocked)
+        found = not limited.empty and limited.iloc[0]["entry_time"] == first["entry_time"] \
+            and limited.iloc[0]["symbol"] == symbol
+        reasons = [why for blocked_time, blocked_symbol, why in blocked
+                   if blocked_time == entry_time and blocked_symbol == symbol]
+        if found != taken or (not taken and not (reasons and reasons[0].endswith("exposure"))):
+            mismatches += 1
+            print(f"Exposure limit at {factor:g}x the first {symbol} trade's exposure: "
+                  f"taken={found}, expected {taken}, blocked for {reasons or 'nothing'}")
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="CSV/Parquet bar files, or directories of them")
+    parser.add_argument("--point", action="append", default=[], metavar="SYMBOL=POINT",
+                        help="spread point size, default 0.001 for JPY pairs and 0.00001 otherwise")
+    parser.add_argument("--server-offset-hours", type=float, default=0.0,
+                        help="bar timestamps minus UTC, for active_hours")
+    parser.add_argument("--verify", type=int, default=0, metavar="N",
+                        help="also check N sampled decisions per symbol against the live indicator engine, "
+                             "and that the exposure limit refuses an entry")
+    parser.add_argument("--equity", type=float, default=10000.0, help="starting equity, for the lot sizes")
+    parser.add_argument("--account-currency", default="USD", help="currency of the equity and profit")
+    parser.add_argument("--trades", help="write the trade list to this CSV")
+    args = parser.parse_args()
+
+    try:
+        data, correlation_data = load_data(args.paths)
+    except ValueError as error:
+        parser.error(str(error))
+    points = {symbol: float(value) for symbol, value in (item.split("=") for item in args.point)}
+    server_offset = int(args.server_offset_hours * 3600)
+
+    start = time.perf_counter()
+    prepared = prepare(data, points, server_offset, correlation_data)
+    trades = simulate(prepared, server_offset, equity=args.equity, account_currency=args.account_currency)
+    elapsed = time.perf_counter() - start
+    bars = sum(len(rates) for rates in data.values())
+    print(f"Backtested {bars} bars over {len(data)} symbols in {elapsed:.2f}s: {len(trades)} trades")
+    if not trades.empty:
+        print(summarize(trades).to_string())
+    if args.trades:
+        trades.to_csv(args.trades, index=False)
+
+    if args.verify:
+        for symbol, rates in data.items():
+            point = points.get(symbol, default_point(symbol))
+            mismatches = verify_against_engine(symbol, rates, point, server_offset, args.verify)
+            print(f"Verified {symbol}: {mismatches} decision mismatches over {args.verify} sampled decisions")
+        mismatches = verify_exposure_limit(prepared, server_offset, args.equity, args.account_currency)
+        print(f"Verified the exposure limit on the first trade: {mismatches} mismatches")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import time
+
+import numpy as np
+
+from indicators import WINDOW
+
+# Layout of the structured arrays returned by mt5.copy_rates_*
+RATES_DTYPE = np.dtype([
+    ('time', '<i8'), ('open', '<f8'), ('high', '<f8'), ('low', '<f8'), ('close', '<f8'),
+    ('tick_volume', '<u8'), ('spread', '<i4'), ('real_volume', '<u8'),
+])
+PRICE_FIELDS = ['open', 'high', 'low', 'close']
+
+
+def timeframe_seconds(timeframe):
+    """Bar length in seconds for an mt5.TIMEFRAME_* constant."""
+    if timeframe & 0xC000 == 0xC000:  # Monthly
+        return 30 * 24 * 3600 * (timeframe & 0x3FFF)
+    if timeframe & 0x8000:  # Weekly
+        return 7 * 24 * 3600 * (timeframe & 0x3FFF)
+    if timeframe & 0x4000:  # Hours (D1 is 24 hours)
+        return 3600 * (timeframe & 0x3FFF)
+    return 60 * timeframe
+
+
+class BarCache:
+    """Local OHLC store for one (symbol, timeframe), refreshed with delta fetches.
+
+    Bars live in a preallocated ring of `capacity` slots. Every bar is written twice,
+    at slot i and i + capacity, so the newest n bars are always a contiguous view.
+    The last bar is the forming one and is overwritten in place on each refresh.
+    """
+
+    def __init__(self, terminal, symbol, timeframe, capacity=WINDOW, clock=time):
+        self.terminal = terminal
+        self.clock = clock  # Anything with monotonic(); replays pass their simulated clock
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.capacity = capacity
+        self.bar_seconds = timeframe_seconds(timeframe)
+        self.buffer = np.zeros(2 * capacity, dtype=RATES_DTYPE)
+        self.size = 0
+        self.head = 0  # Next slot to write
+        self.generation = 0  # Bumped on every full resync
+        self._refreshed_at = None
+        self.calls = 0
+        self.hits = 0
+        self.bars_fetched = 0
+        self.bytes_copied = 0
+        self.gaps = 0
+        self.resyncs = 0
+
+    def last(self, count):
+        """The newest `count` bars (oldest first) as a view; the final row is the forming bar."""
+        count = min(count, self.size)
+        end = self.head + self.capacity
+        return self.buffer[end - count:end]
+
+    @property
+    def forming(self):
+        return self.buffer[self.head + self.capacity - 1]
+
+    def _write(self, slot, bar):
+        self.buffer[slot] = bar
+        self.buffer[slot + self.capacity] = bar
+
+    def _append(self, bar):
+        self._write(self.head, bar)
+        self.head = (self.head + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def _fetch(self, count):
+        rates = self.terminal.copy_rates_from_pos(self.symbol, self.timeframe, 0, count)
+        self.calls += 1
+        if rates is not None:
+            self.bars_fetched += len(rates)
+            self.bytes_copied += rates.nbytes
+        return rates
+
+    def resync(self):
+        """Drop the cache and reload the full window from the terminal."""
+        rates = self._fetch(self.capacity)
+        self.resyncs += 1
+        self.generation += 1
+        self.size = 0
+        self.head = 0
+        if rates is None or len(rates) == 0:
+            return False
+        for bar in rates:
+            self._append(bar)
+        self._refreshed_at = self.clock.monotonic()
+        return True
+
+    def refresh(self):
+        """Bring the cache up to date, fetching only bars from the cached forming bar onwards."""
+        if self.size == 0:
+            return self.resync()
+
+        # Enough bars to cover what can have opened since the last refresh, plus the forming bar
+        elapsed = self.clock.monotonic() - self._refreshed_at
+        count = min(int(elapsed // self.bar_seconds) + 2, self.capacity)
+        forming_time = int(self.forming['time'])
+        while True:
+            rates = self._fetch(count)
+            if rates is None or len(rates) == 0:
+                return False
+            if int(rates[0]['time']) <= forming_time:
+                break
+            if count >= self.capacity:
+                # Gap longer than the whole window
+                self.gaps += 1
+                return self.resync()
+            count = min(count * 2, self.capacity)
+        self._refreshed_at = self.clock.monotonic()
+
+        times = rates['time']
+        if int(times[-1]) < forming_time:
+            return self.resync()  # Terminal history went backwards
+        overlap = int(np.searchsorted(times, forming_time, side='right'))
+        if overlap == 0 or int(times[overlap - 1]) != forming_time:
+            self.gaps += 1
+            return self.resync()
+        if overlap > 1:
+            # Closed bars we already hold must not have changed
+            cached = self.last(overlap)[:-1]
+            fetched = rates[:overlap - 1]
+            if (not np.array_equal(cached['time'], fetched['time'])
+                    or any(not np.array_equal(cached[f], fetched[f]) for f in PRICE_FIELDS)):
+                return self.resync()
+
+        self._write((self.head - 1) % self.capacity, rates[overlap - 1])
+        if overlap == len(rates):
+            self.hits += 1
+        for bar in rates[overlap:]:
+            self._append(bar)
+        return True
+
+    def stats(self):
+        return {
+            "calls": self.calls,
+            "hits": self.hits,
+            "bars_fetched": self.bars_fetched,
+            "bytes_copied": self.bytes_copied,
+            "gaps": self.gaps,
+            "resyncs": self.resyncs,
+        }
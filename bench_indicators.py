@@ -0,0 +1,199 @@
+"""Parity check and per-loop CPU benchmark: IndicatorEngine vs the full ta recompute.
+
+Also checks that every registered strategy's reduced engine (only the indicators it
+declares) matches the full engine, and reports its per-bar cost.
+
+Usage:
+    python bench_indicators.py                      # synthetic random-walk bars
+    python bench_indicators.py --csv EURUSD_M5.csv  # recorded MT5 rates (time,open,high,low,close,...)
+"""
+import argparse
+import math
+import time
+
+import numpy as np
+
+from bars import RATES_DTYPE
+from indicators import WINDOW, IndicatorEngine, compute_indicators, compute_window_columns, latest_from_frame
+from signals import STRATEGIES
+
+
+def synthetic_rates(count, start_price=1.1, seed=7):
+    """Random-walk M1 bars shaped like copy_rates_from_pos output."""
+    rng = np.random.default_rng(seed)
+    rates = np.zeros(count, dtype=RATES_DTYPE)
+    closes = start_price + np.cumsum(rng.normal(0, 0.0002, count))
+    opens = np.concatenate(([start_price], closes[:-1]))
+    wick = np.abs(rng.normal(0, 0.0001, (2, count)))
+    rates['time'] = 1_700_000_000 + 60 * np.arange(count)
+    rates['open'] = opens
+    rates['close'] = closes
+    rates['high'] = np.maximum(opens, closes) + wick[0]
+    rates['low'] = np.minimum(opens, closes) - wick[1]
+    rates['tick_volume'] = rng.integers(1, 500, count)
+    return rates
+
+
+def load_rates(path):
+    """Load recorded bars from a CSV with MT5 rates column names."""
+    raw = np.genfromtxt(path, delimiter=',', names=True)
+    rates = np.zeros(len(raw), dtype=RATES_DTYPE)
+    for name in RATES_DTYPE.names:
+        if name in raw.dtype.names:
+            rates[name] = raw[name]
+    return rates
+
+
+def forming_variants(bar):
+    """The final state of a bar plus a mid-bar state, as two ticks of the forming bar would show it."""
+    mid = bar.copy()
+    mid['close'] = (bar['open'] + bar['close']) / 2
+    mid['high'] = max(bar['open'], mid['close'])
+    mid['low'] = min(bar['open'], mid['close'])
+    return (mid, bar)
+
+
+def values_match(expected, actual, rel_tol=1e-9, abs_tol=1e-9):
+    if math.isnan(expected) or math.isnan(actual):
+        return math.isnan(expected) and math.isnan(actual)
+    return math.isclose(expected, actual, rel_tol=rel_tol, abs_tol=abs_tol)
+
+
+def check_parity(rates, windows):
+    """Compare engine output with the ta reference for `windows` consecutive windows."""
+    engine = IndicatorEngine()
+    engine.seed(rates[:WINDOW - 1])
+    worst = {}
+    mismatches = 0
+    last = min(len(rates), WINDOW + windows)
+    for end in range(WINDOW, last + 1):
+        for forming in forming_variants(rates[end - 1]):
+            window = rates[end - WINDOW:end].copy()
+            window[-1] = forming
+            expected = latest_from_frame(compute_indicators(window))
+            actual = engine.latest(forming)
+            for key, value in expected.items():
+                diff = abs(value - actual[key]) if not math.isnan(value) else 0.0
+                worst[key] = max(worst.get(key, 0.0), diff)
+                if not values_match(value, actual[key]):
+                    mismatches += 1
+                    if mismatches <= 10:
+                        print(f"Mismatch at bar {end - 1} {key}: ta={value}, engine={actual[key]}")
+        if end < last:
+            engine.push(rates[end - 1])
+    print(f"Parity over {last - WINDOW + 1} windows: {mismatches} mismatches")
+    for key, diff in worst.items():
+        print(f"  {key:<18} max abs diff {diff:.3e}")
+    return mismatches == 0
+
+
+def check_window_columns(rates):
+    """Compare the vectorized per-bar columns with the engine, for final bars and for bars on their first tick.
+
+    The backtester uses the second: its decisions are taken when the next bar opens.
+    """
+    opening = rates.copy()
+    for name in ('high', 'low', 'close'):
+        opening[name] = rates['open']
+    mismatches = 0
+    for label, forming in (("final", rates), ("opening", opening)):
+        columns = compute_window_columns(rates, forming=forming)
+        engine = IndicatorEngine()
+        engine.seed(rates[:WINDOW - 1])
+        for end in range(WINDOW - 1, len(rates)):
+            actual = engine.latest(forming[end])
+            for key, value in actual.items():
+                if not values_match(value, float(columns[key][end])):
+                    mismatches += 1
+                    if mismatches <= 10:
+                        print(f"Column mismatch ({label}) at bar {end} {key}: engine={value}, "
+                              f"columns={columns[key][end]}")
+            engine.push(rates[end])
+    print(f"Vectorized columns over {len(rates) - WINDOW + 1} bars, final and opening: {mismatches} mismatches")
+    return mismatches == 0
+
+
+def check_strategies(rates, ticks_per_bar):
+    """Each strategy's reduced engine against the full one, plus push/latest CPU per bar for both."""
+    full = IndicatorEngine()
+    full.seed(rates[:WINDOW - 1])
+    expected = []
+    for end in range(WINDOW - 1, len(rates)):
+        expected.append(full.latest(rates[end]))
+        full.push(rates[end])
+
+    def per_bar(engine, first):
+        engine.seed(rates[first - engine.window + 1:first])
+        start = time.process_time()
+        for end in range(first, len(rates)):
+            for _ in range(ticks_per_bar):
+                engine.latest(rates[end])
+            engine.push(rates[end])
+        return (time.process_time() - start) / (len(rates) - first)
+
+    ok = True
+    full_cost = per_bar(IndicatorEngine(), WINDOW - 1)
+    print(f"Per-bar CPU with {ticks_per_bar} latest() calls per push; full engine {full_cost * 1e3:.3f} ms")
+    for name, strategy in STRATEGIES.items():
+        engine = IndicatorEngine(strategy.lookback, strategy.indicators)
+        engine.seed(rates[WINDOW - 1 - strategy.lookback + 1:WINDOW - 1])
+        mismatches = 0
+        for offset, end in enumerate(range(WINDOW - 1, len(rates))):
+            actual = engine.latest(rates[end])
+            mismatches += sum(not values_match(expected[offset][key], actual[key]) for key in strategy.indicators)
+            engine.push(rates[end])
+        ok = ok and mismatches == 0
+        cost = per_bar(IndicatorEngine(strategy.lookback, strategy.indicators), WINDOW - 1)
+        print(f"  {name:<20} {len(strategy.indicators):>2} indicators, lookback {strategy.lookback:>3}: "
+              f"{cost * 1e3:.3f} ms ({full_cost / cost:.1f}x), {mismatches} mismatches")
+    return ok
+
+
+def benchmark(rates, symbols, ticks_per_bar, loops):
+    """Per-loop CPU time for `symbols` symbols, before (full recompute) and after (engine)."""
+    windows = [rates[i:i + WINDOW] for i in range(loops)]
+
+    start = time.process_time()
+    for window in windows:
+        for _ in range(symbols):
+            latest_from_frame(compute_indicators(window))
+    full = (time.process_time() - start) / loops
+
+    engine = IndicatorEngine()
+    engine.seed(rates[:WINDOW - 1])
+    bar_closes = 0
+    start = time.process_time()
+    for i in range(loops):
+        # One loop pass is one tick; a bar closes every ticks_per_bar passes
+        if i and i % ticks_per_bar == 0:
+            engine.push(rates[WINDOW - 1 + bar_closes])
+            bar_closes += 1
+        forming = rates[WINDOW - 1 + bar_closes]
+        for _ in range(symbols):
+            engine.latest(forming)
+    incremental = (time.process_time() - start) / loops
+
+    print(f"Per-loop CPU for {symbols} symbols ({ticks_per_bar} loops per bar close):")
+    print(f"  full recompute : {full * 1e3:.3f} ms")
+    print(f"  incremental    : {incremental * 1e3:.3f} ms ({full / incremental:.0f}x faster)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", help="recorded rates CSV; synthetic bars when omitted")
+    parser.add_argument("--windows", type=int, default=300, help="windows to check for parity")
+    parser.add_argument("--symbols", type=int, default=9)
+    parser.add_argument("--ticks-per-bar", type=int, default=60)
+    parser.add_argument("--loops", type=int, default=200)
+    args = parser.parse_args()
+
+    rates = load_rates(args.csv) if args.csv else synthetic_rates(WINDOW + max(args.windows, args.loops) + 1)
+    ok = check_parity(rates, args.windows)
+    ok = check_window_columns(rates) and ok
+    ok = check_strategies(rates, args.ticks_per_bar) and ok
+    benchmark(rates, args.symbols, args.ticks_per_bar, args.loops)
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""Startup-time benchmark: imports, symbol resolution and the terminal setup before the first loop.
+
+Usage:
+    python bench_startup.py                                # synthetic broker listing of 5000 instruments
+    python bench_startup.py --instruments 20000 --latency 0.05
+    python bench_startup.py --session session.npz          # also time connect/resolve/prepare on a recording
+
+Symbol resolution is compared three ways against a stub terminal whose symbols_get()
+rebuilds its listing on every call (plus --latency seconds of IPC), as MetaTrader5 does:
+the old per-security symbols_get() and substring scan, the indexed rules from one
+listing, and the per-server cache, which needs no listing at all.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import namedtuple
+
+from config import securities, symbol_prefixes, symbol_suffixes
+from symbols import load_cache, resolve, save_cache
+
+Listed = namedtuple("Listed", "name path visible")
+
+
+class ListingTerminal:
+    """Terminal stub with a large instrument listing; only symbols_get() and symbol_select() are used."""
+
+    def __init__(self, count, latency=0.0):
+        names = []
+        for name in securities:
+            # Variants a substring search can pick before the intended one
+            names += [f"{name}c", f"{name}m", f"{name}.raw"]
+        names += [f"X{k:05d}.CFD" for k in range(max(count - len(names), 0))]
+        self.names = names
+        self.index = set(names)
+        self.latency = latency
+        self.listings = 0
+
+    def symbols_get(self):
+        self.listings += 1
+        time.sleep(self.latency)
+        return tuple(Listed(name, "", False) for name in self.names)
+
+    def symbol_select(self, name, enable=True):
+        return name in self.index
+
+
+def substring_resolution(terminal):
+    """The original init_symbols() search: a listing per security, first name containing it."""
+    resolved = {}
+    for symbol in securities:
+        for s in terminal.symbols_get():
+            if symbol in s.name:
+                resolved[symbol] = s.name
+                break
+        terminal.symbol_select(resolved[symbol], True)
+    return resolved
+
+
+def indexed_resolution(terminal):
+    resolved, _ = resolve(securities, [s.name for s in terminal.symbols_get()], symbol_prefixes, symbol_suffixes)
+    for name in resolved.values():
+        terminal.symbol_select(name, True)
+    return resolved
+
+
+def cached_resolution(terminal, path):
+    resolved = load_cache(path, "bench")
+    all(terminal.symbol_select(name, True) for name in resolved.values())
+    return resolved
+
+
+def best_of(function, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - started)
+    return min(times), result
+
+
+def import_times(module, repeat):
+    """Median wall time of importing `module` in a fresh interpreter, and whether pandas/ta got loaded."""
+    code = (f"import sys, time; t = time.perf_counter(); import {module}; "
+            "print(time.perf_counter() - t, 'pandas' in sys.modules, 'ta' in sys.modules)")
+    samples = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.split()
+        samples.append(float(output[0]))
+    return statistics.median(samples), output[1] == "True", output[2] == "True"
+
+
+def session_startup(path, cache_path):
+    """Seconds for connect, init_symbols, order-pipeline prepare and the risk engine against a recording."""
+    import forex9
+    from logs import RateLimitFilter
+    from replay import FakeTerminal
+
+    started = time.perf_counter()
+    forex9.setup_terminal(FakeTerminal(path), RateLimitFilter(), synchronous=True)
+    forex9.start(cache_path)
+    return time.perf_counter() - started, forex9.mt5.total_calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--instruments", type=int, default=5000, help="size of the synthetic broker listing")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every symbols_get() call")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--session", help="recorded session (.npz) to time the terminal setup against")
+    args = parser.parse_args()
+
+    seconds, pandas_loaded, ta_loaded = import_times("forex9", args.repeat)
+    baseline, _, _ = import_times("pandas, ta", args.repeat)
+    print(f"import forex9: {seconds * 1e3:.0f} ms (pandas loaded: {pandas_loaded}, ta loaded: {ta_loaded}); "
+          f"import pandas, ta alone: {baseline * 1e3:.0f} ms")
+
+    terminal = ListingTerminal(args.instruments, args.latency)
+    old, old_resolved = best_of(lambda: substring_resolution(terminal), args.repeat)
+    listings = terminal.listings // args.repeat
+    new, new_resolved = best_of(lambda: indexed_resolution(terminal), args.repeat)
+    with tempfile.TemporaryDirectory() as directory:
+        cache_path = os.path.join(directory, "symbols.json")
+        save_cache(cache_path, "bench", new_resolved)
+        cached, _ = best_of(lambda: cached_resolution(terminal, cache_path), args.repeat)
+    wrong = sorted(name for name in securities if old_resolved[name] != new_resolved[name])
+    print(f"Symbol resolution over {len(terminal.names)} instruments:")
+    print(f"  substring scan : {old * 1e3:8.2f} ms ({listings} symbols_get calls), variants {wrong} resolved to "
+          f"{[old_resolved[name] for name in wrong]}")
+    print(f"  indexed rules  : {new * 1e3:8.2f} ms (1 symbols_get call)")
+    print(f"  server cache   : {cached * 1e3:8.2f} ms (no symbols_get call)")
+
+    if args.session:
+        with tempfile.TemporaryDirectory() as directory:
+            cache_path = os.path.join(directory, "symbols.json")
+            cold, calls = session_startup(args.session, cache_path)
+            warm, warm_calls = session_startup(args.session, cache_path)
+        print(f"Terminal setup on {args.session}: {cold * 1e3:.1f} ms cold ({calls} calls), "
+              f"{warm * 1e3:.1f} ms with the symbol cache ({warm_calls} calls)")
+
+
+if __name__ == "__main__":
+    main()
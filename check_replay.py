@@ -0,0 +1,270 @@
+"""Replay regression check: a known synthetic session must trade the same way, and the
+failure paths of the bar caches and the order pipeline must recover.
+
+Usage:
+    python check_replay.py                         # generates the default session (about 30 s)
+    python check_replay.py --session session.npz   # reuse one written by make_session.py
+
+Four checks, each in a fresh process because forex9 keeps its state in module globals:
+
+  replay     forex9's loop over the session; on the default session (make_session.py with
+             its default hours and seed) the summary must equal EXPECTED, and the loop total
+             must match the loop timings recorded in metrics.
+  bar_cache  a BarCache driven through a missing forming bar, a gap longer than its window,
+             a changed closed bar, history going backwards and an empty reply; after each
+             refresh it must hold exactly what a fresh copy_rates_from_pos() returns.
+  faults     the replay with every entry order failing twice (no reply from the terminal,
+             then 10021) and its reply lost when it is filled on the third attempt, and every
+             50th rates request unanswered; every fill must be found with positions_get() and
+             not sent again, and on_result must never see None.
+  server_offset  the scheduler's server clock offset fed fresh ticks on every security but
+             one whose last tick is 16 minutes old, in either order: the offset and the
+             bar-close wakes must stay those of the fresh ticks.
+
+Exits non-zero when a check fails.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Replay summary of make_session.py's default session with the configured strategies and limits
+EXPECTED = {"deals": 0, "wins": 0, "open_positions": 1, "net": 0.0, "order_results": {10009: 1, 10016: 10}}
+DEFAULT_SESSION = {"hours": 2.0, "seed": 1}
+
+
+class FaultyTerminal:
+    """FakeTerminal wrapper failing entry orders twice, then losing the reply of their fill, and failing
+    every `every`-th rates request."""
+
+    def __init__(self, terminal, every=50):
+        self._terminal = terminal
+        self.every = every
+        self.rates_calls = 0
+        self.unanswered = 0
+        self.attempts = {}  # (symbol, type) -> failed sends of the current entry order
+        self.failed_sends = 0
+        self.lost_replies = 0
+
+    def __getattr__(self, name):
+        return getattr(self._terminal, name)
+
+    def copy_rates_from_pos(self, symbol, timeframe, start_pos, count):
+        self.rates_calls += 1
+        if self.rates_calls % self.every == 0:
+            self.unanswered += 1
+            return None
+        return self._terminal.copy_rates_from_pos(symbol, timeframe, start_pos, count)
+
+    def order_send(self, request):
+        if request.get("action") != self.TRADE_ACTION_DEAL or request.get("position"):
+            return self._terminal.order_send(request)
+        key = (request["symbol"], request["type"])
+        attempt = self.attempts.get(key, 0)
+        if attempt == 2:
+            del self.attempts[key]
+            result = self._terminal.order_send(request)
+            if result.retcode != self.TRADE_RETCODE_DONE:
+                return result
+            self.lost_replies += 1
+            return None  # Executed, but the reply never arrives
+        self.attempts[key] = attempt + 1
+        self.failed_sends += 1
+        if attempt == 0:
+            return None  # No reply from the terminal
+        return self._terminal._result(request, self.TRADE_RETCODE_PRICE_OFF, "No prices")
+
+
+def _replay(path, faulty):
+    """Run forex9's loop over the session in this process; returns its summary."""
+    import forex9
+    from logs import setup_logging
+    from metrics import metrics
+    from replay import FakeTerminal
+
+    fake = FakeTerminal(path)
+    rate_limit = setup_logging("ERROR", clock=fake.clock)
+    terminal = FaultyTerminal(fake) if faulty else fake
+    forex9.clock = fake.clock
+    forex9.setup_terminal(terminal, rate_limit, synchronous=True)
+    results = []
+    on_result = forex9.orders.on_result
+    forex9.orders.on_result = lambda order, result: (results.append(result), on_result(order, result))
+    if not forex9.start(None):
+        raise RuntimeError("replay did not start")
+    forex9.run(until=fake.end_time, workers=1)
+    summary = fake.report()
+    summary.update(loops=forex9.total_loops, loop_timings=metrics.summary("loop")[()][0],
+                   orders=forex9.orders.stats(), none_results=sum(result is None for result in results))
+    if faulty:
+        summary.update(unanswered=terminal.unanswered, failed_sends=terminal.failed_sends,
+                       lost_replies=terminal.lost_replies)
+    return summary
+
+
+def check_replay(path, exact):
+    summary = _replay(path, faulty=False)
+    failures = []
+    if exact:
+        failures += [f"{key}={summary[key]!r}, expected {value!r}" for key, value in EXPECTED.items()
+                     if summary[key] != value]
+    if summary["loops"] != summary["loop_timings"]:
+        failures.append(f"loops={summary['loops']} but {summary['loop_timings']} loop timings")
+    return failures, summary
+
+
+def check_faults(path, exact):
+    summary = _replay(path, faulty=True)
+    orders = summary["orders"]
+    failures = []
+    if summary["none_results"]:
+        failures.append(f"on_result got None {summary['none_results']} times")
+    if not summary["unanswered"]:
+        failures.append("no rates request went unanswered")
+    if not summary["failed_sends"] or orders["retried"] < summary["failed_sends"]:
+        failures.append(f"retried={orders['retried']} for {summary['failed_sends']} failed sends")
+    if orders["dropped"]:
+        failures.append(f"{orders['dropped']} orders dropped; each should fill on its third attempt")
+    if not summary["lost_replies"] or orders["confirmed"] != summary["lost_replies"]:
+        failures.append(f"{orders['confirmed']} fills confirmed for {summary['lost_replies']} lost replies")
+    if exact and summary["order_results"].get(10009, 0) < EXPECTED["order_results"][10009]:
+        failures.append(f"order_results={summary['order_results']}: fewer fills than without faults")
+    return failures, summary
+
+
+class _FaultInjector:
+    """Terminal wrapper applying the queued faults to the next copy_rates_from_pos() replies, one per reply."""
+
+    def __init__(self, terminal):
+        self._terminal = terminal
+        self.faults = []
+
+    def __getattr__(self, name):
+        return getattr(self._terminal, name)
+
+    def copy_rates_from_pos(self, symbol, timeframe, start_pos, count):
+        rates = self._terminal.copy_rates_from_pos(symbol, timeframe, start_pos, count)
+        if self.faults and rates is not None:
+            rates = self.faults.pop(0)(rates.copy())
+        return rates
+
+
+def check_bar_cache(path, exact):
+    from bars import BarCache
+    from config import TIMEFRAME_M1, securities
+    from replay import FakeTerminal
+
+    fake = FakeTerminal(path)
+    name = next(name for name, config in securities.items() if config["timeframe"] == TIMEFRAME_M1)
+    symbol = next(info.name for info in fake.symbols_get() if info.name.startswith(name))
+    terminal = _FaultInjector(fake)
+    cache = BarCache(terminal, symbol, TIMEFRAME_M1, 20, fake.clock)
+    failures = []
+
+    def drop_forming(rates):
+        return rates[rates['time'] != int(cache.forming['time'])]
+
+    def change_closed(rates):
+        rates['close'][0] += 0.001
+        return rates
+
+    def backwards(rates):
+        return fake.copy_rates_from_pos(symbol, TIMEFRAME_M1, 3, len(rates))
+
+    def empty(rates):
+        return rates[:0]
+
+    steps = [
+        ("initial load", 0, [], True, (0, 1)),
+        ("delta refresh", 61, [], True, (0, 0)),
+        ("forming bar missing", 61, [drop_forming], True, (1, 1)),
+        ("gap longer than the window", 30 * 60, [], True, (1, 1)),
+        ("closed bar changed", 1, [change_closed], True, (0, 1)),
+        ("history went backwards", 1, [backwards], True, (0, 1)),
+        ("empty reply", 1, [empty], False, (0, 0)),
+        ("recovered", 61, [], True, (0, 0)),
+    ]
+    for step, advance, faults, refreshed, (gaps, resyncs) in steps:
+        fake.clock.sleep(advance)
+        terminal.faults = list(faults)
+        before = (cache.gaps, cache.resyncs)
+        ok = cache.refresh()
+        if ok != refreshed:
+            failures.append(f"{step}: refresh() returned {ok}")
+        counted = (cache.gaps - before[0], cache.resyncs - before[1])
+        if counted != (gaps, resyncs):
+            failures.append(f"{step}: gaps/resyncs went up by {counted}, expected {(gaps, resyncs)}")
+        if terminal.faults:
+            failures.append(f"{step}: {len(terminal.faults)} faults were not fetched")
+        if ok:
+            expected = fake.copy_rates_from_pos(symbol, TIMEFRAME_M1, 0, cache.size)
+            if not np.array_equal(cache.last(cache.size), expected):
+                failures.append(f"{step}: cached bars differ from the terminal's")
+    return failures, cache.stats()
+
+
+def check_server_offset(path, exact):
+    from config import securities
+    from scheduler import EventScheduler
+
+    offset, start = 7200, 1_760_000_000.0  # Server on UTC+2
+    stale = "USDINR" if "USDINR" in securities else list(securities)[-1]
+    fresh = next(name for name in securities if name != stale)
+    failures = []
+    for stale_first in (True, False):
+        scheduler = EventScheduler(securities)
+        order = sorted(securities, key=lambda name: (name != stale) == stale_first)
+        for second in range(3):
+            now = start + second
+            for name in order:
+                age = 16 * 60 if name == stale else 0.3
+                scheduler.observe_server_time(name, now + offset - age, now)
+            if scheduler.server_offset != offset:
+                failures.append(f"stale tick {'first' if stale_first else 'last'}, second {second}: "
+                                f"offset {scheduler.server_offset}, expected {offset}")
+        bar_seconds = scheduler.state[fresh]["bar_seconds"]
+        forming_time = (now + offset) // bar_seconds * bar_seconds
+        scheduler.evaluated(fresh, now, forming_time)
+        close = forming_time + bar_seconds - offset + scheduler.bar_close_delay
+        if scheduler.state[fresh]["next"] > close:
+            failures.append(f"{fresh} wakes at {scheduler.state[fresh]['next']}, after its bar closes at {close}")
+    return failures, {"offset": offset, "stale": stale}
+
+
+CHECKS = {"replay": check_replay, "bar_cache": check_bar_cache, "faults": check_faults,
+          "server_offset": check_server_offset}
+
+
+def _run_isolated(check, path, exact):
+    with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(CHECKS[check], path, exact).result()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--session", help="session written by make_session.py; default: generate one")
+    parser.add_argument("--check", action="append", choices=sorted(CHECKS), help="run only these checks")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="forex9-check-") as directory:
+        path = args.session
+        if path is None:
+            from make_session import generate
+            path = os.path.join(directory, "session.npz")
+            generate(path, **DEFAULT_SESSION)
+        failed = False
+        for check in args.check or CHECKS:
+            failures, summary = _run_isolated(check, path, exact=args.session is None)
+            print(f"{check}: {'FAIL' if failures else 'ok'} {summary}")
+            for failure in failures:
+                print(f"  {failure}")
+            failed |= bool(failures)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# Timeframe values as defined by the MetaTrader5 package (mt5.TIMEFRAME_*), so this
+# module can be shared with the backtester without importing the terminal
+TIMEFRAME_M1 = 1
+TIMEFRAME_M5 = 5
+TIMEFRAME_M15 = 15
+TIMEFRAME_H1 = 1 | 0x4000
+
+# Define forex pairs and their strategies
+securities = {
+    "EURUSD": {"timeframe": TIMEFRAME_M5, "strategy": "mean_reversion", "active_hours": range(8, 17)},  # London/EU session
+    "USDJPY": {"timeframe": TIMEFRAME_M1, "strategy": "scalping", "active_hours": range(0, 8)},  # Asian session
+    "GBPUSD": {"timeframe": TIMEFRAME_M15, "strategy": "momentum", "active_hours": range(8, 17)},  # London session
+    "USDCHF": {"timeframe": TIMEFRAME_M5, "strategy": "breakout", "active_hours": range(8, 17)},  # EU session
+    "USDCAD": {"timeframe": TIMEFRAME_H1, "strategy": "trend_following", "active_hours": range(13, 21)},  # NY session
+    "AUDUSD": {"timeframe": TIMEFRAME_M5, "strategy": "rsi_mean_reversion", "active_hours": range(0, 8)},  # Asian session
+    "NZDUSD": {"timeframe": TIMEFRAME_M15, "strategy": "volatility_breakout", "active_hours": range(0, 8)},  # Asian session
+    "GBPJPY": {"timeframe": TIMEFRAME_M1, "strategy": "hft_scalping", "active_hours": range(8, 17)},  # London session
+    "USDINR": {"timeframe": TIMEFRAME_H1, "strategy": "stat_arb", "active_hours": range(3, 11)},  # Indian session
+}
+
+# Broker symbol names are looked up as prefix + security + suffix, trying the rules in
+# this order, in one symbols_get() listing; the result is cached per trade server
+symbol_prefixes = ("", "#")
+symbol_suffixes = ("", "m", ".raw", ".r", ".pro", ".ecn", ".a", "+", "_i")
+symbol_cache = ".symbol_cache.json"
+
+# Seconds between new-tick probes of tick-driven strategies (scalping); never faster than the old 1-second poll
+tick_poll_interval = 1.0
+
+# Strategy parameters
+lot_size = 0.01  # Default lot size if calculation fails
+cooldown_seconds = 5 * 60  # 5-minute cooldown per security
+max_trades_per_day = 50  # Max 50 trades per day per security
+max_open_positions = 10  # Max 10 open positions at a time
+rrr = 1.5  # Risk-Reward Ratio of 1.5
+leverage = 200  # Leverage is 1:200
+max_trade_duration = 2 * 24 * 60 * 60  # Max 2 days for a trade
+max_margin_per_trade = 25000  # Max margin per trade is 25,000 USD
+margin_per_trade_equity = 0.25  # ...and at most this share of equity
+max_margin_usage = 0.5  # Total margin of all open positions as a share of equity
+max_currency_exposure = 60  # Net long or short exposure per currency, as a multiple of equity
+min_atr = 0.0002  # Volatility filter: skip a symbol while ATR is below this
+trailing_min_step_atr = 0.25  # Move a trailing stop only when it improves by this fraction of ATR (or the stops level)
+trailing_max_per_second = 5  # Trailing-stop modifications sent per second across all positions
+
+# Trades are blocked while a symbol whose bar returns correlate with it beyond max_correlation
+# (either sign) has an open position, over the last correlation_window correlation_timeframe bars
+correlation_timeframe = TIMEFRAME_M15
+correlation_window = 96  # One day of M15 bars
+max_correlation = 0.8
+
+# Pairs that should not be held at the same time, used until enough correlation bars are loaded
+correlated_pairs = {
+    "EURUSD": ["USDCHF"],
+    "USDCHF": ["EURUSD"],
+    "GBPUSD": ["GBPJPY"],
+    "GBPJPY": ["GBPUSD"],
+}
@@ -0,0 +1,116 @@
+import numpy as np
+
+
+def align_closes(bars_by_symbol, symbols, after):
+    """(times, closes) for the closed bars newer than `after`: one row per bar time across
+    all symbols, NaN where a symbol has no bar at that time."""
+    times = sorted({int(t) for bars in bars_by_symbol.values() for t in bars['time'] if t > after})
+    closes = np.full((len(times), len(symbols)), np.nan)
+    row = {t: k for k, t in enumerate(times)}
+    for j, symbol in enumerate(symbols):
+        bars = bars_by_symbol.get(symbol)
+        if bars is None:
+            continue
+        for t, close in zip(bars['time'].tolist(), bars['close'].tolist()):
+            k = row.get(t)
+            if k is not None:
+                closes[k, j] = close
+    return times, closes
+
+
+class RollingCorrelation:
+    """Rolling covariance and correlation of bar log returns across symbols.
+
+    Keeps the last `window` return vectors in a ring together with their sums and
+    the sum of outer products, so each bar adds the new vector and removes the oldest
+    in O(n^2) instead of recomputing from the window. The sums are rebuilt from the
+    ring once per `window` bars so floating-point drift cannot accumulate. A symbol
+    without a bar at some time (a closed market) counts as an unchanged close.
+    """
+
+    def __init__(self, symbols, window=96, min_periods=None):
+        self.symbols = list(symbols)
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.window = window
+        self.min_periods = min_periods or window // 2
+        n = len(self.symbols)
+        self.returns = np.zeros((window, n))
+        self.sums = np.zeros(n)
+        self.cross = np.zeros((n, n))
+        self.count = 0
+        self.head = 0
+        self.updates = 0
+        self.last_close = np.full(n, np.nan)
+        self.last_time = 0
+        self._correlation = None
+
+    @property
+    def ready(self):
+        return self.count >= self.min_periods
+
+    def update_closes(self, time, closes):
+        """Push the returns from the previous closes to `closes` (NaN keeps a symbol's last close)."""
+        closes = np.where(np.isnan(closes), self.last_close, closes)
+        if not np.isnan(self.last_close).all():
+            returns = np.log(closes / self.last_close)
+            self.push(np.where(np.isfinite(returns), returns, 0.0))
+        self.last_close = closes
+        self.last_time = time
+
+    def push(self, returns):
+        if self.count == self.window:
+            old = self.returns[self.head]
+            self.sums -= old
+            self.cross -= np.outer(old, old)
+        self.returns[self.head] = returns
+        self.sums += returns
+        self.cross += np.outer(returns, returns)
+        self.head = (self.head + 1) % self.window
+        self.count = min(self.count + 1, self.window)
+        self.updates += 1
+        if self.updates % self.window == 0:
+            filled = self.returns[:self.count]
+            self.sums = filled.sum(axis=0)
+            self.cross = filled.T @ filled
+        self._correlation = None
+
+    def covariance(self):
+        m = self.count
+        if m < 2:
+            return np.full_like(self.cross, np.nan)
+        mean = self.sums / m
+        return (self.cross - m * np.outer(mean, mean)) / (m - 1)
+
+    def correlation(self):
+        """n x n correlation matrix (NaN for symbols whose returns have no variance yet)."""
+        if self._correlation is None:
+            covariance = self.covariance()
+            std = np.sqrt(np.clip(np.diag(covariance), 0.0, None))
+            with np.errstate(divide='ignore', invalid='ignore'):
+                correlation = covariance / np.outer(std, std)
+            correlation[~np.isfinite(correlation)] = np.nan
+            np.fill_diagonal(correlation, 1.0)
+            self._correlation = correlation
+        return self._correlation
+
+    def frame(self):
+        """The correlation matrix as a DataFrame labelled by symbol, for inspection."""
+        import pandas as pd  # Only for inspection; the live loop never loads it
+        return pd.DataFrame(self.correlation(), index=self.symbols, columns=self.symbols)
+
+    def correlated(self, symbol, threshold, among=None):
+        """[(other symbol, rho)] with |rho| >= threshold, optionally only among a boolean mask of symbols."""
+        i = self.index[symbol]
+        row = np.abs(self.correlation()[i])
+        mask = row >= threshold
+        mask[i] = False
+        if among is not None:
+            mask &= among
+        return [(self.symbols[j], float(self.correlation()[i, j])) for j in np.flatnonzero(mask)]
+
+    def pairs(self, threshold):
+        """Every pair with |rho| >= threshold, strongest first."""
+        correlation = self.correlation()
+        upper = np.triu(np.abs(correlation) >= threshold, k=1)
+        found = [(self.symbols[i], self.symbols[j], float(correlation[i, j])) for i, j in zip(*np.nonzero(upper))]
+        return sorted(found, key=lambda pair: -abs(pair[2]))
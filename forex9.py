@@ -1,415 +1,621 @@
-import MetaTrader5 as mt5
-import pandas as pd
+import argparse
+import logging
 import numpy as np
-from ta.volatility import BollingerBands, AverageTrueRange
-from ta.momentum import RSIIndicator, StochasticOscillator
-from ta.trend import EMAIndicator, ADXIndicator, MACD
+import threading
 import time
-from datetime import datetime, timedelta
-
-# Initialize MT5 connection
-print("Attempting to initialize MT5...")
-if not mt5.initialize():
-    print("MT5 initialization failed:", mt5.last_error())
-    mt5.shutdown()
-    exit()
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+try:
+    import MetaTrader5
+except ImportError:  # Windows-only package; replays run without it
+    MetaTrader5 = None
+
+from bars import BarCache, timeframe_seconds
+from config import (
+    securities, cooldown_seconds, max_trades_per_day, max_open_positions, rrr, leverage,
+    max_trade_duration, max_margin_per_trade, min_atr, correlated_pairs, trailing_min_step_atr,
+    trailing_max_per_second, margin_per_trade_equity, max_margin_usage, max_currency_exposure,
+    correlation_timeframe, correlation_window, max_correlation, symbol_prefixes, symbol_suffixes, symbol_cache,
+    tick_poll_interval,
+)
+from correlation import RollingCorrelation, align_closes
+from indicators import IndicatorEngine
+from logs import event, setup_logging
+from metrics import metrics
+from orders import OrderPipeline
+from replay import FakeTerminal, RecordingTerminal
+from risk import RiskEngine
+from scheduler import EventScheduler
+from signals import STRATEGIES, pip_size
+from snapshot import BrokerSnapshot
+from symbols import load_cache, resolve, save_cache
+from terminal import CountingTerminal
+from trailing import TrailingStopManager
+
+log = logging.getLogger("forex9")
+DEBUG, INFO, WARNING, ERROR = logging.DEBUG, logging.INFO, logging.WARNING, logging.ERROR
+mt5 = None  # CountingTerminal around MetaTrader5 or a replayed session; set by main()
+clock = time  # time()/monotonic()/sleep(); replays use the session's SimClock
 
 # Account credentials
 account = 240065549
 password = "135790Mv*"
 server = "Exness-MT5Trial6"
-print("Attempting to login...")
-if not mt5.login(account, password, server):
-    print("Login failed:", mt5.last_error())
-    mt5.shutdown()
-    exit()
-print("MT5 connected successfully!")
-
-# Define forex pairs and their strategies
-securities = {
-    "EURUSD": {"timeframe": mt5.TIMEFRAME_M5, "strategy": "mean_reversion", "active_hours": range(8, 17)},  # London/EU session
-    "USDJPY": {"timeframe": mt5.TIMEFRAME_M1, "strategy": "scalping", "active_hours": range(0, 8)},  # Asian session
-    "GBPUSD": {"timeframe": mt5.TIMEFRAME_M15, "strategy": "momentum", "active_hours": range(8, 17)},  # London session
-    "USDCHF": {"timeframe": mt5.TIMEFRAME_M5, "strategy": "breakout", "active_hours": range(8, 17)},  # EU session
-    "USDCAD": {"timeframe": mt5.TIMEFRAME_H1, "strategy": "trend_following", "active_hours": range(13, 21)},  # NY session
-    "AUDUSD": {"timeframe": mt5.TIMEFRAME_M5, "strategy": "rsi_mean_reversion", "active_hours": range(0, 8)},  # Asian session
-    "NZDUSD": {"timeframe": mt5.TIMEFRAME_M15, "strategy": "volatility_breakout", "active_hours": range(0, 8)},  # Asian session
-    "GBPJPY": {"timeframe": mt5.TIMEFRAME_M1, "strategy": "hft_scalping", "active_hours": range(8, 17)},  # London session
-    "USDINR": {"timeframe": mt5.TIMEFRAME_H1, "strategy": "stat_arb", "active_hours": range(3, 11)},  # Indian session
-}
-
-# Initialize symbols
-for symbol in securities.keys():
-    found = False
-    for s in mt5.symbols_get():
-        if symbol in s.name:
-            securities[symbol]["symbol"] = s.name
-            found = True
-            print(f"Found {symbol} variant: {s.name}")
-            break
-    if not found:
-        print(f"No {symbol} variant found. Exiting...")
-        mt5.shutdown()
-        exit()
-    if not mt5.symbol_select(securities[symbol]["symbol"], True):
-        print(f"Symbol {symbol} not found:", mt5.last_error())
-        mt5.shutdown()
-        exit()
-
-# Strategy parameters
-lot_size = 0.01  # Default lot size if calculation fails
-cooldown_seconds = 5 * 60  # 5-minute cooldown per security
-max_trades_per_day = 50  # Max 50 trades per day per security
-max_open_positions = 10  # Max 10 open positions at a time
-rrr = 1.5  # Risk-Reward Ratio of 1.5
-leverage = 200  # Leverage is 1:200
-max_trade_duration = 2 * 24 * 60 * 60  # Max 2 days for a trade
-max_margin_per_trade = 25000  # Max margin per trade is 25,000 USD
+terminal_path = None  # terminal64.exe to attach to when several terminals are installed; None for the default
+
+def connect():
+    """Initialize the terminal and log in."""
+    event(log, INFO, "Initializing MT5", path=terminal_path or "default")
+    if not (mt5.initialize(terminal_path) if terminal_path else mt5.initialize()):
+        event(log, ERROR, "MT5 initialization failed", error=mt5.last_error())
+        return False
+    event(log, INFO, "Logging in", account=account, server=server)
+    if not mt5.login(account, password, server):
+        event(log, ERROR, "Login failed", error=mt5.last_error())
+        return False
+    event(log, INFO, "MT5 connected")
+    return True
+
+def init_symbols(cache_path=None):
+    """Find the broker's name for every security and add it to Market Watch.
+
+    Names cached for the trade server in `cache_path` are used as long as they can all
+    be selected; otherwise one symbols_get() listing is resolved with the prefix and
+    suffix rules and the cache rewritten.
+    """
+    names = list(correlation_securities)
+    account_info = mt5.account_info()
+    server_name = account_info.server if account_info else server
+    resolved = {name: symbol for name, symbol in load_cache(cache_path, server_name).items() if name in names}
+    cached = resolved.keys() >= set(names) and all(mt5.symbol_select(resolved[name], True) for name in names)
+    if not cached:
+        resolved, missing = resolve(names, [s.name for s in mt5.symbols_get() or ()], symbol_prefixes, symbol_suffixes)
+        if missing:
+            event(log, ERROR, "No symbol variant found", symbols=",".join(missing))
+            return False
+        for name in names:
+            if not mt5.symbol_select(resolved[name], True):
+                event(log, ERROR, "Symbol not selectable", symbol=name, error=mt5.last_error())
+                return False
+        save_cache(cache_path, server_name, resolved)
+    for name in names:
+        correlation_securities[name]["symbol"] = resolved[name]
+    event(log, INFO, "Symbols resolved", cached=cached, **resolved)
+    return True
 
 # Track trades and cooldowns
 last_trade_times = {symbol: 0 for symbol in securities.keys()}
 daily_trade_counts = {symbol: 0 for symbol in securities.keys()}
-last_reset_date = datetime.utcnow().date()
-
-def calculate_margin(symbol, lot, price):
-    """Calculate the margin required for a position."""
-    notional_value = lot * 100000 * price  # 100,000 units per lot
-    margin = notional_value / leverage
-    return margin
-
-def get_total_margin_used():
-    """Calculate total margin used by all open positions."""
-    positions = mt5.positions_get()
-    total_margin = 0.0
-    for pos in positions:
-        margin = calculate_margin(pos.symbol, pos.volume, pos.price_open)
-        total_margin += margin
-    return total_margin
-
-def calculate_lot_size(symbol, current_price):
-    """Calculate lot size to ensure margin does not exceed 25,000 USD."""
-    # Margin = (lot * 100,000 * price) / leverage
-    # 25,000 = (lot * 100,000 * price) / 200
-    # lot = (25,000 * 200) / (100,000 * price)
-    lot = (max_margin_per_trade * leverage) / (100000 * current_price)
-    return max(round(lot, 2), 0.01)
-
-def get_indicators(symbol, timeframe):
-    """Fetch OHLC data and calculate technical indicators."""
-    rates = mt5.copy_rates_from_pos(symbol, timeframe, 0, 200)
-    if rates is None or len(rates) < 200:
-        print(f"Failed to fetch rates for {symbol}:", mt5.last_error())
+last_reset_date = None
+indicator_engines = {}  # (symbol, timeframe) -> IndicatorEngine
+bar_caches = {}  # (symbol, timeframe) -> BarCache
+engine_generations = {}  # (symbol, timeframe) -> BarCache generation the engine was seeded from
+stats_interval = 60  # Seconds between cache statistics reports
+last_stats_time = 0.0
+loop_count = 0  # Loops since the last terminal-call report
+loop_calls = 0  # Terminal calls summed over loops since the last report
+total_loops = 0  # Loops since start, never reset
+snapshot = None  # BrokerSnapshot, rebuilt at the top of every loop iteration
+max_retries = 3  # Attempts per order before the pipeline gives up on a signal
+order_lock = threading.Lock()  # Serializes order_send across symbol workers
+orders = None  # OrderPipeline, created by main()
+risk = None  # RiskEngine over the securities' broker symbols, created by main()
+correlations = None  # RollingCorrelation over correlation_securities' broker symbols, created by main()
+correlation_securities = dict(securities)  # Securities the correlation filter compares: a shard's whole account
+external_open = set()  # Securities the account's other shards have a position open in, from the board
+correlation_caches = {}  # Broker symbol -> BarCache on correlation_timeframe
+next_correlation_time = 0.0
+symbol_holds = {}  # Symbol -> monotonic time until which the symbol is skipped
+decision_latency = {}  # Symbol -> {"last": s, "max": s} from loop start to decision
+metrics_json = None  # Path the metrics are dumped to every stats interval, set by main()
+executor = None  # ThreadPoolExecutor for symbol workers, created by run()
+trailing = None  # TrailingStopManager, created by run()
+scheduler = EventScheduler(securities, tick_poll_interval=tick_poll_interval)
+board = None  # RiskBoard shared with the other workers of a supervised deployment
+board_row = None  # This worker's row on the board
+shared_bars = None  # SharedTerminal serving the supervisor's feed, when bars are shared
+
+def select_securities(names, account_names=None):
+    """Trade only `names` (a supervisor shard): drop the other securities and rebuild the per-symbol state.
+
+    The correlation filter still compares against every security in `account_names` (default `names`),
+    so a shard sees the account's other shards' correlated positions.
+    """
+    global scheduler, correlation_securities
+    correlation_securities = {name: securities[name] for name in account_names or names}
+    for symbol in list(securities):
+        if symbol not in names:
+            del securities[symbol]
+    for state in (last_trade_times, daily_trade_counts):
+        state.clear()
+        state.update({symbol: 0 for symbol in securities})
+    scheduler = EventScheduler(securities, tick_poll_interval=tick_poll_interval)
+
+def create_risk_engine():
+    """Risk engine over the cached symbol specs, seeded with current quotes and open positions."""
+    specs = [orders.spec(config["symbol"]) for config in securities.values()]
+    account_info = mt5.account_info()
+    engine = RiskEngine(specs, account_info.currency, leverage, max_open_positions, max_margin_per_trade,
+                        margin_per_trade_equity, max_margin_usage, max_currency_exposure)
+    for spec in specs:
+        tick = mt5.symbol_info_tick(spec.name)
+        if tick:
+            engine.update_price(spec.name, tick.bid, tick.ask)
+    engine.sync(mt5.positions_get() or ())
+    return engine
+
+@metrics.timed("get_indicators")
+def get_indicators(symbol, timeframe, strategy):
+    """Refresh the local bar cache and return the strategy's indicator values, updating state only on bar close."""
+    key = (symbol, timeframe)
+    cache = bar_caches.get(key)
+    if cache is None:
+        # Only the lookback and indicators the strategy declares are fetched and computed
+        cache = bar_caches[key] = BarCache(mt5, symbol, timeframe, strategy.lookback, clock)
+        indicator_engines[key] = IndicatorEngine(strategy.lookback, strategy.indicators)
+    engine = indicator_engines[key]
+
+    if not cache.refresh() or cache.size < engine.window:
+        event(log, WARNING, "Failed to fetch rates", symbol=symbol, error=mt5.last_error())
         return None
-    df = pd.DataFrame(rates)
-    df['time'] = pd.to_datetime(df['time'], unit='s')
-    
-    # Calculate indicators
-    df['ema10'] = EMAIndicator(close=df['close'], window=10).ema_indicator()
-    df['ema50'] = EMAIndicator(close=df['close'], window=50).ema_indicator()
-    df['ema200'] = EMAIndicator(close=df['close'], window=200).ema_indicator()
-    bb = BollingerBands(close=df['close'], window=20, window_dev=2.0)
-    df['bb_upper'] = bb.bollinger_hband()
-    df['bb_lower'] = bb.bollinger_lband()
-    rsi = RSIIndicator(close=df['close'], window=14)
-    df['rsi'] = rsi.rsi()
-    stoch = StochasticOscillator(high=df['high'], low=df['low'], close=df['close'], window=14, smooth_window=3)
-    df['stoch'] = stoch.stoch()
-    atr = AverageTrueRange(high=df['high'], low=df['low'], close=df['close'], window=14)
-    df['atr'] = atr.average_true_range()
-    adx = ADXIndicator(high=df['high'], low=df['low'], close=df['close'], window=14)
-    df['adx'] = adx.adx()
-    macd = MACD(close=df['close'], window_fast=12, window_slow=26, window_sign=9)
-    df['macd'] = macd.macd()
-    df['macd_signal'] = macd.macd_signal()
-    df['high_20'] = df['high'].rolling(window=20).max()
-    df['low_20'] = df['low'].rolling(window=20).min()
-    return df
-
-def place_order(symbol, order_type, price, sl, tp, lot):
-    """Place a trade order with retry mechanism."""
-    request = {
-        "action": mt5.TRADE_ACTION_DEAL,
-        "symbol": symbol,
-        "volume": lot,
-        "type": order_type,
-        "price": price,
-        "sl": sl,
-        "tp": tp,
-        "deviation": 20,
-        "magic": 123456,
-        "comment": "Multi-Strategy",
-        "type_time": mt5.ORDER_TIME_GTC,
-        "type_filling": mt5.ORDER_FILLING_IOC,
-    }
-    max_retries = 3
-    for attempt in range(max_retries):
-        result = mt5.order_send(request)
-        if result.retcode != mt5.TRADE_RETCODE_DONE:
-            print(f"Order failed for {symbol}: {result.retcode} - {result.comment}")
-            if result.retcode == 10027:
-                print("AutoTrading disabled. Please enable it in MT5 terminal.")
-                time.sleep(5)
-                continue
-            elif result.retcode == 10013:
-                print("Invalid request. Retrying...")
-                time.sleep(2)
-                continue
-            elif result.retcode == 10019:
-                print("Insufficient funds to place order.")
-                return None
-            return result
+    bars = cache.last(engine.window)
+    closed = bars[:-1]
+
+    if engine.ready and engine_generations.get(key) == cache.generation:
+        # Push whatever closed since the engine last saw this series
+        new = int(np.searchsorted(closed['time'], engine.last_time, side='right'))
+        if new == 0 or int(closed['time'][new - 1]) != engine.last_time:
+            engine.seed(closed)
         else:
-            print(f"Order placed for {symbol}: {result.order}")
-            return result
-    print(f"Max retries reached for {symbol}. Order not placed.")
-    return None
-
-def modify_trailing_stop(position, atr_value):
-    """Update trailing stop based on ATR."""
-    if position.type == mt5.ORDER_TYPE_BUY:
-        new_sl = position.price_current - atr_value
-        if new_sl > position.sl:
-            request = {
-                "action": mt5.TRADE_ACTION_SLTP,
-                "position": position.ticket,
-                "sl": new_sl,
-                "tp": position.tp,
-            }
-            result = mt5.order_send(request)
-            if result.retcode == mt5.TRADE_RETCODE_DONE:
-                print(f"Trailing stop updated for position {position.ticket}: New SL={new_sl}")
-    elif position.type == mt5.ORDER_TYPE_SELL:
-        new_sl = position.price_current + atr_value
-        if new_sl < position.sl:
-            request = {
-                "action": mt5.TRADE_ACTION_SLTP,
-                "position": position.ticket,
-                "sl": new_sl,
-                "tp": position.tp,
-            }
-            result = mt5.order_send(request)
-            if result.retcode == mt5.TRADE_RETCODE_DONE:
-                print(f"Trailing stop updated for position {position.ticket}: New SL={new_sl}")
+            for bar in closed[new:]:
+                engine.push(bar)
+    else:
+        engine.seed(closed)
+        engine_generations[key] = cache.generation
+    return engine.latest(bars[-1])
+
+def log_bar_cache_stats():
+    """Log terminal calls and data volume saved by the bar caches."""
+    totals = {}
+    for cache in bar_caches.values():
+        for name, value in cache.stats().items():
+            totals[name] = totals.get(name, 0) + value
+    event(log, INFO, "Bar cache", rate_limit=False, **totals)
+    if shared_bars is not None:
+        event(log, INFO, "Shared bars", rate_limit=False, **shared_bars.stats())
+
+def log_order_stats():
+    """Log entry orders sent and retried, open risk, and trailing-stop modifications sent versus suppressed."""
+    event(log, INFO, "Orders", rate_limit=False, **orders.stats())
+    event(log, INFO, "Risk", rate_limit=False, **risk.stats())
+    event(log, INFO, "Trailing stops", rate_limit=False, **trailing.stats())
+
+def log_terminal_stats():
+    """Log terminal calls per loop iteration since the last report."""
+    global loop_count, loop_calls
+    if loop_count:
+        event(log, INFO, "Terminal calls", rate_limit=False, per_loop=round(loop_calls / loop_count, 1), loops=loop_count, **mt5.counts())
+    loop_count = 0
+    loop_calls = 0
+
+@metrics.timed("place_order")
+def place_order(symbol, config, order_type, price, sl, tp, lot):
+    """Queue an entry order with the pipeline; the risk and correlation limits are checked again right before it is sent."""
+    def still_allowed():
+        # Another worker may have opened a position since this symbol was evaluated
+        allowed, reason = risk.can_add(config["symbol"], order_type, lot, price, snapshot.account.equity)
+        if not allowed:
+            event(log, INFO, "Order blocked by risk limits", symbol=symbol, reason=reason)
+        return allowed and check_correlation_filter(symbol)
+
+    return orders.submit(symbol, config["symbol"], order_type, price, sl, tp, lot, still_allowed)
+
+def order_result(order, result):
+    """Pipeline callback for every order sent, called under the order lock."""
+    snapshot.invalidate()
+    metrics.inc("order_retcodes", action="deal", retcode=result.retcode)
+    if result.retcode == mt5.TRADE_RETCODE_DONE:
+        request = order.request
+        risk.open(result.order, order.symbol, request["type"], request["volume"], result.price or request["price"])
+        last_trade_times[order.key] = clock.time()
+        daily_trade_counts[order.key] += 1
+        event(log, INFO, "Order placed", symbol=order.key, order=result.order, price=order.request["price"],
+              latency_ms=(order.acked_at - order.signal_at) * 1e3)
+    elif result.retcode == 10027:
+        event(log, WARNING, "AutoTrading disabled, enable it in the MT5 terminal")
+    else:
+        event(log, WARNING, "Order failed", symbol=order.key, retcode=result.retcode, comment=result.comment)
+
+def order_unanswered(order):
+    """Pipeline callback for a send without a reply: drop the cached broker state and return the tickets known
+    before the send, so the pipeline can tell a position the send opened from the older ones."""
+    snapshot.invalidate()
+    metrics.inc("order_retcodes", action="deal", retcode="none")
+    return set(risk.positions)
+
+@metrics.timed("modify_trailing_stop")
+def modify_trailing_stops():
+    """Send the trailing-stop modifications queued by the symbol workers, within the rate limit."""
+    for request, result in trailing.flush(snapshot):
+        metrics.inc("order_retcodes", action="sltp", retcode=result.retcode)
+        if result.retcode == mt5.TRADE_RETCODE_DONE:
+            event(log, DEBUG, "Trailing stop updated", symbol=request["symbol"], ticket=request["position"],
+                  sl=request["sl"])
+        else:
+            event(log, WARNING, "Trailing stop rejected", symbol=request["symbol"], ticket=request["position"],
+                  retcode=result.retcode, comment=result.comment)
+
+def update_correlations(now):
+    """Push the correlation bars closed since the last update into the rolling matrix, once per bar."""
+    global next_correlation_time
+    if now < next_correlation_time:
+        return
+    bar_seconds = timeframe_seconds(correlation_timeframe)
+    next_correlation_time = (now // bar_seconds + 1) * bar_seconds
+    closed = {}
+    for symbol in correlations.symbols:
+        cache = correlation_caches.get(symbol)
+        if cache is None:
+            cache = correlation_caches[symbol] = BarCache(mt5, symbol, correlation_timeframe,
+                                                          correlation_window + 2, clock)
+        if cache.refresh():
+            closed[symbol] = cache.last(cache.size)[:-1]
+    times, closes = align_closes(closed, correlations.symbols, correlations.last_time)
+    for bar_time, row in zip(times, closes):
+        correlations.update_closes(bar_time, row)
 
 def check_correlation_filter(symbol):
-    """Avoid overexposure by checking correlated pairs."""
-    correlated_pairs = {
-        "EURUSD": ["USDCHF"],
-        "USDCHF": ["EURUSD"],
-        "GBPUSD": ["GBPJPY"],
-        "GBPJPY": ["GBPUSD"],
-    }
-    positions = mt5.positions_get()
-    if symbol not in correlated_pairs:
-        return True
-    for pos in positions:
-        if pos.symbol in correlated_pairs[symbol]:
-            print(f"Skipping trade for {symbol} due to open position in correlated pair {pos.symbol}")
-            return False
+    """Avoid overexposure: no new trade while a correlated symbol has an open position."""
+    name = securities[symbol]["symbol"]
+    open_names = open_securities() | external_open
+    if correlations.ready:
+        open_symbols = np.array([other in open_names for other in correlation_securities])
+        blocking = [other for other, _ in correlations.correlated(name, max_correlation, open_symbols)]
+    else:
+        # Not enough correlation bars yet: fall back to the configured pairs
+        blocking = [correlation_securities[other]["symbol"] for other in correlated_pairs.get(symbol, ())
+                    if other in open_names]
+    if blocking:
+        event(log, DEBUG, "Correlated position open, skipping", symbol=symbol, correlated=",".join(blocking))
+        return False
     return True
 
-# Main trading loop
-while True:
-    current_time = time.time()
-    current_datetime = datetime.utcnow()
-    current_date = current_datetime.date()
-    current_hour = current_datetime.hour
-
-    # Reset daily trade counts at 00:00 GMT
-    if current_date != last_reset_date:
-        for symbol in securities.keys():
-            daily_trade_counts[symbol] = 0
-        last_reset_date = current_date
-        print("Daily trade counts reset.")
-
-    # Check total open positions
-    positions = mt5.positions_get()
-    if len(positions) >= max_open_positions:
-        print(f"Max open positions ({max_open_positions}) reached. Waiting...")
-        time.sleep(1)
-        continue
-
-    for symbol, config in securities.items():
-        # Check if within active hours (prioritize but allow trading outside for very good opportunities)
-        is_active_hour = current_hour in config["active_hours"]
-
-        # Check max trades per day
-        if daily_trade_counts[symbol] >= max_trades_per_day:
-            print(f"Max trades per day reached for {symbol}. Waiting for next day...")
-            continue
-
-        print(f"\nProcessing {symbol} at {pd.Timestamp.now()}")
-        account_info = mt5.account_info()
-        if not account_info:
-            print("Failed to get account info:", mt5.last_error())
-            time.sleep(1)
-            continue
-        balance = account_info.balance
-        equity = account_info.equity
-        print(f"Account balance: {balance}, Equity: {equity}")
-
-        # Fetch current price
-        tick = mt5.symbol_info_tick(config["symbol"])
-        if not tick or tick.ask == 0.0:
-            print(f"Failed to get valid tick data for {symbol}: Price is 0.0. Retrying...")
-            time.sleep(1)
-            continue
-        current_price = tick.ask
-        print(f"Current price for {symbol}: {current_price}")
-
-        # Fetch indicators
-        df = get_indicators(config["symbol"], config["timeframe"])
-        if df is None:
-            print(f"Failed to get indicators for {symbol}")
-            time.sleep(1)
+def open_securities():
+    """Securities this worker has a position open in."""
+    open_symbols = risk.open_mask()
+    return {name for name, config in securities.items() if open_symbols[risk.index[config["symbol"]]]}
+
+def log_correlation_stats():
+    """Log the symbol pairs currently correlated beyond max_correlation."""
+    if not correlations.ready:
+        event(log, INFO, "Correlations warming up", rate_limit=False, bars=correlations.count,
+              needed=correlations.min_periods)
+        return
+    pairs = correlations.pairs(max_correlation)
+    event(log, INFO, "Correlated pairs", rate_limit=False,
+          pairs=",".join(f"{a}/{b}:{rho:.2f}" for a, b, rho in pairs) or "none")
+
+def share_risk():
+    """Publish this worker's open risk, trade counts, trade times and open securities and take in the account's other shards."""
+    global external_open
+    account_info = snapshot.account
+    board.publish(board_row, len(risk.positions), risk.total_margin(), account_info.equity if account_info else 0.0,
+                  daily_trade_counts, last_reset_date, last_trade_times, open_securities())
+    risk.external_positions, risk.external_margin = board.account_totals(board_row)
+    external_open = board.account_open(board_row)
+
+def execute_trade(symbol, config, order_type, price, sl, tp, lot):
+    """Hand an entry signal to the order pipeline unless the symbol already has an order in flight."""
+    if orders.busy(symbol):
+        event(log, DEBUG, "Order in flight, signal skipped", symbol=symbol)
+        return False
+    side = "buy" if order_type == mt5.ORDER_TYPE_BUY else "sell"
+    event(log, INFO, "Entry signalled", symbol=symbol, side=side, price=price, sl=sl, tp=tp, lot=lot)
+    return place_order(symbol, config, order_type, price, sl, tp, lot)
+
+def hold_symbol(symbol, seconds):
+    """Skip a symbol for a while without blocking the other symbols."""
+    symbol_holds[symbol] = clock.monotonic() + seconds
+
+def schedule_symbol(symbol, config, now):
+    """Tell the scheduler what a symbol's evaluation saw so it can pick the next wake-up."""
+    tick = snapshot.tick(config["symbol"])
+    if tick:
+        scheduler.observe_server_time(symbol, tick.time, now)
+    cache = bar_caches.get((config["symbol"], config["timeframe"]))
+    forming_time = int(cache.forming['time']) if cache is not None and cache.size else None
+
+    # Wake again when a symbol hold or order backoff expires
+    mono = clock.monotonic()
+    holds = [symbol_holds.get(symbol, 0.0), orders.retry_at(symbol)]
+    holds = [now + (until - mono) for until in holds if until > mono]
+
+    scheduler.evaluated(symbol, now, forming_time,
+                        has_positions=bool(snapshot.positions_for(config["symbol"])),
+                        wake_at=min(holds) if holds else None)
+
+def log_stage_stats():
+    """Log count, mean, p50, p99 and max in ms of every stage histogram since start."""
+    for name in sorted(metrics.histograms):
+        for labels, (count, mean, p50, p99, peak) in sorted(metrics.summary(name).items()):
+            event(log, INFO, "Stage timing", rate_limit=False, stage=name, **dict(labels), count=count, mean_ms=mean * 1e3,
+                  p50_ms=p50 * 1e3, p99_ms=p99 * 1e3, max_ms=peak * 1e3)
+
+def log_latency_stats():
+    """Log loop-start-to-decision latency per symbol."""
+    for symbol, stats in decision_latency.items():
+        event(log, INFO, "Decision latency", rate_limit=False, symbol=symbol, last_ms=stats["last"] * 1e3, max_ms=stats["max"] * 1e3)
+    decision_latency.clear()
+
+def process_symbol(symbol, config, current_time, current_hour):
+    """Fetch data, manage open positions and evaluate the strategy for one symbol."""
+    if clock.monotonic() < symbol_holds.get(symbol, 0.0):
+        return
+
+    # Check if within active hours (prioritize but allow trading outside for very good opportunities)
+    is_active_hour = current_hour in config["active_hours"]
+
+    # Check max trades per day
+    if daily_trade_counts[symbol] >= max_trades_per_day:
+        event(log, DEBUG, "Max trades per day reached", symbol=symbol)
+        return
+
+    account_info = snapshot.account
+    if not account_info:
+        event(log, WARNING, "Failed to get account info", error=mt5.last_error())
+        hold_symbol(symbol, 1)
+        return
+
+    # Fetch current price
+    tick = snapshot.tick(config["symbol"])
+    if not tick or tick.ask == 0.0:
+        event(log, WARNING, "No valid tick, retrying", symbol=symbol)
+        hold_symbol(symbol, 1)
+        return
+    current_price = tick.ask
+    risk.update_price(config["symbol"], tick.bid, tick.ask)
+
+    # Fetch indicators
+    strategy = STRATEGIES[config["strategy"]]
+    evaluation_start = time.perf_counter()
+    latest = get_indicators(config["symbol"], config["timeframe"], strategy)
+    if latest is None:
+        event(log, WARNING, "Failed to get indicators", symbol=symbol)
+        hold_symbol(symbol, 1)
+        return
+    evaluation_time = time.perf_counter() - evaluation_start
+    if log.isEnabledFor(DEBUG):
+        event(log, DEBUG, "Evaluating", symbol=symbol, price=current_price, balance=account_info.balance,
+              equity=account_info.equity, **{name: latest[name] for name in strategy.indicators})
+
+    # Volatility filter: Skip if ATR is too low
+    if strategy.volatility_filter and latest['atr'] < min_atr:  # Adjust threshold based on pair
+        event(log, DEBUG, "Volatility too low, skipping", symbol=symbol, atr=latest['atr'])
+        return
+
+    # Largest lot whose margin stays within max_margin_per_trade and the equity share
+    lot = risk.lot_size(config["symbol"], account_info.equity)
+    if log.isEnabledFor(DEBUG):
+        event(log, DEBUG, "Margin", symbol=symbol, used=risk.total_margin(), new=risk.margin(config["symbol"], lot))
+
+    # Manage existing positions
+    for pos in snapshot.positions_for(config["symbol"]):
+        # Position times are trade server time
+        if clock.time() + scheduler.server_offset - pos.time > max_trade_duration:
+            with order_lock:
+                mt5.Close(config["symbol"], ticket=pos.ticket)
+                snapshot.invalidate()
+            event(log, INFO, "Closed position at time limit", symbol=symbol, ticket=pos.ticket)
             continue
-        latest = df.iloc[-1]
-        print(f"{symbol} - BB Upper: {latest['bb_upper']}, BB Lower: {latest['bb_lower']}, RSI: {latest['rsi']}, ATR: {latest['atr']}")
-
-        # Volatility filter: Skip if ATR is too low
-        if latest['atr'] < 0.0002:  # Adjust threshold based on pair
-            print(f"Volatility too low for {symbol}. Skipping...")
+        trailing.update(pos, strategy.trail_distance(latest, pip_size(symbol), rrr))
+
+    # Check cooldown period
+    if current_time - last_trade_times[symbol] < cooldown_seconds:
+        event(log, DEBUG, "Cooldown active", symbol=symbol,
+              seconds=round(cooldown_seconds - (current_time - last_trade_times[symbol]), 1))
+        return
+
+    # Check correlation filter
+    if not check_correlation_filter(symbol):
+        return
+
+    # Cheap enough for every tick: skip the entry rules while no order could be sent in either direction
+    allowed, reason = risk.can_add(config["symbol"], mt5.ORDER_TYPE_BUY, lot, current_price, account_info.equity)
+    if not allowed and not reason.endswith("exposure"):
+        event(log, DEBUG, "Risk limits reached, skipping", symbol=symbol, reason=reason)
+        return
+
+    # Strategy-specific entry rules, with stronger signals required outside active hours
+    rule_start = time.perf_counter()
+    buy, sell = strategy.entries(latest, current_price, is_active_hour)
+    metrics.observe("strategy_evaluation", evaluation_time + time.perf_counter() - rule_start, strategy=strategy.name)
+    for order_type, signal in ((mt5.ORDER_TYPE_BUY, buy), (mt5.ORDER_TYPE_SELL, sell)):
+        if signal:
+            sl, tp = strategy.stop_levels(latest, current_price, order_type, pip_size(symbol), rrr)
+            execute_trade(symbol, config, order_type, current_price, sl, tp, lot)
+
+def run_symbol(symbol, config, loop_start, current_time, current_hour):
+    """Worker entry point: process one symbol and record its decision latency."""
+    try:
+        with metrics.timer("symbol", symbol=symbol):
+            process_symbol(symbol, config, current_time, current_hour)
+    finally:
+        latency = clock.monotonic() - loop_start
+        stats = decision_latency.setdefault(symbol, {"last": 0.0, "max": 0.0})
+        stats["last"] = latency
+        stats["max"] = max(stats["max"], latency)
+
+def run(until=None, workers=None):
+    """Main trading loop: sleep until the next bar close, tick change or session boundary.
+
+    Runs until clock.time() reaches `until` (the end of a replayed session), or forever.
+    """
+    global snapshot, executor, trailing, last_reset_date, last_stats_time, loop_count, loop_calls, total_loops
+    executor = ThreadPoolExecutor(max_workers=workers or len(securities), thread_name_prefix="symbol")
+    trailing = TrailingStopManager(mt5, order_lock, clock, trailing_min_step_atr, trailing_max_per_second)
+    last_reset_date = datetime.utcfromtimestamp(clock.time()).date()
+    last_stats_time = clock.time()
+    if board is not None:
+        # Resume after a restart
+        daily_trade_counts.update(board.trade_counts(board_row, last_reset_date))
+        last_trade_times.update(board.trade_times(board_row))
+    while until is None or clock.time() < until:
+        current_time = clock.time()
+        if board is not None:
+            board.beat(board_row)
+        if current_time - last_stats_time >= stats_interval:
+            log_bar_cache_stats()
+            log_terminal_stats()
+            log_order_stats()
+            log_correlation_stats()
+            log_latency_stats()
+            log_stage_stats()
+            scheduler.report(current_time)
+            if metrics_json:
+                metrics.write_json(metrics_json)
+            last_stats_time = current_time
+
+        due = scheduler.due(current_time)
+        if not due:
+            wake = min(scheduler.next_wake(), last_stats_time + stats_interval)
+            clock.sleep(max(wake - clock.time(), 0.0))
             continue
-
-        # Calculate lot size to ensure margin does not exceed 25,000 USD
-        lot = calculate_lot_size(config["symbol"], current_price)
-        new_margin = calculate_margin(config["symbol"], lot, current_price)
-        total_margin_used = get_total_margin_used()
-        print(f"Total margin used: {total_margin_used}, New margin for {symbol}: {new_margin}")
-
-        # Manage existing positions
-        positions = mt5.positions_get(symbol=config["symbol"])
-        for pos in positions:
-            open_time = pd.to_datetime(pos.time, unit='s')
-            if (pd.Timestamp.now() - open_time).total_seconds() > max_trade_duration:
-                mt5.Close(config["symbol"], ticket=pos.ticket)
-                print(f"Closed position {pos.ticket} for {symbol} due to time limit")
-                continue
-            modify_trailing_stop(pos, latest['atr'])
-
-        # Check cooldown period
-        if current_time - last_trade_times[symbol] < cooldown_seconds:
-            print(f"Cooldown active for {symbol}. Waiting {cooldown_seconds - (current_time - last_trade_times[symbol]):.1f} seconds.")
+        scheduler.wakeups += 1
+
+        loop_timer = time.perf_counter()
+        loop_start = clock.monotonic()
+        loop_start_calls = mt5.total_calls
+        snapshot = BrokerSnapshot(mt5)
+        risk.sync(snapshot.positions)  # Picks up stop-outs and closes since the last loop
+        if board is not None:
+            share_risk()
+        update_correlations(clock.time())
+        if orders.synchronous:
+            orders.poll()  # Retries that came due while the loop slept
+        current_datetime = datetime.utcfromtimestamp(clock.time())
+        current_date = current_datetime.date()
+        current_hour = current_datetime.hour
+
+        # Reset daily trade counts at 00:00 GMT
+        if current_date != last_reset_date:
+            for symbol in securities.keys():
+                daily_trade_counts[symbol] = 0
+            last_reset_date = current_date
+            event(log, INFO, "Daily trade counts reset")
+
+        # Check total open positions
+        positions = snapshot.positions
+        if len(positions) >= max_open_positions:
+            event(log, INFO, "Max open positions reached, waiting", positions=len(positions))
+            clock.sleep(1)
             continue
 
-        # Check correlation filter
-        if not check_correlation_filter(symbol):
-            continue
+        # Tick-driven symbols are only evaluated when a new tick has arrived
+        due = [symbol for symbol in due
+               if not scheduler.is_tick_driven(symbol)
+               or scheduler.tick_changed(symbol, snapshot.tick(securities[symbol]["symbol"]), current_time)]
+
+        # Evaluate due symbols concurrently; only order submission is serialized
+        futures = [executor.submit(run_symbol, symbol, securities[symbol], loop_start, current_time, current_hour)
+                   for symbol in due]
+        for future in futures:
+            future.result()
+        modify_trailing_stops()
+
+        for symbol in due:
+            schedule_symbol(symbol, securities[symbol], current_time)
+
+        loop_count += 1
+        total_loops += 1
+        loop_calls += mt5.total_calls - loop_start_calls
+        metrics.observe("loop", time.perf_counter() - loop_timer)
+
+def setup_terminal(terminal, rate_limit, synchronous=False):
+    """Put the call counter around `terminal`, register the metric collectors and create the order pipeline."""
+    global mt5, orders
+    mt5 = CountingTerminal(terminal, metrics)  # Every terminal call goes through the counter
+    metrics.add_collector(lambda: {
+        "terminal_calls": {(("function", name),): count for name, count in mt5.counts().items()},
+        "log_suppressed": {(): rate_limit.suppressed},
+        "orders": {(("outcome", name),): count for name, count in orders.stats().items() if name != "queued"},
+        "trailing_stops": {(("outcome", name),): count for name, count in trailing.stats().items()
+                           if name != "pending"} if trailing else {},
+    })
+    orders = OrderPipeline(mt5, order_lock, clock, metrics, order_result, synchronous=synchronous,
+                           max_retries=max_retries,
+                           request_defaults={"deviation": 20, "magic": 123456, "comment": "Multi-Strategy"},
+                           on_unanswered=order_unanswered)
+
+def start(cache_path=None):
+    """Connect, resolve the symbols and build the order specs, risk engine and correlation matrix; False on failure."""
+    global risk, correlations
+    if not connect() or not init_symbols(cache_path):
+        return False
+    orders.prepare(config["symbol"] for config in securities.values())
+    risk = create_risk_engine()
+    correlations = RollingCorrelation([config["symbol"] for config in correlation_securities.values()],
+                                      correlation_window)
+    return True
 
-        # Calculate SL and TP
-        stop_loss_pips = latest['atr'] * 100
-        take_profit_pips = stop_loss_pips * rrr
-        pip_multiplier = 0.01 if "JPY" in symbol else 0.0001
-
-        # Strategy-specific logic with adjusted conditions for non-active hours
-        if config["strategy"] == "mean_reversion":  # EURUSD
-            if current_price < latest['bb_lower'] and current_price > latest['ema200']:
-                if is_active_hour or (not is_active_hour and current_price < latest['bb_lower'] * 0.999):  # Stronger signal outside active hours
-                    sl = current_price - stop_loss_pips * pip_multiplier
-                    tp = current_price + take_profit_pips * pip_multiplier
-                    result = place_order(config["symbol"], mt5.ORDER_TYPE_BUY, current_price, sl, tp, lot)
-                    if result and result.retcode == mt5.TRADE_RETCODE_DONE:
-                        last_trade_times[symbol] = time.time()
-                        daily_trade_counts[symbol] += 1
-                    print(f"Buy attempted for {symbol}: Price={current_price}, SL={sl}, TP={tp}, Lot={lot}")
-
-        elif config["strategy"] == "scalping":  # USDJPY
-            if latest['rsi'] < 30 and latest['stoch'] < 20:
-                if is_active_hour or (not is_active_hour and latest['rsi'] < 20 and latest['stoch'] < 10):  # Stronger signal outside active hours
-                    sl = current_price - (latest['atr'] * 0.5 * pip_multiplier)  # Tight SL for scalping
-                    tp = current_price + (latest['atr'] * 1.0 * pip_multiplier)  # Tight TP
-                    result = place_order(config["symbol"], mt5.ORDER_TYPE_BUY, current_price, sl, tp, lot)
-                    if result and result.retcode == mt5.TRADE_RETCODE_DONE:
-                        last_trade_times[symbol] = time.time()
-                        daily_trade_counts[symbol] += 1
-                    print(f"Buy attempted for {symbol}: Price={current_price}, SL={sl}, TP={tp}, Lot={lot}")
-            elif latest['rsi'] > 70 and latest['stoch'] > 80:
-                if is_active_hour or (not is_active_hour and latest['rsi'] > 80 and latest['stoch'] > 90):  # Stronger signal outside active hours
-                    sl = current_price + (latest['atr'] * 0.5 * pip_multiplier)
-                    tp = current_price - (latest['atr'] * 1.0 * pip_multiplier)
-                    result = place_order(config["symbol"], mt5.ORDER_TYPE_SELL, current_price, sl, tp, lot)
-                    if result and result.retcode == mt5.TRADE_RETCODE_DONE:
-                        last_trade_times[symbol] = time.time()
-                        daily_trade_counts[symbol] += 1
-                    print(f"Sell attempted for {symbol}: Price={current_price}, SL={sl}, TP={tp}, Lot={lot}")
-
-        elif config["strategy"] == "momentum":  # GBPUSD
-            if latest['macd'] > latest['macd_signal'] and df['macd'].iloc[-2] <= df['macd_signal'].iloc[-2]:
-                if is_active_hour or (not is_active_hour and (latest['macd'] - latest['macd_signal']) > 0.0005):  # Stronger signal outside active hours
-                    sl = current_price - stop_loss_pips * pip_multiplier
-                    tp = current_price + take_profit_pips * pip_multiplier
-                    result = place_order(config["symbol"], mt5.ORDER_TYPE_BUY, current_price, sl, tp, lot)
-                    if result and result.retcode == mt5.TRADE_RETCODE_DONE:
-                        last_trade_times[symbol] = time.time()
-                        daily_trade_counts[symbol] += 1
-                    print(f"Buy attempted for {symbol}: Price={current_price}, SL={sl}, TP={tp}, Lot={lot}")
-
-        elif config["strategy"] == "breakout":  # USDCHF
-            if current_price > latest['high_20']:
-                if is_active_hour or (not is_active_hour and current_price > latest['high_20'] * 1.001):  # Stronger signal outside active hours
-                    breakout_range = latest['high_20'] - latest['low_20']
-                    sl = current_price - (breakout_range * 0.5)
-                    tp = current_price + (breakout_range * 0.5 * rrr)
-                    result = place_order(config["symbol"], mt5.ORDER_TYPE_BUY, current_price, sl, tp, lot)
-                    if result and result.retcode == mt5.TRADE_RETCODE_DONE:
-                        last_trade_times[symbol] = time.time()
-                        daily_trade_counts[symbol] += 1
-                    print(f"Buy attempted for {symbol}: Price={current_price}, SL={sl}, TP={tp}, Lot={lot}")
-
-        elif config["strategy"] == "trend_following":  # USDCAD
-            if latest['ema10'] > latest['ema50'] and latest['adx'] > 20:
-                if is_active_hour or (not is_active_hour and latest['adx'] > 30):  # Stronger signal outside active hours
-                    sl = current_price - stop_loss_pips * pip_multiplier
-                    tp = current_price + take_profit_pips * pip_multiplier
-                    result = place_order(config["symbol"], mt5.ORDER_TYPE_BUY, current_price, sl, tp, lot)
-                    if result and result.retcode == mt5.TRADE_RETCODE_DONE:
-                        last_trade_times[symbol] = time.time()
-                        daily_trade_counts[symbol] += 1
-                    print(f"Buy attempted for {symbol}: Price={current_price}, SL={sl}, TP={tp}, Lot={lot}")
-
-        elif config["strategy"] == "rsi_mean_reversion":  # AUDUSD
-            if latest['rsi'] < 30 and current_price > latest['ema200']:
-                if is_active_hour or (not is_active_hour and latest['rsi'] < 20):  # Stronger signal outside active hours
-                    sl = current_price - stop_loss_pips * pip_multiplier
-                    tp = current_price + take_profit_pips * pip_multiplier
-                    result = place_order(config["symbol"], mt5.ORDER_TYPE_BUY, current_price, sl, tp, lot)
-                    if result and result.retcode == mt5.TRADE_RETCODE_DONE:
-                        last_trade_times[symbol] = time.time()
-                        daily_trade_counts[symbol] += 1
-                    print(f"Buy attempted for {symbol}: Price={current_price}, SL={sl}, TP={tp}, Lot={lot}")
-
-        elif config["strategy"] == "volatility_breakout":  # NZDUSD
-            if current_price > latest['high_20'] and latest['atr'] > df['atr'].mean():
-                if is_active_hour or (not is_active_hour and latest['atr'] > df['atr'].mean() * 1.5):  # Stronger signal outside active hours
-                    sl = current_price - stop_loss_pips * pip_multiplier
-                    tp = current_price + take_profit_pips * pip_multiplier
-                    result = place_order(config["symbol"], mt5.ORDER_TYPE_BUY, current_price, sl, tp, lot)
-                    if result and result.retcode == mt5.TRADE_RETCODE_DONE:
-                        last_trade_times[symbol] = time.time()
-                        daily_trade_counts[symbol] += 1
-                    print(f"Buy attempted for {symbol}: Price={current_price}, SL={sl}, TP={tp}, Lot={lot}")
-
-        elif config["strategy"] == "hft_scalping":  # GBPJPY
-            if latest['rsi'] < 30 and latest['stoch'] < 20:
-                if is_active_hour or (not is_active_hour and latest['rsi'] < 20 and latest['stoch'] < 10):  # Stronger signal outside active hours
-                    sl = current_price - (latest['atr'] * 0.3 * pip_multiplier)  # Very tight SL for HFT
-                    tp = current_price + (latest['atr'] * 0.6 * pip_multiplier)  # Very tight TP
-                    result = place_order(config["symbol"], mt5.ORDER_TYPE_BUY, current_price, sl, tp, lot)
-                    if result and result.retcode == mt5.TRADE_RETCODE_DONE:
-                        last_trade_times[symbol] = time.time()
-                        daily_trade_counts[symbol] += 1
-                    print(f"Buy attempted for {symbol}: Price={current_price}, SL={sl}, TP={tp}, Lot={lot}")
-
-        elif config["strategy"] == "stat_arb":  # USDINR
-            z_score = (current_price - df['close'].rolling(window=50).mean()) / df['close'].rolling(window=50).std()
-            if z_score.iloc[-1] < -2:  # Buy if price is 2 std devs below mean
-                if is_active_hour or (not is_active_hour and z_score.iloc[-1] < -3):  # Stronger signal outside active hours
-                    sl = current_price - stop_loss_pips * pip_multiplier
-                    tp = current_price + take_profit_pips * pip_multiplier
-                    result = place_order(config["symbol"], mt5.ORDER_TYPE_BUY, current_price, sl, tp, lot)
-                    if result and result.retcode == mt5.TRADE_RETCODE_DONE:
-                        last_trade_times[symbol] = time.time()
-                        daily_trade_counts[symbol] += 1
-                    print(f"Buy attempted for {symbol}: Price={current_price}, SL={sl}, TP={tp}, Lot={lot}")
-
-    time.sleep(1)  # Check every second
\ No newline at end of file
+def main():
+    global clock, metrics_json
+    parser = argparse.ArgumentParser(description="Multi-strategy Forex bot for MetaTrader 5")
+    parser.add_argument("--record", metavar="PATH", help="record the live session's market data to PATH (.npz)")
+    parser.add_argument("--replay", metavar="PATH", help="run against a recorded session instead of the terminal")
+    parser.add_argument("--balance", type=float, help="starting balance for a replay, default the recorded one")
+    parser.add_argument("--log-level", default="INFO", help="DEBUG for per-symbol detail, WARNING to keep the hot path quiet")
+    parser.add_argument("--log-burst", type=int, default=5,
+                        help="lines per message and symbol allowed every --log-interval seconds")
+    parser.add_argument("--log-interval", type=float, default=60.0)
+    parser.add_argument("--metrics-port", type=int, help="serve Prometheus metrics on http://127.0.0.1:PORT/metrics")
+    parser.add_argument("--metrics-json", metavar="PATH", help="dump metrics as JSON to PATH every stats interval")
+    args = parser.parse_args()
+    rate_limit = setup_logging(args.log_level, args.log_burst, args.log_interval)
+
+    # A new pair only needs a securities entry naming one of the registered strategies
+    for symbol, config in securities.items():
+        if config["strategy"] not in STRATEGIES:
+            event(log, ERROR, "Unknown strategy", symbol=symbol, strategy=config["strategy"], registered=",".join(sorted(STRATEGIES)))
+            exit()
+
+    recorder = None
+    if args.replay:
+        terminal = FakeTerminal(args.replay, balance=args.balance)
+        clock = rate_limit.clock = terminal.clock  # Log rate limits run on simulated time too
+    else:
+        if MetaTrader5 is None:
+            event(log, ERROR, "The MetaTrader5 package is not installed; use --replay to run a recorded session")
+            exit()
+        terminal = MetaTrader5
+        if args.record:
+            terminal = recorder = RecordingTerminal(MetaTrader5, args.record)
+    # Replays send orders inline so their results stay deterministic
+    setup_terminal(terminal, rate_limit, synchronous=bool(args.replay))
+    metrics_json = args.metrics_json
+    if args.metrics_port:
+        metrics.serve(args.metrics_port)
+
+    started = time.perf_counter()
+    try:
+        # Replays resolve from the recorded listing every time
+        if not start(None if args.replay else symbol_cache):
+            return
+        # A replay evaluates symbols one at a time so its orders are deterministic
+        run(until=terminal.end_time if args.replay else None, workers=1 if args.replay else None)
+    finally:
+        mt5.shutdown()
+        if recorder is not None:
+            recorder.save()
+            event(log, INFO, "Session recorded", path=args.record)
+        if metrics_json:
+            metrics.write_json(metrics_json)
+        if args.replay:
+            elapsed = time.perf_counter() - started
+            simulated = terminal.end_time - terminal.start_time
+            event(log, INFO, "Replay finished", rate_limit=False, simulated_s=round(simulated), elapsed_s=round(elapsed, 1),
+                  speedup=round(simulated / max(elapsed, 1e-9)), loops=total_loops, terminal_calls=mt5.total_calls,
+                  **terminal.report())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,658 @@
+import math
+from collections import deque
+
+import numpy as np
+
+# pandas and ta are imported inside the batch functions below: the live loop only runs
+# IndicatorEngine, which needs NumPy alone, and starts without loading them
+
+WINDOW = 200  # Bars per indicator window (what get_indicators always pulled)
+ATR_WINDOW = 14 + 50  # Bars the stop ATR is taken over: its 14-bar seed plus 50 bars of Wilder warmup
+
+# Indicator groups: the latest() keys each one produces and the bars of history it needs.
+# ta seeds its EMA/Wilder series at the first bar of the frame, so those groups need the
+# full window to reproduce it; rolling-window groups only need their own span. 'atr' is ta's
+# ATR over the last ATR_WINDOW bars of the window whatever its length, so a strategy reading
+# only it (stops, min_atr filter) needs ATR_WINDOW bars; 'atr_mean' averages the full window's.
+INDICATOR_GROUPS = {
+    "ema10": (("ema10",), WINDOW),
+    "ema50": (("ema50",), WINDOW),
+    "ema200": (("ema200",), WINDOW),
+    "macd": (("macd", "macd_signal", "macd_prev", "macd_signal_prev"), WINDOW),
+    "rsi": (("rsi",), WINDOW),
+    "atr": (("atr",), ATR_WINDOW),
+    "atr_mean": (("atr_mean",), WINDOW),
+    "adx": (("adx",), WINDOW),
+    "bollinger": (("bb_upper", "bb_lower"), 20),
+    "stoch": (("stoch",), 14),
+    "range20": (("high_20", "low_20"), 20),
+    "zscore": (("close_mean50", "close_std50"), 50),
+}
+INDICATOR_KEYS = {key: group for group, (keys, _) in INDICATOR_GROUPS.items() for key in keys}
+
+
+def indicator_groups(indicators=None):
+    """Groups needed for the given latest() keys, or every group for None; time and close are always present."""
+    if indicators is None:
+        return set(INDICATOR_GROUPS)
+    unknown = set(indicators) - set(INDICATOR_KEYS) - {"time", "close"}
+    if unknown:
+        raise ValueError(f"Unknown indicators: {sorted(unknown)}")
+    return {INDICATOR_KEYS[key] for key in indicators if key in INDICATOR_KEYS}
+
+
+def lookback(indicators=None):
+    """Bars (closed plus the forming one) the given latest() keys need."""
+    return max((INDICATOR_GROUPS[group][1] for group in indicator_groups(indicators)), default=2)
+
+
+def compute_indicators(rates):
+    """Calculate technical indicators over a full window of OHLC bars (reference implementation)."""
+    import pandas as pd
+    from ta.momentum import RSIIndicator, StochasticOscillator
+    from ta.trend import ADXIndicator, EMAIndicator, MACD
+    from ta.volatility import AverageTrueRange, BollingerBands
+
+    df = pd.DataFrame(rates)
+    df['time'] = pd.to_datetime(df['time'], unit='s')
+
+    # Calculate indicators
+    df['ema10'] = EMAIndicator(close=df['close'], window=10).ema_indicator()
+    df['ema50'] = EMAIndicator(close=df['close'], window=50).ema_indicator()
+    df['ema200'] = EMAIndicator(close=df['close'], window=200).ema_indicator()
+    bb = BollingerBands(close=df['close'], window=20, window_dev=2.0)
+    df['bb_upper'] = bb.bollinger_hband()
+    df['bb_lower'] = bb.bollinger_lband()
+    rsi = RSIIndicator(close=df['close'], window=14)
+    df['rsi'] = rsi.rsi()
+    stoch = StochasticOscillator(high=df['high'], low=df['low'], close=df['close'], window=14, smooth_window=3)
+    df['stoch'] = stoch.stoch()
+    atr = AverageTrueRange(high=df['high'], low=df['low'], close=df['close'], window=14)
+    df['atr'] = atr.average_true_range()
+    adx = ADXIndicator(high=df['high'], low=df['low'], close=df['close'], window=14)
+    df['adx'] = adx.adx()
+    macd = MACD(close=df['close'], window_fast=12, window_slow=26, window_sign=9)
+    df['macd'] = macd.macd()
+    df['macd_signal'] = macd.macd_signal()
+    df['high_20'] = df['high'].rolling(window=20).max()
+    df['low_20'] = df['low'].rolling(window=20).min()
+    return df
+
+
+def latest_from_frame(df):
+    """Extract the values the trading loop reads from a compute_indicators() frame."""
+    from ta.volatility import AverageTrueRange
+
+    latest = df.iloc[-1]
+    closes = df['close'].iloc[-50:]
+    tail = df.iloc[-ATR_WINDOW:]
+    atr = AverageTrueRange(high=tail['high'], low=tail['low'], close=tail['close'], window=14).average_true_range()
+    return {
+        "time": int(df['time'].iloc[-1].timestamp()),
+        "close": latest['close'],
+        "ema10": latest['ema10'],
+        "ema50": latest['ema50'],
+        "ema200": latest['ema200'],
+        "bb_upper": latest['bb_upper'],
+        "bb_lower": latest['bb_lower'],
+        "rsi": latest['rsi'],
+        "stoch": latest['stoch'],
+        "atr": atr.iloc[-1],
+        "atr_mean": df['atr'].mean(),
+        "adx": latest['adx'],
+        "macd": latest['macd'],
+        "macd_signal": latest['macd_signal'],
+        "macd_prev": df['macd'].iloc[-2],
+        "macd_signal_prev": df['macd_signal'].iloc[-2],
+        "high_20": latest['high_20'],
+        "low_20": latest['low_20'],
+        "close_mean50": closes.mean(),
+        "close_std50": closes.std(),
+    }
+
+
+class _RollingSum:
+    """Sum of the last `width` pushed values, re-summed every `width` pushes to bound drift."""
+
+    def __init__(self, width):
+        self.width = width
+        self.values = deque(maxlen=width)
+        self.total = 0.0
+        self._pushes = 0
+
+    def push(self, value):
+        if len(self.values) == self.width:
+            self.total -= self.values[0]
+        self.values.append(value)
+        self.total += value
+        self._pushes += 1
+        if self._pushes >= self.width:
+            self.total = math.fsum(self.values)
+            self._pushes = 0
+
+
+class _RollingExtreme:
+    """Monotonic deque giving the max (or min) of the last `width` pushed values in O(1) amortized."""
+
+    def __init__(self, width, is_max):
+        self.width = width
+        self.is_max = is_max
+        self.items = deque()
+        self.count = 0
+
+    def push(self, value):
+        items = self.items
+        if self.is_max:
+            while items and items[-1][1] <= value:
+                items.pop()
+        else:
+            while items and items[-1][1] >= value:
+                items.pop()
+        items.append((self.count, value))
+        self.count += 1
+        while items[0][0] <= self.count - 1 - self.width:
+            items.popleft()
+
+    def value(self):
+        return self.items[0][1]
+
+
+def _true_range(high, low, prev_close):
+    return max(high - low, abs(high - prev_close), abs(low - prev_close))
+
+
+def _window_signal_gain(r_ema, window, start=25, span=9):
+    """Response of ta's windowed MACD signal EMA to the geometric term r_ema**p, at the last two window positions."""
+    a9 = 2.0 / (span + 1)
+    gain = r_ema ** start
+    gains = {start: gain}
+    for p in range(start + 1, window):
+        gain = (1 - a9) * gain + a9 * r_ema ** p
+        gains[p] = gain
+    return gains[window - 1], gains[window - 2]
+
+
+class IndicatorEngine:
+    """Incremental indicator state for one (symbol, timeframe) series.
+
+    Reproduces what compute_indicators() returns for the last row of a `window`-bar
+    frame whose last bar is still forming. ta seeds every EMA/Wilder series at the
+    first bar of the frame, so each smoother keeps a full-history recursion plus the
+    decayed difference from the window-start seed; that correction is fixed once a
+    bar closes. push() is O(1) except ADX, whose non-linear DX is re-run over the
+    cached window on bar close only. latest() is O(1) and only touches the forming bar.
+
+    `indicators` limits the state kept and the keys returned to what those latest()
+    keys need (see INDICATOR_GROUPS); None computes everything.
+    """
+
+    def __init__(self, window=WINDOW, indicators=None):
+        self.window = window
+        self.groups = indicator_groups(indicators)
+        if lookback(indicators) > window:
+            raise ValueError(f"{sorted(self.groups)} need {lookback(indicators)} bars, window is {window}")
+        groups = self.groups
+        self._spans = tuple(span for span in (10, 50, 200) if f"ema{span}" in groups)
+        if "macd" in groups:
+            self._spans += (12, 26)
+        self._wilder_needed = "atr" in groups or "atr_mean" in groups
+        self._tr_needed = self._wilder_needed or "adx" in groups
+        self._atr_start = window - ATR_WINDOW  # First closed bar of the ATR's own window
+        self.reset()
+
+        n = window
+        self._a = {span: 2.0 / (span + 1) for span in (10, 50, 200, 12, 26, 9)}
+        self._a_wilder = 1.0 / 14
+        r_w = 1 - self._a_wilder
+        self._decay = {span: (1 - a) ** (n - 1) for span, a in self._a.items()}
+        self._decay_prev = {span: (1 - a) ** (n - 2) for span, a in self._a.items()}
+        if "macd" in groups:
+            self._signal_decay = (1 - self._a[9]) ** (n - 1 - 25)
+            self._signal_decay_prev = (1 - self._a[9]) ** (n - 2 - 25)
+            self._gain_fast, self._gain_fast_prev = _window_signal_gain(1 - self._a[12], n)
+            self._gain_slow, self._gain_slow_prev = _window_signal_gain(1 - self._a[26], n)
+        self._rsi_decay = r_w ** (n - 1)
+        self._atr_decay = r_w ** (ATR_WINDOW - 14)
+        self._atr_geo = sum(r_w ** j for j in range(n - 13))
+
+    def reset(self):
+        """Drop all state; the next push() starts a fresh window."""
+        closed = self.window - 1
+        self.last_time = None
+        self.bars = 0
+        self._ref = None
+        self._close = deque(maxlen=closed)
+        self._high = deque(maxlen=closed)
+        self._low = deque(maxlen=closed)
+        self._tr = deque(maxlen=closed)
+        self._pos = deque(maxlen=closed)
+        self._neg = deque(maxlen=closed)
+        self._ema = {span: deque(maxlen=closed) for span in self._spans}
+        self._macd = deque(maxlen=closed)
+        self._signal = deque(maxlen=closed)
+        self._up = deque(maxlen=closed)
+        self._down = deque(maxlen=closed)
+        self._wilder_tr = deque(maxlen=closed)
+        self._atr_sum = _RollingSum(closed - 13) if "atr_mean" in self.groups else None
+        self._bb_sum = _RollingSum(19)
+        self._bb_sq = _RollingSum(19)
+        self._z_sum = _RollingSum(49)
+        self._z_sq = _RollingSum(49)
+        self._high_20 = _RollingExtreme(19, True)
+        self._low_20 = _RollingExtreme(19, False)
+        self._high_14 = _RollingExtreme(13, True)
+        self._low_14 = _RollingExtreme(13, False)
+        self._closed = None
+
+    @property
+    def ready(self):
+        return len(self._close) == self.window - 1
+
+    def seed(self, rates):
+        """Rebuild state from closed bars (oldest first); only the last window-1 are kept."""
+        self.reset()
+        for bar in rates[-(self.window - 1):]:
+            self.push(bar)
+
+    def push(self, bar):
+        """Fold a bar that has just closed into the running state."""
+        close, high, low = float(bar['close']), float(bar['high']), float(bar['low'])
+        if self._ref is None:
+            self._ref = close
+            prev_close = None
+        else:
+            prev_close = self._close[-1]
+
+        groups = self.groups
+        a = self._a_wilder
+        for span, series in self._ema.items():
+            series.append(close if prev_close is None else self._a[span] * close + (1 - self._a[span]) * series[-1])
+        if "macd" in groups:
+            if prev_close is None:
+                self._macd.append(0.0)
+                self._signal.append(0.0)
+            else:
+                macd = self._ema[12][-1] - self._ema[26][-1]
+                self._macd.append(macd)
+                self._signal.append(self._a[9] * macd + (1 - self._a[9]) * self._signal[-1])
+        if "rsi" in groups:
+            if prev_close is None:
+                self._up.append(0.0)
+                self._down.append(0.0)
+            else:
+                diff = close - prev_close
+                self._up.append(a * max(diff, 0.0) + (1 - a) * self._up[-1])
+                self._down.append(a * max(-diff, 0.0) + (1 - a) * self._down[-1])
+        if self._tr_needed:
+            tr = high - low if prev_close is None else _true_range(high, low, prev_close)
+            self._tr.append(tr)
+        if self._wilder_needed:
+            self._wilder_tr.append(tr if prev_close is None else a * tr + (1 - a) * self._wilder_tr[-1])
+        if "atr_mean" in groups:
+            self._atr_sum.push(self._wilder_tr[-1])
+        if "adx" in groups:
+            if prev_close is None:
+                pos, neg = 0.0, 0.0
+            else:
+                diff_up = high - self._high[-1]
+                diff_down = self._low[-1] - low
+                pos = diff_up if diff_up > diff_down and diff_up > 0 else 0.0
+                neg = diff_down if diff_down > diff_up and diff_down > 0 else 0.0
+            self._pos.append(pos)
+            self._neg.append(neg)
+
+        self._close.append(close)
+        self._high.append(high)
+        self._low.append(low)
+        centred = close - self._ref
+        if "bollinger" in groups:
+            self._bb_sum.push(centred)
+            self._bb_sq.push(centred * centred)
+        if "zscore" in groups:
+            self._z_sum.push(centred)
+            self._z_sq.push(centred * centred)
+        if "range20" in groups:
+            self._high_20.push(high)
+            self._low_20.push(low)
+        if "stoch" in groups:
+            self._high_14.push(high)
+            self._low_14.push(low)
+        self.last_time = int(bar['time'])
+        self.bars += 1
+        self._closed = self._closed_terms() if self.ready else None
+
+    def _closed_terms(self):
+        """Window-start corrections and ADX state that stay fixed until the next bar closes."""
+        groups = self.groups
+        first_close = self._close[0]
+        terms = {}
+        for span in self._spans:
+            if span in (10, 50, 200):
+                terms[f"ema{span}"] = self._decay[span] * (first_close - self._ema[span][0])
+
+        if "macd" in groups:
+            fast_gap = first_close - self._ema[12][0]
+            slow_gap = first_close - self._ema[26][0]
+            signal_gap = self._macd[25] - self._signal[25]
+            terms["macd"] = self._decay[12] * fast_gap - self._decay[26] * slow_gap
+            terms["macd_signal"] = (self._signal_decay * signal_gap
+                                    + self._gain_fast * fast_gap - self._gain_slow * slow_gap)
+            terms["macd_prev"] = (self._macd[-1]
+                                  + self._decay_prev[12] * fast_gap - self._decay_prev[26] * slow_gap)
+            terms["macd_signal_prev"] = (self._signal[-1] + self._signal_decay_prev * signal_gap
+                                         + self._gain_fast_prev * fast_gap - self._gain_slow_prev * slow_gap)
+        if "rsi" in groups:
+            terms["rsi_up"] = -self._rsi_decay * self._up[0]
+            terms["rsi_down"] = -self._rsi_decay * self._down[0]
+
+        tr = self._tr
+        # ATR: ta seeds with the mean of the first 14 true ranges of its frame, the first being high - low
+        if "atr" in groups:
+            s = self._atr_start
+            atr_seed = (self._high[s] - self._low[s] + sum(tr[p] for p in range(s + 1, s + 14))) / 14
+            terms["atr"] = self._atr_decay * (atr_seed - self._wilder_tr[s + 13])
+        if "atr_mean" in groups:
+            atr_seed = (self._high[0] - self._low[0] + sum(tr[p] for p in range(1, 14))) / 14
+            terms["atr_tail"] = (atr_seed - self._wilder_tr[13]) * self._atr_geo
+
+        if "adx" in groups:
+            # ADX: replay ta's Wilder sums over the closed part of the window
+            pos, neg = self._pos, self._neg
+            trs = sum(tr[p] for p in range(1, 15))
+            dip = sum(pos[p] for p in range(1, 15))
+            din = sum(neg[p] for p in range(1, 15))
+            dx_sum = _directional_index(trs, dip, din)
+            adx = None
+            for i in range(1, self.window - 15):
+                trs = trs - (trs / 14.0) + tr[14 + i]
+                dip = dip - (dip / 14.0) + pos[14 + i]
+                din = din - (din / 14.0) + neg[14 + i]
+                dx = _directional_index(trs, dip, din)
+                if i < 14:
+                    dx_sum += dx
+                    if i == 13:
+                        adx = dx_sum / 14
+                else:
+                    adx = ((adx * 13) + dx) / 14.0
+            terms["adx_state"] = (trs, dip, din, adx)
+        return terms
+
+    def latest(self, forming):
+        """Indicator values with `forming` as the last bar of the window, or None until seeded."""
+        if not self.ready:
+            return None
+        groups = self.groups
+        terms = self._closed
+        close, high, low = float(forming['close']), float(forming['high']), float(forming['low'])
+        prev_close = self._close[-1]
+        a = self._a
+        a_w = self._a_wilder
+        values = {"time": int(forming['time']), "close": close}
+
+        ema = {span: a[span] * close + (1 - a[span]) * self._ema[span][-1] for span in self._spans}
+        for span in (10, 50, 200):
+            if span in ema:
+                values[f"ema{span}"] = ema[span] + terms[f"ema{span}"]
+
+        if "macd" in groups:
+            macd_full = ema[12] - ema[26]
+            signal_full = a[9] * macd_full + (1 - a[9]) * self._signal[-1]
+            values["macd"] = macd_full + terms["macd"]
+            values["macd_signal"] = signal_full + terms["macd_signal"]
+            values["macd_prev"] = terms["macd_prev"]
+            values["macd_signal_prev"] = terms["macd_signal_prev"]
+
+        if "rsi" in groups:
+            diff = close - prev_close
+            up = a_w * max(diff, 0.0) + (1 - a_w) * self._up[-1] + terms["rsi_up"]
+            down = a_w * max(-diff, 0.0) + (1 - a_w) * self._down[-1] + terms["rsi_down"]
+            values["rsi"] = 100.0 if down == 0 else 100 - (100 / (1 + up / down))
+
+        if self._tr_needed:
+            tr = _true_range(high, low, prev_close)
+        if self._wilder_needed:
+            wilder_tr = a_w * tr + (1 - a_w) * self._wilder_tr[-1]
+        if "atr" in groups:
+            values["atr"] = wilder_tr + terms["atr"]
+        if "atr_mean" in groups:
+            values["atr_mean"] = (self._atr_sum.total + wilder_tr + terms["atr_tail"]) / self.window
+
+        if "adx" in groups:
+            trs, dip, din, adx = terms["adx_state"]
+            diff_up = high - self._high[-1]
+            diff_down = self._low[-1] - low
+            pos = diff_up if diff_up > diff_down and diff_up > 0 else 0.0
+            neg = diff_down if diff_down > diff_up and diff_down > 0 else 0.0
+            dx = _directional_index(trs - (trs / 14.0) + tr, dip - (dip / 14.0) + pos, din - (din / 14.0) + neg)
+            values["adx"] = ((adx * 13) + dx) / 14.0
+
+        centred = close - self._ref
+        if "bollinger" in groups:
+            bb_sum = self._bb_sum.total + centred
+            bb_var = max((self._bb_sq.total + centred * centred - bb_sum * bb_sum / 20) / 20, 0.0)
+            bb_mid = self._ref + bb_sum / 20
+            bb_dev = 2.0 * math.sqrt(bb_var)
+            values["bb_upper"] = bb_mid + bb_dev
+            values["bb_lower"] = bb_mid - bb_dev
+
+        if "stoch" in groups:
+            low_14 = min(self._low_14.value(), low)
+            high_14 = max(self._high_14.value(), high)
+            values["stoch"] = 100 * (close - low_14) / (high_14 - low_14) if high_14 != low_14 else float('nan')
+
+        if "range20" in groups:
+            values["high_20"] = max(self._high_20.value(), high)
+            values["low_20"] = min(self._low_20.value(), low)
+
+        if "zscore" in groups:
+            z_sum = self._z_sum.total + centred
+            z_var = max((self._z_sq.total + centred * centred - z_sum * z_sum / 50) / 49, 0.0)
+            values["close_mean50"] = self._ref + z_sum / 50
+            values["close_std50"] = math.sqrt(z_var)
+        return values
+
+
+def _directional_index(trs, dip, din):
+    """ta's DX for one row, including its zero guards."""
+    dip = 100 * (dip / trs) if trs != 0 else 0
+    din = 100 * (din / trs) if trs != 0 else 0
+    if dip + din == 0:
+        return 0
+    return 100 * abs((dip - din) / (dip + din))
+
+
+def _ewm(values, alpha):
+    import pandas as pd
+    return pd.Series(values).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+
+
+def _window_sum(values, width):
+    """Sum of every `width` consecutive values; entry k covers values[k:k + width]."""
+    return np.lib.stride_tricks.sliding_window_view(values, width).sum(axis=1)
+
+
+def _directional_index_array(trs, dip, din):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dip = 100 * (dip / trs)
+        din = 100 * (din / trs)
+        dx = 100 * np.abs((dip - din) / (dip + din))
+    # ta's zero guards: a zero true-range sum or zero directional movement gives DX 0
+    dx[~np.isfinite(dx)] = 0.0
+    return dx
+
+
+def _adx_windows(tr, pos, neg, window, forming_tr, forming_pos, forming_neg, block=4096):
+    """ta's windowed ADX for every window, replaying its Wilder sums one window offset at a time.
+
+    The closed bars of each window come from tr/pos/neg and its last step from the forming_*
+    arrays (one entry per window), as IndicatorEngine.latest() does. Windows are processed
+    in blocks so the working arrays stay in cache.
+    """
+    tr_sums = _window_sum(tr, 14)
+    pos_sums = _window_sum(pos, 14)
+    neg_sums = _window_sum(neg, 14)
+    windows = len(tr) - window + 1
+    adx_all = np.empty(windows)
+    for first in range(0, windows, block):
+        size = min(block, windows - first)
+        trs = tr_sums[first + 1:first + 1 + size]
+        dip = pos_sums[first + 1:first + 1 + size]
+        din = neg_sums[first + 1:first + 1 + size]
+        dx_sum = _directional_index_array(trs, dip, din)
+        adx = None
+        for i in range(1, window - 14):
+            if i < window - 15:
+                step = slice(first + 14 + i, first + 14 + i + size)  # Bar at offset 14 + i of every window
+                step_tr, step_pos, step_neg = tr[step], pos[step], neg[step]
+            else:  # Forming bar
+                step = slice(first, first + size)
+                step_tr, step_pos, step_neg = forming_tr[step], forming_pos[step], forming_neg[step]
+            trs = trs - (trs / 14.0) + step_tr
+            dip = dip - (dip / 14.0) + step_pos
+            din = din - (din / 14.0) + step_neg
+            dx = _directional_index_array(trs, dip, din)
+            if i < 14:
+                dx_sum = dx_sum + dx
+                if i == 13:
+                    adx = dx_sum / 14
+            else:
+                adx = ((adx * 13) + dx) / 14.0
+        adx_all[first:first + size] = adx
+    return adx_all
+
+
+def _rolling(values, width, method, **kwargs):
+    import pandas as pd
+    return getattr(pd.Series(values).rolling(width), method)(**kwargs).to_numpy()
+
+
+def compute_window_columns(rates, window=WINDOW, indicators=None, forming=None):
+    """IndicatorEngine.latest() for every bar at once, each bar's window ending in a forming bar.
+
+    Window k holds the closed bars rates[k - window + 1:k] and forming[k] as its forming bar,
+    like engine.seed(rates[k - window + 1:k]) followed by engine.latest(forming[k]). By
+    default `forming` is `rates` itself, i.e. every bar in its final state. Uses the same
+    full-history recursions and window-start corrections as the engine, as NumPy column
+    operations. Rows before the first full window are NaN. Like the engine, `indicators`
+    limits the columns computed to what those keys need.
+    """
+    forming = rates if forming is None else forming
+    groups = indicator_groups(indicators)
+    close = rates['close'].astype(float)
+    high = rates['high'].astype(float)
+    low = rates['low'].astype(float)
+    count = len(close)
+    columns = {key: np.full(count, np.nan) for group in groups for key in INDICATOR_GROUPS[group][0]}
+    columns["time"] = forming['time'].astype(np.int64)
+    columns["close"] = forming['close'].astype(float)
+    if count < window:
+        return columns
+    end = np.arange(window - 1, count)  # Forming bar of each window
+    start = end - window + 1
+    prev = end - 1  # Last closed bar of each window
+    f_close = columns["close"][end]
+    f_high = forming['high'].astype(float)[end]
+    f_low = forming['low'].astype(float)[end]
+
+    prev_close = np.concatenate(([close[0]], close[:-1]))
+    tr = np.maximum.reduce([high - low, np.abs(high - prev_close), np.abs(low - prev_close)])
+    tr[0] = high[0] - low[0]
+    f_tr = np.maximum.reduce([f_high - f_low, np.abs(f_high - close[prev]), np.abs(f_low - close[prev])])
+    r_w = 1 - 1.0 / 14
+
+    ema = {}
+    f_ema = {}
+    for span in (10, 50, 200, 12, 26):
+        if f"ema{span}" in groups or (span in (12, 26) and "macd" in groups):
+            a = 2.0 / (span + 1)
+            ema[span] = _ewm(close, a)
+            f_ema[span] = a * f_close + (1 - a) * ema[span][prev]
+            if span in (10, 50, 200):
+                columns[f"ema{span}"][end] = f_ema[span] + (1 - a) ** (window - 1) * (close[start] - ema[span][start])
+
+    if "macd" in groups:
+        # MACD: same decomposition as IndicatorEngine._closed_terms()
+        r_fast, r_slow, r_sig = 1 - 2.0 / 13, 1 - 2.0 / 27, 0.8
+        macd_full = ema[12] - ema[26]
+        signal_full = _ewm(macd_full, 0.2)
+        f_macd = f_ema[12] - f_ema[26]
+        f_signal = 0.2 * f_macd + r_sig * signal_full[prev]
+        fast_gap = close[start] - ema[12][start]
+        slow_gap = close[start] - ema[26][start]
+        signal_gap = macd_full[start + 25] - signal_full[start + 25]
+        gain_fast, gain_fast_prev = _window_signal_gain(r_fast, window)
+        gain_slow, gain_slow_prev = _window_signal_gain(r_slow, window)
+        columns["macd"][end] = f_macd + r_fast ** (window - 1) * fast_gap - r_slow ** (window - 1) * slow_gap
+        columns["macd_signal"][end] = (f_signal + r_sig ** (window - 26) * signal_gap
+                                       + gain_fast * fast_gap - gain_slow * slow_gap)
+        columns["macd_prev"][end] = (macd_full[prev] + r_fast ** (window - 2) * fast_gap
+                                     - r_slow ** (window - 2) * slow_gap)
+        columns["macd_signal_prev"][end] = (signal_full[prev] + r_sig ** (window - 27) * signal_gap
+                                            + gain_fast_prev * fast_gap - gain_slow_prev * slow_gap)
+
+    if "rsi" in groups:
+        # RSI: ta seeds the up/down averages with 0 at the window start
+        diff = close - prev_close
+        up = _ewm(np.maximum(diff, 0.0), 1.0 / 14)
+        down = _ewm(np.maximum(-diff, 0.0), 1.0 / 14)
+        f_diff = f_close - close[prev]
+        up_w = np.maximum(f_diff, 0.0) / 14 + r_w * up[prev] - r_w ** (window - 1) * up[start]
+        down_w = np.maximum(-f_diff, 0.0) / 14 + r_w * down[prev] - r_w ** (window - 1) * down[start]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            columns["rsi"][end] = np.where(down_w == 0, 100.0, 100 - (100 / (1 + up_w / down_w)))
+
+    if "atr" in groups or "atr_mean" in groups:
+        wilder_tr = _ewm(tr, 1.0 / 14)
+        f_wilder_tr = f_tr / 14 + r_w * wilder_tr[prev]
+    if "atr" in groups:
+        # ATR over the last ATR_WINDOW bars of each window
+        atr_start = end - ATR_WINDOW + 1
+        atr_seed = (high[atr_start] - low[atr_start] + _window_sum(tr, 13)[atr_start + 1]) / 14
+        columns["atr"][end] = f_wilder_tr + r_w ** (ATR_WINDOW - 14) * (atr_seed - wilder_tr[atr_start + 13])
+    if "atr_mean" in groups:
+        # Mean of the window's ATR column, seeded at the window start
+        atr_seed = (high[start] - low[start] + _window_sum(tr, 13)[start + 1]) / 14
+        atr_gap = atr_seed - wilder_tr[start + 13]
+        atr_geo = sum(r_w ** j for j in range(window - 13))
+        columns["atr_mean"][end] = (_window_sum(wilder_tr, window - 14)[start + 13] + f_wilder_tr
+                                    + atr_gap * atr_geo) / window
+
+    if "adx" in groups:
+        # ADX: ta's Wilder sums replayed for all windows at once, one window offset per step
+        prev_high = np.concatenate(([high[0]], high[:-1]))
+        prev_low = np.concatenate(([low[0]], low[:-1]))
+        diff_up = high - prev_high
+        diff_down = prev_low - low
+        pos = np.where((diff_up > diff_down) & (diff_up > 0), diff_up, 0.0)
+        neg = np.where((diff_down > diff_up) & (diff_down > 0), diff_down, 0.0)
+        diff_up = f_high - high[prev]
+        diff_down = low[prev] - f_low
+        f_pos = np.where((diff_up > diff_down) & (diff_up > 0), diff_up, 0.0)
+        f_neg = np.where((diff_down > diff_up) & (diff_down > 0), diff_down, 0.0)
+        columns["adx"][end] = _adx_windows(tr, pos, neg, window, f_tr, f_pos, f_neg)
+
+    # Rolling-window indicators do not depend on the window start: the closed bars' mean and
+    # squared deviations are combined with the forming bar (Welford's update)
+    if "bollinger" in groups:
+        mean = _rolling(close, 19, "mean")[prev]
+        delta = f_close - mean
+        mavg = mean + delta / 20
+        mstd = np.sqrt((_rolling(close, 19, "var", ddof=0)[prev] * 19 + delta * delta * 19 / 20) / 20)
+        columns["bb_upper"][end] = mavg + 2.0 * mstd
+        columns["bb_lower"][end] = mavg - 2.0 * mstd
+    if "stoch" in groups:
+        low_14 = np.minimum(_rolling(low, 13, "min")[prev], f_low)
+        high_14 = np.maximum(_rolling(high, 13, "max")[prev], f_high)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            stoch = 100 * (f_close - low_14) / (high_14 - low_14)
+        columns["stoch"][end] = np.where(high_14 != low_14, stoch, np.nan)
+    if "range20" in groups:
+        columns["high_20"][end] = np.maximum(_rolling(high, 19, "max")[prev], f_high)
+        columns["low_20"][end] = np.minimum(_rolling(low, 19, "min")[prev], f_low)
+    if "zscore" in groups:
+        mean = _rolling(close, 49, "mean")[prev]
+        delta = f_close - mean
+        columns["close_mean50"][end] = mean + delta / 50
+        columns["close_std50"][end] = np.sqrt((_rolling(close, 49, "var", ddof=0)[prev] * 49
+                                               + delta * delta * 49 / 50) / 49)
+    return columns
@@ -0,0 +1,88 @@
+"""Leveled, rate-limited key=value logging for the trading loop.
+
+    event(log, logging.INFO, "Order placed", symbol="EURUSDm", order=1234)
+
+writes `2026-01-05 10:00:00,123 INFO forex9 Order placed symbol=EURUSDm order=1234`.
+event() checks the level before building the record, so DEBUG events in the hot path
+cost one comparison when DEBUG is off. Each (message, symbol) pair passes at most
+`burst` records per `interval` seconds of its clock (replays pass their SimClock); the
+next record that gets through carries a suppressed=N field. ERROR and above, and periodic reports logged with
+rate_limit=False, are never dropped.
+"""
+import logging
+import threading
+import time
+
+
+def event(logger, level, message, rate_limit=True, **fields):
+    """Log `message` with key=value fields if `level` is enabled."""
+    if logger.isEnabledFor(level):
+        logger.log(level, message, extra={"fields": fields, "rate_limit": rate_limit})
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        return f"{value:.6g}"
+    text = str(value)
+    if not text or " " in text or "=" in text:
+        return '"' + text.replace('"', '\\"') + '"'
+    return text
+
+
+class KeyValueFormatter(logging.Formatter):
+    def __init__(self, process_names=False):
+        # Supervised workers tag their lines with the process (shard) name
+        super().__init__("%(asctime)s %(levelname)s " + ("%(processName)s " if process_names else "")
+                         + "%(name)s %(message)s")
+
+    def format(self, record):
+        line = super().format(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            line += " " + " ".join(f"{key}={_format_value(value)}" for key, value in fields.items())
+        return line
+
+
+class RateLimitFilter(logging.Filter):
+    """Pass at most `burst` records per (message, symbol) every `interval` seconds."""
+
+    def __init__(self, burst=5, interval=60.0, clock=time):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self.clock = clock  # Anything with monotonic(); replays set their simulated clock
+        self.suppressed = 0
+        self._windows = {}  # (message, symbol) -> [window start, passed, suppressed]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= logging.ERROR or not getattr(record, "rate_limit", True):
+            return True
+        fields = getattr(record, "fields", None) or {}
+        key = (record.msg, fields.get("symbol"))
+        now = self.clock.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                dropped = window[2] if window else 0
+                window = self._windows[key] = [now, 0, 0]
+                if dropped:
+                    record.fields = dict(fields, suppressed=dropped)
+            if window[1] < self.burst:
+                window[1] += 1
+                return True
+            window[2] += 1
+            self.suppressed += 1
+            return False
+
+
+def setup_logging(level="INFO", burst=5, interval=60.0, stream=None, process_names=False, clock=time):
+    """Send all loggers to `stream` (stderr by default) through the formatter and rate limit on `clock`."""
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(KeyValueFormatter(process_names))
+    rate_limit = RateLimitFilter(burst, interval, clock)
+    handler.addFilter(rate_limit)
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level.upper() if isinstance(level, str) else level)
+    return rate_limit
@@ -0,0 +1,144 @@
+"""Synthetic recorded session for replays, written without a MetaTrader5 terminal.
+
+Usage:
+    python make_session.py session.npz                  # 2 hours of every security
+    python make_session.py session.npz --hours 6 --seed 3
+    python forex9.py --replay session.npz
+
+ScriptedTerminal plays a seeded random walk per security on M1 bars, with prices moving
+within the minute, 5/3-digit symbols that fill IOC or FOK, and the bars of every timeframe
+built from the M1 walk. A RecordingTerminal around it is polled once a simulated second
+the way the live loop reads the market (tick, strategy bars and correlation bars), so the
+result is an ordinary recording: same seed and hours, same file, same replay.
+"""
+import argparse
+from collections import namedtuple
+
+import numpy as np
+
+from bars import RATES_DTYPE, timeframe_seconds
+from config import correlation_timeframe, correlation_window, securities
+from indicators import WINDOW
+from replay import AccountInfo, RecordingTerminal, SimClock, SymbolInfo, Tick
+
+START = 1_760_000_000  # Session start, time.time()
+HISTORY_HOURS = 300  # M1 history before the start, enough for a full H1 window
+SUFFIX = "m"  # Broker symbols are security + SUFFIX, as on Exness
+
+Walk = namedtuple("Walk", "times closes")
+
+
+class ScriptedTerminal:
+    """The terminal calls a recording needs, served from a seeded random walk on a SimClock."""
+
+    def __init__(self, clock, hours, seed=1):
+        self.clock = clock
+        rng = np.random.default_rng(seed)
+        first = clock.now - HISTORY_HOURS * 3600
+        count = int((clock.now + hours * 3600 - first) // 60) + 1
+        self.walks = {}
+        for name in securities:
+            price = {"JPY": 150.0, "INR": 83.0}.get(name[3:], 1.2)
+            closes = price + np.cumsum(rng.normal(0, price * 0.0002, count))
+            self.walks[name + SUFFIX] = Walk(first + 60 * np.arange(count), closes)
+        self._bars = {}  # (symbol, timeframe) -> (M1 bar -> bar index, first M1 bar of each bar, closed bars)
+
+    def symbols_get(self, group=None):
+        return tuple(self.symbol_info(symbol) for symbol in self.walks)
+
+    def symbol_info(self, symbol):
+        jpy = "JPY" in symbol
+        return SymbolInfo(symbol, 0.001 if jpy else 0.00001, 3 if jpy else 5, 100000.0, 0, 0.01, 100.0, 0.01,
+                          symbol[:3], symbol[3:6], symbol[:3], 3)
+
+    def account_info(self):
+        return AccountInfo(1, 200, 100000.0, 100000.0, 0.0, 100000.0, 0.0, "USD", "Synthetic")
+
+    def positions_get(self, *args, **kwargs):
+        return ()
+
+    def _price(self, symbol):
+        """(M1 bar index, price) now: the bar's close is reached linearly over its minute."""
+        times, closes = self.walks[symbol]
+        k = int((self.clock.now - times[0]) // 60)
+        fraction = (self.clock.now - times[k]) / 60
+        return k, closes[k - 1] + (closes[k] - closes[k - 1]) * fraction
+
+    def symbol_info_tick(self, symbol):
+        _, price = self._price(symbol)
+        spread = 0.00010 * (100 if "JPY" in symbol or "INR" in symbol else 1)
+        now = self.clock.now
+        return Tick(int(now), price, price + spread, 0.0, 0, int(now * 1000), 0, 0.0)
+
+    def _aggregate(self, symbol, timeframe):
+        """Every bar of the walk on `timeframe` in its final state, computed once."""
+        cached = self._bars.get((symbol, timeframe))
+        if cached is None:
+            times, closes = self.walks[symbol]
+            seconds = timeframe_seconds(timeframe)
+            first = int(times[0] // seconds * seconds)
+            index = ((times - first) // seconds).astype(int)
+            starts = np.searchsorted(index, np.arange(index[-1] + 1))
+            opens = np.concatenate(([closes[0]], closes[:-1]))
+            rates = np.zeros(len(starts), dtype=RATES_DTYPE)
+            rates['time'] = first + seconds * np.arange(len(starts))
+            rates['open'] = opens[starts]
+            rates['high'] = np.maximum.reduceat(np.maximum(closes, opens) + 0.00003, starts)
+            rates['low'] = np.minimum.reduceat(np.minimum(closes, opens) - 0.00003, starts)
+            rates['close'] = closes[np.append(starts[1:], len(closes)) - 1]
+            rates['spread'] = 10
+            cached = self._bars[(symbol, timeframe)] = (index, starts, rates)
+        return cached
+
+    def copy_rates_from_pos(self, symbol, timeframe, start_pos, count):
+        index, starts, closed = self._aggregate(symbol, timeframe)
+        k, price = self._price(symbol)
+        forming = index[k]
+        rates = closed[:forming + 1].copy()
+        # The forming bar only holds the M1 bars up to now, the last one at the current price
+        closes = self.walks[symbol].closes[starts[forming]:k + 1].copy()
+        opens = self.walks[symbol].closes[starts[forming] - 1:k] if starts[forming] else np.concatenate(
+            ([closes[0]], closes[:-1]))
+        closes[-1] = price
+        rates['high'][forming] = np.max(np.maximum(closes, opens) + 0.00003)
+        rates['low'][forming] = np.min(np.minimum(closes, opens) - 0.00003)
+        rates['close'][forming] = price
+        end = len(rates) - start_pos
+        return rates[max(end - count, 0):end]
+
+
+def generate(path, hours=2.0, seed=1):
+    """Record `hours` of the scripted market to `path` (.npz)."""
+    clock = SimClock(START)
+    scripted = ScriptedTerminal(clock, hours, seed)
+    recorder = RecordingTerminal(scripted, path, clock)
+    recorder.symbols_get()
+    recorder.account_info()
+    recorder.positions_get()
+    for symbol in scripted.walks:
+        recorder.symbol_info(symbol)
+    end = clock.now + hours * 3600
+    first = True
+    while clock.now < end:
+        for name, config in securities.items():
+            symbol = name + SUFFIX
+            recorder.symbol_info_tick(symbol)
+            recorder.copy_rates_from_pos(symbol, config["timeframe"], 0, WINDOW if first else 3)
+            recorder.copy_rates_from_pos(symbol, correlation_timeframe, 0, correlation_window + 2 if first else 3)
+        first = False
+        clock.sleep(1.0)
+    recorder.save()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="session file to write (.npz)")
+    parser.add_argument("--hours", type=float, default=2.0, help="simulated hours to record")
+    parser.add_argument("--seed", type=int, default=1, help="random walk seed")
+    args = parser.parse_args()
+    generate(args.path, args.hours, args.seed)
+    print(f"Recorded {args.hours:g} hours of {len(securities)} securities to {args.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""Latency histograms and counters for the trading loop, exported as Prometheus text or JSON.
+
+    with metrics.timer("get_indicators"): ...
+    @metrics.timed("place_order")
+    metrics.inc("order_retcodes", retcode=10009, action="deal")
+
+Everything is cumulative since start, like Prometheus counters; serve() exposes
+/metrics on a local port and write_json() dumps the same data to a file.
+"""
+import json
+import threading
+import time
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PREFIX = "forex9_"
+# Seconds; spans a cached indicator read (~0.1 ms) up to a slow terminal round trip
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Fixed-bucket histogram with count, sum and max."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        index = 0
+        for bound in self.buckets:
+            if value <= bound:
+                break
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (the max for the +Inf bucket)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+class _Timer:
+    __slots__ = ("metrics", "name", "labels", "start")
+
+    def __init__(self, metrics, name, labels):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+class Metrics:
+    """Thread-safe registry of labelled latency histograms and counters."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self.histograms = {}  # name -> {labels tuple: Histogram}
+        self.counters = {}  # name -> {labels tuple: value}
+        self._collectors = []
+
+    def observe(self, name, seconds, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self.histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def timer(self, name, **labels):
+        """Context manager observing the time spent inside it."""
+        return _Timer(self, name, labels)
+
+    def timed(self, name, **labels):
+        """Decorator observing every call's duration."""
+        def decorate(function):
+            @wraps(function)
+            def wrapper(*args, **kwargs):
+                with _Timer(self, name, labels):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def inc(self, name, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def add_collector(self, collect):
+        """Register a callable returning {counter name: {labels tuple: value}} read at export time."""
+        self._collectors.append(collect)
+
+    def _snapshot(self):
+        with self._lock:
+            histograms = {name: {key: (list(h.counts), h.count, h.sum, h.max) for key, h in series.items()}
+                          for name, series in self.histograms.items()}
+            counters = {name: dict(series) for name, series in self.counters.items()}
+        for collect in self._collectors:
+            for name, series in collect().items():
+                counters.setdefault(name, {}).update(series)
+        return histograms, counters
+
+    def summary(self, name):
+        """{labels: (count, mean, p50, p99, max)} for one histogram, for log reports."""
+        with self._lock:
+            series = dict(self.histograms.get(name, {}))
+            return {key: (h.count, h.sum / h.count if h.count else 0.0, h.quantile(0.5), h.quantile(0.99), h.max)
+                    for key, h in series.items()}
+
+    def prometheus_text(self):
+        """All metrics in the Prometheus text exposition format."""
+        histograms, counters = self._snapshot()
+        lines = []
+        for name, series in sorted(histograms.items()):
+            metric = f"{PREFIX}{name}_seconds"
+            lines.append(f"# TYPE {metric} histogram")
+            for key, (counts, count, total, _) in sorted(series.items()):
+                cumulative = 0
+                for bound, bucket in zip(self.buckets, counts):
+                    cumulative += bucket
+                    lines.append(f"{metric}_bucket{_label_text(key + (('le', repr(bound)),))} {cumulative}")
+                lines.append(f"{metric}_bucket{_label_text(key + (('le', '+Inf'),))} {count}")
+                lines.append(f"{metric}_sum{_label_text(key)} {total!r}")
+                lines.append(f"{metric}_count{_label_text(key)} {count}")
+        for name, series in sorted(counters.items()):
+            metric = f"{PREFIX}{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            for key, value in sorted(series.items()):
+                lines.append(f"{metric}{_label_text(key)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self):
+        histograms, counters = self._snapshot()
+
+        def labels(key):
+            return ",".join(f"{name}={value}" for name, value in key) or "all"
+
+        return {
+            "time": time.time(),
+            "buckets": list(self.buckets),
+            "histograms": {name: {labels(key): {"counts": counts, "count": count, "sum": total, "max": peak}
+                                  for key, (counts, count, total, peak) in series.items()}
+                           for name, series in histograms.items()},
+            "counters": {name: {labels(key): value for key, value in series.items()}
+                         for name, series in counters.items()},
+        }
+
+    def write_json(self, path):
+        with open(path, "w") as handle:
+            json.dump(self.to_dict(), handle)
+
+    def serve(self, port, host="127.0.0.1"):
+        """Serve /metrics in the Prometheus text format from a daemon thread; returns the server."""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = registry.prometheus_text().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+        return server
+
+
+metrics = Metrics()  # Process-wide registry
@@ -0,0 +1,299 @@
+"""Parallel parameter sweep of the strategy thresholds over historical bars.
+
+Usage:
+    python optimize.py data/ --grid rsi_buy=25,30,35 --grid rrr=1.5,2,2.5
+    python optimize.py data/ --random 500 --range rsi_buy=20:40 --range z_buy=-3:-1.5 --workers 8
+
+Sweepable names are the keys of signals.DEFAULT_PARAMS. None of them change the indicator
+windows, so decision_columns() runs once per symbol in the parent, for the columns
+its strategy declares, and the columns and bars are written to .npy files that every
+worker memory-maps read-only: the pool shares one copy through the page cache instead
+of pickling arrays per task. Inside a worker a symbol's entry candidates are memoized
+on the parameters its rule actually reads, so sweeping rrr never re-evaluates a rule
+and sweeping an RSI level leaves the other strategies' entries untouched.
+
+Each parameter set is simulated as one portfolio on every walk-forward split (an
+anchored in-sample period followed by the out-of-sample period after it). Choosing
+by out-of-sample results would make them in-sample, so every choice is made on
+in-sample pips: walk_forward() picks the best in-sample set of each split and reports
+that set's out-of-sample result, whose total is the sweep's estimate, and the ranking
+is ordered by in-sample pips with the out-of-sample columns shown for reference only.
+"""
+import argparse
+import itertools
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from backtest import (
+    correlation_history, decision_columns, default_point, entry_candidates, load_data, prepare_symbol, simulate,
+)
+from config import securities
+from signals import DEFAULT_PARAMS, STRATEGIES
+
+_worker = {}  # Per-process state set up by _attach()
+
+
+def walk_forward_splits(start, end, folds):
+    """Anchored (train_start, test_start, test_end) periods over the span cut into folds + 1 equal segments.
+
+    Split k trains on segments 0..k and tests on segment k + 1.
+    """
+    edges = np.linspace(start, end + 1, folds + 2).astype(np.int64)
+    return [(int(edges[0]), int(edges[k + 1]), int(edges[k + 2])) for k in range(folds)]
+
+
+def grid_sets(grid):
+    """Every combination of the {name: [values]} grid, as override dicts."""
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def random_sets(ranges, count, seed=0):
+    """`count` draws from the {name: (low, high)} ranges; integer bounds give integer draws."""
+    rng = np.random.default_rng(seed)
+    sets = []
+    for _ in range(count):
+        overrides = {}
+        for name, (low, high) in ranges.items():
+            if isinstance(low, int) and isinstance(high, int):
+                overrides[name] = int(rng.integers(low, high + 1))
+            else:
+                overrides[name] = round(float(rng.uniform(low, high)), 6)
+        sets.append(overrides)
+    return sets
+
+
+def write_shared(data, directory, correlation_data=None):
+    """Compute the indicator columns once per symbol and write bars, columns and correlation bars as .npy files.
+
+    Returns the manifest workers need to memory-map them:
+    {symbol: (rates path, columns path, column names, correlation rates path or None)}.
+    """
+    correlation_data = correlation_data or {}
+    manifest = {}
+    for symbol, rates in data.items():
+        strategy = STRATEGIES[securities[symbol]["strategy"]]
+        columns = decision_columns(rates, strategy)
+        names = list(columns)
+        rates_path = os.path.join(directory, f"{symbol}_rates.npy")
+        columns_path = os.path.join(directory, f"{symbol}_columns.npy")
+        np.save(rates_path, rates)
+        np.save(columns_path, np.stack([columns[name] for name in names]))
+        correlation_path = None
+        if symbol in correlation_data:
+            correlation_path = os.path.join(directory, f"{symbol}_correlation.npy")
+            np.save(correlation_path, correlation_data[symbol])
+        manifest[symbol] = (rates_path, columns_path, names, correlation_path)
+    return manifest
+
+
+class _RecordingParams(dict):
+    """Parameter dict that remembers which keys were read."""
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.read = set()
+
+    def __getitem__(self, key):
+        self.read.add(key)
+        return super().__getitem__(key)
+
+
+def _cached_candidates(symbol, prepared, params):
+    """entry_candidates() memoized on the values of the parameters the symbol's rule reads."""
+    keys = _worker["rule_keys"].get(symbol)
+    if keys is None:
+        recording = _RecordingParams(params)
+        result = entry_candidates(symbol, prepared, recording)
+        keys = _worker["rule_keys"][symbol] = tuple(sorted(recording.read))
+        _worker["candidates"][(symbol, tuple(params[key] for key in keys))] = result
+        return result
+    cache_key = (symbol, tuple(params[key] for key in keys))
+    result = _worker["candidates"].get(cache_key)
+    if result is None:
+        if len(_worker["candidates"]) > 4096:
+            _worker["candidates"].clear()
+        result = _worker["candidates"][cache_key] = entry_candidates(symbol, prepared, params)
+    return result
+
+
+def _attach(manifest, points, server_offset, splits):
+    """Pool initializer: memory-map the shared bars and columns and prepare each symbol once."""
+    prepared = {}
+    for symbol, (rates_path, columns_path, names, correlation_path) in manifest.items():
+        # Plain ndarray views of the mappings: memmap's own __getitem__ is slow for per-bar lookups
+        rates = np.load(rates_path, mmap_mode='r').view(np.ndarray)
+        matrix = np.load(columns_path, mmap_mode='r').view(np.ndarray)
+        columns = dict(zip(names, matrix))
+        correlation_rates = np.load(correlation_path) if correlation_path else None
+        prepared[symbol] = prepare_symbol(symbol, rates, points.get(symbol, default_point(symbol)),
+                                          server_offset, columns, correlation_rates)
+    _worker.update(prepared=prepared, server_offset=server_offset, splits=splits,
+                   correlation=correlation_history(prepared), rule_keys={}, candidates={})
+
+
+def _metrics(trades):
+    if trades.empty:
+        return {"trades": 0, "pips": 0.0, "win_rate": np.nan}
+    pips = trades["pips"]
+    return {"trades": len(trades), "pips": pips.sum(), "win_rate": (pips > 0).mean()}
+
+
+def evaluate(overrides):
+    """In-sample and out-of-sample metrics of one parameter set on every walk-forward split."""
+    params = {**DEFAULT_PARAMS, **overrides}
+    prepared, server_offset = _worker["prepared"], _worker["server_offset"]
+    results = []
+    for train_start, test_start, test_end in _worker["splits"]:
+        train = simulate(prepared, server_offset, params, train_start, test_start, _cached_candidates,
+                         correlation=_worker["correlation"])
+        test = simulate(prepared, server_offset, params, test_start, test_end, _cached_candidates,
+                        correlation=_worker["correlation"])
+        results.append((_metrics(train), _metrics(test)))
+    return results
+
+
+def walk_forward(param_sets, results, splits):
+    """Per split, the set with the best in-sample pips and its out-of-sample result; one row per split."""
+    rows = []
+    for k, (_, test_start, test_end) in enumerate(splits):
+        best = max(range(len(param_sets)), key=lambda n: results[n][k][0]["pips"])
+        train, test = results[best][k]
+        rows.append({
+            "split": k,
+            "test_start": pd.Timestamp(test_start, unit='s'),
+            "test_end": pd.Timestamp(test_end, unit='s'),
+            **param_sets[best],
+            "is_pips": train["pips"],
+            "oos_pips": test["pips"],
+            "oos_trades": test["trades"],
+            "oos_win_rate": test["win_rate"],
+        })
+    return pd.DataFrame(rows)
+
+
+def rank(param_sets, results, splits):
+    """One row per parameter set with in/out-of-sample totals, best in-sample pips first.
+
+    The out-of-sample columns are for reference: picking a set by them is look-ahead.
+    """
+    rows = []
+    for overrides, split_results in zip(param_sets, results):
+        row = dict(overrides)
+        for k, (train, test) in enumerate(split_results):
+            row[f"is_pips_{k}"] = train["pips"]
+            row[f"oos_pips_{k}"] = test["pips"]
+        tests = [test for _, test in split_results]
+        row["is_pips"] = sum(train["pips"] for train, _ in split_results)
+        row["oos_pips"] = sum(test["pips"] for test in tests)
+        row["oos_trades"] = sum(test["trades"] for test in tests)
+        row["oos_win_rate"] = np.nanmean([test["win_rate"] for test in tests]) if row["oos_trades"] else np.nan
+        row["oos_positive_splits"] = sum(test["pips"] > 0 for test in tests) / len(splits)
+        rows.append(row)
+    return pd.DataFrame(rows).sort_values("is_pips", ascending=False, ignore_index=True)
+
+
+def sweep(data, param_sets, points=None, server_offset=0, folds=4, workers=None, correlation_data=None):
+    """Evaluate every parameter set over a process pool; returns (ranking, walk-forward selection, elapsed seconds).
+
+    `data` and `correlation_data` are as load_data() returns them.
+    """
+    points = points or {}
+    start = min(int(rates['time'][0]) for rates in data.values())
+    end = max(int(rates['time'][-1]) for rates in data.values())
+    splits = walk_forward_splits(start, end, folds)
+    workers = workers or os.cpu_count() or 1
+    with tempfile.TemporaryDirectory(prefix="forex9-sweep-") as directory:
+        manifest = write_shared(data, directory, correlation_data)
+        started = time.perf_counter()
+        if workers == 1:
+            _attach(manifest, points, server_offset, splits)
+            results = [evaluate(overrides) for overrides in param_sets]
+        else:
+            with ProcessPoolExecutor(workers, initializer=_attach,
+                                     initargs=(manifest, points, server_offset, splits)) as pool:
+                chunksize = max(1, len(param_sets) // (workers * 4))
+                results = list(pool.map(evaluate, param_sets, chunksize=chunksize))
+        elapsed = time.perf_counter() - started
+    return rank(param_sets, results, splits), walk_forward(param_sets, results, splits), elapsed
+
+
+def _parse_value(text):
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="CSV/Parquet bar files, or directories of them")
+    parser.add_argument("--grid", action="append", default=[], metavar="NAME=V1,V2,...",
+                        help="values to sweep for one parameter; several --grid options form a product")
+    parser.add_argument("--random", type=int, default=0, metavar="N", help="draw N random sets from --range")
+    parser.add_argument("--range", action="append", default=[], metavar="NAME=LOW:HIGH",
+                        help="bounds for --random; integer bounds draw integers")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--folds", type=int, default=4, help="walk-forward splits")
+    parser.add_argument("--workers", type=int, default=None, help="processes, default os.cpu_count()")
+    parser.add_argument("--point", action="append", default=[], metavar="SYMBOL=POINT",
+                        help="spread point size, default 0.001 for JPY pairs and 0.00001 otherwise")
+    parser.add_argument("--server-offset-hours", type=float, default=0.0,
+                        help="bar timestamps minus UTC, for active_hours")
+    parser.add_argument("--top", type=int, default=20, help="rows of the ranking to print")
+    parser.add_argument("--results", help="write the full ranking to this CSV")
+    args = parser.parse_args()
+
+    grid = {}
+    for item in args.grid:
+        name, values = item.split("=")
+        grid[name] = [_parse_value(value) for value in values.split(",")]
+    ranges = {}
+    for item in args.range:
+        name, bounds = item.split("=")
+        low, high = bounds.split(":")
+        ranges[name] = (_parse_value(low), _parse_value(high))
+    unknown = (set(grid) | set(ranges)) - set(DEFAULT_PARAMS)
+    if unknown:
+        parser.error(f"unknown parameters {sorted(unknown)}; choose from {sorted(DEFAULT_PARAMS)}")
+    if args.random and not ranges:
+        parser.error("--random needs at least one --range")
+
+    param_sets = grid_sets(grid) if grid else []
+    if args.random:
+        param_sets += random_sets(ranges, args.random, args.seed)
+    if not param_sets:
+        param_sets = [{}]
+
+    try:
+        data, correlation_data = load_data(args.paths)
+    except ValueError as error:
+        parser.error(str(error))
+    if not data:
+        parser.error("no bar files matched a security")
+    points = {symbol: float(value) for symbol, value in (item.split("=") for item in args.point)}
+    server_offset = int(args.server_offset_hours * 3600)
+    workers = args.workers or os.cpu_count() or 1
+
+    ranking, selection, elapsed = sweep(data, param_sets, points, server_offset, args.folds, workers,
+                                        correlation_data)
+    simulations = len(param_sets) * args.folds * 2
+    print(f"Evaluated {len(param_sets)} parameter sets x {args.folds} walk-forward splits in {elapsed:.2f}s "
+          f"with {workers} workers: {len(param_sets) / elapsed:.1f} sets/s, {simulations / elapsed:.1f} simulations/s")
+    with pd.option_context("display.width", 200, "display.max_columns", None):
+        print(f"Walk-forward selection (best in-sample set per split): {selection['oos_pips'].sum():.1f} "
+              f"out-of-sample pips over {int(selection['oos_trades'].sum())} trades")
+        print(selection.to_string())
+        print("Ranking by in-sample pips (out-of-sample columns for reference only):")
+        print(ranking.head(args.top).to_string())
+    if args.results:
+        ranking.to_csv(args.results, index=False)
+
+
+if __name__ == "__main__":
+    main()
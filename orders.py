@@ -0,0 +1,298 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import namedtuple
+
+from logs import event
+
+log = logging.getLogger("orders")
+
+# What the order pipeline and risk engine need from symbol_info(), read once per symbol
+SymbolSpec = namedtuple("SymbolSpec", "name digits point volume_min volume_max volume_step stops_distance filling "
+                                      "contract_size currency_base currency_profit currency_margin")
+
+# Retcodes worth re-sending after a backoff, with the base delay in seconds
+RETRY_DELAYS = {
+    10004: 0.2,  # Requote
+    10020: 0.2,  # Prices changed
+    10021: 0.5,  # No quotes
+    10024: 1.0,  # Too many requests
+    10013: 2.0,  # Invalid request
+    10027: 5.0,  # AutoTrading disabled in the terminal
+}
+# on_result() for a send whose lost reply was recovered from positions_get(); fields as MetaTrader5's
+ConfirmedResult = namedtuple("ConfirmedResult", "retcode deal order volume price bid ask comment request_id request")
+TRADE_RETCODE_DONE = 10009
+SYMBOL_FILLING_FOK = 1
+SYMBOL_FILLING_IOC = 2
+
+
+class Order:
+    __slots__ = ("key", "symbol", "request", "check", "attempts", "signal_at", "sent_at", "acked_at")
+
+    def __init__(self, key, symbol, request, check, signal_at):
+        self.key = key  # Security name, e.g. "EURUSD"
+        self.symbol = symbol  # Broker symbol name
+        self.request = request
+        self.check = check  # Called under the order lock right before sending; False drops the order
+        self.attempts = 0
+        self.signal_at = signal_at  # perf_counter() times
+        self.sent_at = None
+        self.acked_at = None
+
+
+class OrderPipeline:
+    """Market orders built from per-symbol templates and sent by one submission worker.
+
+    prepare() reads symbol_info() once per symbol into a SymbolSpec and a request
+    template, so an order is a dict copy plus normalization: volume to the symbol's
+    step, prices to its digits and SL/TP at least trade_stops_level from the price.
+    submit() queues the order and returns immediately; the worker sends it under the
+    shared order lock. Retryable retcodes re-queue the order, re-priced at the current
+    tick, after a per-retcode backoff that doubles with each attempt; nothing sleeps
+    and other orders go out in the meantime. on_result(order, result) is called for
+    every send the terminal answered.
+
+    A send without a reply may still have been executed. on_unanswered(order) is then
+    called (the caller drops its cached broker state) and returns the position tickets
+    it knew before the send; a position on the symbol with the request's magic, comment
+    and type that is not among them is the order's, and on_result gets a DONE result
+    for it. Only when positions_get() and orders_get() both show nothing is the order
+    retried like 10021; if either fails, or a pending order matches, it is dropped.
+
+    With synchronous=True (replays) there is no worker thread: submit() sends inline
+    and poll() sends retries that have come due on the caller's clock.
+    """
+
+    def __init__(self, terminal, lock, clock=time, metrics=None, on_result=None, synchronous=False,
+                 max_retries=3, request_defaults=None, on_unanswered=None):
+        self.terminal = terminal
+        self.order_lock = lock  # Shared with the trailing stops so sends stay serialized
+        self.clock = clock  # Anything with monotonic(); replays pass their simulated clock
+        self.metrics = metrics
+        self.on_result = on_result
+        self.on_unanswered = on_unanswered
+        self.synchronous = synchronous
+        self.max_retries = max_retries
+        self.request_defaults = request_defaults or {}
+        self.specs = {}  # Broker symbol -> SymbolSpec
+        self.templates = {}  # Broker symbol -> request dict with everything but type, volume and prices
+        self._queue = []  # Heap of (due monotonic time, sequence, Order)
+        self._sequence = itertools.count()
+        self._busy = {}  # Security -> monotonic time its queued order is due
+        self._condition = threading.Condition()
+        self._worker = None
+        self.sent = 0
+        self.retried = 0
+        self.dropped = 0
+        self.unanswered = 0
+        self.confirmed = 0
+
+    def prepare(self, symbols):
+        """Cache specs and request templates for the broker symbols ahead of the first signal."""
+        for symbol in symbols:
+            self.spec(symbol)
+
+    def spec(self, symbol):
+        spec = self.specs.get(symbol)
+        if spec is None:
+            info = self.terminal.symbol_info(symbol)
+            if info is None:
+                return None
+            filling_mode = getattr(info, "filling_mode", SYMBOL_FILLING_IOC)
+            if filling_mode & SYMBOL_FILLING_IOC:
+                filling = self.terminal.ORDER_FILLING_IOC
+            elif filling_mode & SYMBOL_FILLING_FOK:
+                filling = self.terminal.ORDER_FILLING_FOK
+            else:
+                filling = self.terminal.ORDER_FILLING_RETURN
+            spec = SymbolSpec(symbol, info.digits, info.point, info.volume_min, info.volume_max,
+                              info.volume_step, info.trade_stops_level * info.point, filling,
+                              info.trade_contract_size, info.currency_base, info.currency_profit,
+                              info.currency_margin)
+            self.templates[symbol] = {
+                "action": self.terminal.TRADE_ACTION_DEAL,
+                "symbol": symbol,
+                "type_time": self.terminal.ORDER_TIME_GTC,
+                "type_filling": filling,
+                **self.request_defaults,
+            }
+            self.specs[symbol] = spec
+        return spec
+
+    def normalize(self, spec, order_type, price, sl, tp, lot):
+        """(price, sl, tp, volume) rounded to the symbol's digits and volume step, stops pushed out to the stops level."""
+        volume = min(max(round(lot / spec.volume_step) * spec.volume_step, spec.volume_min), spec.volume_max)
+        if spec.stops_distance:
+            distance = spec.stops_distance + spec.point
+            if order_type == self.terminal.ORDER_TYPE_BUY:
+                sl = min(sl, price - distance) if sl else sl
+                tp = max(tp, price + distance) if tp else tp
+            else:
+                sl = max(sl, price + distance) if sl else sl
+                tp = min(tp, price - distance) if tp else tp
+        return (round(price, spec.digits), round(sl, spec.digits) if sl else 0.0,
+                round(tp, spec.digits) if tp else 0.0, round(volume, 8))
+
+    def build(self, symbol, order_type, price, sl, tp, lot):
+        spec = self.spec(symbol)
+        if spec is None:
+            return None
+        price, sl, tp, volume = self.normalize(spec, order_type, price, sl, tp, lot)
+        request = dict(self.templates[symbol])
+        request.update(type=order_type, price=price, sl=sl, tp=tp, volume=volume)
+        return request
+
+    def busy(self, key):
+        """Whether the security has an order queued or waiting to retry."""
+        return key in self._busy
+
+    def retry_at(self, key):
+        """Monotonic time the security's queued order is due, or 0.0."""
+        return self._busy.get(key, 0.0)
+
+    def submit(self, key, symbol, order_type, price, sl, tp, lot, check=None):
+        """Queue a market order for a signal; returns False if it could not be built or one is already queued."""
+        signal_at = time.perf_counter()
+        if key in self._busy:
+            return False
+        request = self.build(symbol, order_type, price, sl, tp, lot)
+        if request is None:
+            event(log, logging.WARNING, "No symbol info, order dropped", symbol=key)
+            return False
+        self._push(Order(key, symbol, request, check, signal_at), self.clock.monotonic())
+        if self.synchronous:
+            self.poll()
+        elif self._worker is None:
+            self._worker = threading.Thread(target=self._run, name="orders", daemon=True)
+            self._worker.start()
+        return True
+
+    def _push(self, order, due):
+        with self._condition:
+            self._busy[order.key] = due
+            heapq.heappush(self._queue, (due, next(self._sequence), order))
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._queue:
+                    self._condition.wait()
+                wait = self._queue[0][0] - self.clock.monotonic()
+                if wait > 0:
+                    self._condition.wait(wait)
+                    continue
+            try:
+                self.poll()
+            except Exception:
+                log.exception("Order submission failed")
+
+    def poll(self):
+        """Send every queued order that is due."""
+        while True:
+            with self._condition:
+                if not self._queue or self._queue[0][0] > self.clock.monotonic():
+                    return
+                _, _, order = heapq.heappop(self._queue)
+            try:
+                self._send(order)
+            except Exception:
+                self._done(order)
+                raise
+
+    def _send(self, order):
+        with self.order_lock:
+            if order.check is not None and not order.check():
+                self._done(order)
+                return
+            if order.attempts:
+                self._reprice(order)
+            order.sent_at = time.perf_counter()
+            result = self.terminal.order_send(order.request)
+            order.acked_at = time.perf_counter()
+            self.sent += 1
+            if result is None:
+                # No reply from the terminal (IPC failure): the order may have been executed all the same
+                self.unanswered += 1
+                event(log, logging.WARNING, "No order result", symbol=order.key, error=self.terminal.last_error())
+                confirmed = self._confirm(order)
+                if confirmed is None:
+                    self.dropped += 1
+                    self._done(order)
+                    return
+                if confirmed:
+                    result = confirmed  # Not retried: the position is open
+            if result is not None and self.on_result is not None:
+                self.on_result(order, result)
+        if self.metrics is not None:
+            self.metrics.observe("order_signal_to_send", order.sent_at - order.signal_at, symbol=order.key)
+            self.metrics.observe("order_send_to_ack", order.acked_at - order.sent_at, symbol=order.key)
+            self.metrics.observe("order_signal_to_ack", order.acked_at - order.signal_at, symbol=order.key)
+
+        delay = RETRY_DELAYS.get(result.retcode) if result is not None else RETRY_DELAYS[10021]
+        if delay is None:
+            self._done(order)
+            return
+        order.attempts += 1
+        if order.attempts >= self.max_retries:
+            event(log, logging.WARNING, "Max retries reached, order not placed", symbol=order.key)
+            self.dropped += 1
+            self._done(order)
+            return
+        self.retried += 1
+        delay *= 2 ** (order.attempts - 1)
+        event(log, logging.INFO, "Order retry scheduled", symbol=order.key, attempt=order.attempts, seconds=delay)
+        self._push(order, self.clock.monotonic() + delay)
+
+    def _confirm(self, order):
+        """After a send without a reply: a ConfirmedResult if it opened a position, False if the terminal
+        shows nothing from it, None if that cannot be told."""
+        known = self.on_unanswered(order) if self.on_unanswered is not None else None
+        positions = self.terminal.positions_get(symbol=order.symbol) if known is not None else None
+        pending = self.terminal.orders_get(symbol=order.symbol) if positions is not None else None
+        request = order.request
+
+        def ours(item):
+            return (item.magic == request.get("magic", 0) and item.comment == request.get("comment", "")
+                    and item.type == request["type"])
+
+        if pending is None:
+            event(log, logging.WARNING, "Unanswered order not confirmed, dropped", symbol=order.key)
+            return None
+        if any(ours(item) for item in pending):
+            event(log, logging.WARNING, "Unanswered order still pending, dropped", symbol=order.key)
+            return None
+        opened = [position for position in positions if ours(position) and position.ticket not in known]
+        if not opened:
+            return False
+        position = max(opened, key=lambda position: position.ticket)
+        self.confirmed += 1
+        event(log, logging.INFO, "Unanswered order found open", symbol=order.key, ticket=position.ticket)
+        return ConfirmedResult(TRADE_RETCODE_DONE, 0, position.ticket, position.volume, position.price_open,
+                               0.0, 0.0, "Confirmed by positions_get", 0, request)
+
+    def _done(self, order):
+        with self._condition:
+            self._busy.pop(order.key, None)
+
+    def _reprice(self, order):
+        """Move a retried market order to the current quote, keeping its SL/TP distances."""
+        tick = self.terminal.symbol_info_tick(order.symbol)
+        if not tick:
+            return
+        request = order.request
+        price = tick.ask if request["type"] == self.terminal.ORDER_TYPE_BUY else tick.bid
+        shift = price - request["price"]
+        sl = request["sl"] + shift if request["sl"] else 0.0
+        tp = request["tp"] + shift if request["tp"] else 0.0
+        spec = self.specs[order.symbol]
+        request["price"], request["sl"], request["tp"], _ = self.normalize(
+            spec, request["type"], price, sl, tp, request["volume"])
+
+    def stats(self):
+        return {"sent": self.sent, "retried": self.retried, "dropped": self.dropped, "unanswered": self.unanswered,
+                "confirmed": self.confirmed, "queued": len(self._queue)}
+
@@ -0,0 +1,532 @@
+"""Session recording and deterministic replay of the MetaTrader5 terminal.
+
+RecordingTerminal wraps the MetaTrader5 module during a live run and captures what the
+bot reads (ticks, rates, symbols, symbol_info, the starting account and positions) and
+the orders it sends. save() writes them as one compressed .npz of flat columns per
+stream; ticks and bar versions are only stored when they change.
+
+FakeTerminal is a drop-in replacement for the MetaTrader5 module that serves that
+market data back on a SimClock and keeps its own account, positions and deals: fills
+happen at the replayed bid/ask and SL/TP are checked against every recorded tick. The
+clock only moves when the bot sleeps, so a replay runs as fast as the loop itself.
+"""
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+import config
+from bars import RATES_DTYPE
+
+Tick = namedtuple("Tick", "time bid ask last volume time_msc flags volume_real")
+SymbolInfo = namedtuple("SymbolInfo", "name point digits trade_contract_size trade_stops_level volume_min "
+                                      "volume_max volume_step currency_base currency_profit currency_margin filling_mode")
+AccountInfo = namedtuple("AccountInfo", "login leverage balance equity margin margin_free profit currency server")
+TradePosition = namedtuple("TradePosition", "ticket time time_msc type magic identifier volume price_open sl tp "
+                                            "price_current swap profit symbol comment")
+OrderSendResult = namedtuple("OrderSendResult", "retcode deal order volume price bid ask comment request_id request")
+
+TICK_FIELDS = ("time", "bid", "ask", "last", "volume", "time_msc", "flags", "volume_real")
+SYMBOL_FIELDS = SymbolInfo._fields[1:]
+POSITION_FIELDS = ("ticket", "time", "type", "magic", "volume", "price_open", "sl", "tp", "symbol", "comment")
+ORDER_FIELDS = ("action", "symbol", "type", "volume", "price", "sl", "tp", "position", "retcode")
+ACCOUNT_FIELDS = ("login", "leverage", "balance", "currency", "server")
+
+
+class SimClock:
+    """Stand-in for the time module whose time() and monotonic() only advance on sleep().
+
+    perf_counter() stays real so CPU timings are still measured.
+    """
+
+    def __init__(self, start):
+        self.now = float(start)
+        self._lock = threading.Lock()
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        with self._lock:
+            self.now += max(seconds, 0.0)
+
+    def perf_counter(self):
+        return time.perf_counter()
+
+
+class RecordingTerminal:
+    """Wraps the MetaTrader5 module and records the responses the replay needs.
+
+    Everything else passes straight through, like CountingTerminal.
+    """
+
+    def __init__(self, module, path, clock=time):
+        self._module = module
+        self.path = path
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._ticks = {}  # Symbol -> list of (captured, *TICK_FIELDS)
+        self._last_tick = {}
+        self._rates = {}  # (symbol, timeframe) -> list of (captured, rates row)
+        self._bar_versions = {}  # (symbol, timeframe) -> {bar time: row tuple}
+        self._symbols = None
+        self._symbol_info = {}
+        self._account = None
+        self._positions = None
+        self._orders = []
+
+    def __getattr__(self, name):
+        return getattr(self._module, name)
+
+    def symbol_info_tick(self, symbol):
+        tick = self._module.symbol_info_tick(symbol)
+        if tick is not None:
+            row = tuple(getattr(tick, field) for field in TICK_FIELDS)
+            with self._lock:
+                if self._last_tick.get(symbol) != row:
+                    self._last_tick[symbol] = row
+                    self._ticks.setdefault(symbol, []).append((self.clock.time(),) + row)
+        return tick
+
+    def copy_rates_from_pos(self, symbol, timeframe, start_pos, count):
+        rates = self._module.copy_rates_from_pos(symbol, timeframe, start_pos, count)
+        if rates is not None and len(rates):
+            key = (symbol, timeframe)
+            captured = self.clock.time()
+            with self._lock:
+                versions = self._bar_versions.setdefault(key, {})
+                stream = self._rates.setdefault(key, [])
+                for row in rates.astype(RATES_DTYPE).tolist():
+                    if versions.get(row[0]) != row:
+                        versions[row[0]] = row
+                        stream.append((captured,) + row)
+        return rates
+
+    def symbols_get(self, *args, **kwargs):
+        symbols = self._module.symbols_get(*args, **kwargs)
+        if symbols is not None and not args and not kwargs:
+            with self._lock:
+                self._symbols = [info.name for info in symbols]
+        return symbols
+
+    def symbol_info(self, symbol):
+        info = self._module.symbol_info(symbol)
+        if info is not None:
+            with self._lock:
+                self._symbol_info[symbol] = tuple(getattr(info, field) for field in SYMBOL_FIELDS)
+        return info
+
+    def account_info(self):
+        account = self._module.account_info()
+        if account is not None and self._account is None:
+            self._account = tuple(getattr(account, field) for field in ACCOUNT_FIELDS)
+        return account
+
+    def positions_get(self, *args, **kwargs):
+        positions = self._module.positions_get(*args, **kwargs)
+        if positions is not None and self._positions is None and not args and not kwargs:
+            self._positions = [tuple(getattr(pos, field) for field in POSITION_FIELDS) for pos in positions]
+        return positions
+
+    def order_send(self, request):
+        result = self._module.order_send(request)
+        row = tuple(request.get(field, 0) for field in ORDER_FIELDS[:-1])
+        with self._lock:
+            self._orders.append((self.clock.time(),) + row + (result.retcode if result is not None else -1,))
+        return result
+
+    def save(self):
+        """Write everything recorded so far to `path` as columns."""
+        arrays = {}
+        with self._lock:
+            for symbol, rows in self._ticks.items():
+                columns = list(zip(*rows))
+                arrays[f"ticks|{symbol}|captured"] = np.array(columns[0], dtype=np.float64)
+                for field, values in zip(TICK_FIELDS, columns[1:]):
+                    arrays[f"ticks|{symbol}|{field}"] = np.array(values)
+            for (symbol, timeframe), rows in self._rates.items():
+                arrays[f"rates|{symbol}|{timeframe}|captured"] = np.array([row[0] for row in rows], dtype=np.float64)
+                bars = np.array([row[1:] for row in rows], dtype=RATES_DTYPE)
+                for field in RATES_DTYPE.names:
+                    arrays[f"rates|{symbol}|{timeframe}|{field}"] = bars[field]
+            if self._symbols is not None:
+                arrays["symbols|name"] = np.array(self._symbols)
+            if self._symbol_info:
+                names = list(self._symbol_info)
+                arrays["symbol_info|name"] = np.array(names)
+                for index, field in enumerate(SYMBOL_FIELDS):
+                    arrays[f"symbol_info|{field}"] = np.array([self._symbol_info[name][index] for name in names])
+            if self._account is not None:
+                for field, value in zip(ACCOUNT_FIELDS, self._account):
+                    arrays[f"account|{field}"] = np.array(value)
+            if self._positions:
+                for index, field in enumerate(POSITION_FIELDS):
+                    arrays[f"positions|{field}"] = np.array([pos[index] for pos in self._positions])
+            if self._orders:
+                columns = list(zip(*self._orders))
+                arrays["orders|captured"] = np.array(columns[0], dtype=np.float64)
+                for field, values in zip(ORDER_FIELDS, columns[1:]):
+                    arrays[f"orders|{field}"] = np.array(values)
+        np.savez_compressed(self.path, **arrays)
+
+
+def _streams(arrays, kind):
+    """{key: {field: column}} for one stream kind of a session file."""
+    streams = {}
+    for name in arrays.files:
+        parts = name.split("|")
+        if parts[0] == kind:
+            streams.setdefault(tuple(parts[1:-1]), {})[parts[-1]] = arrays[name]
+    return streams
+
+
+class _BarStream:
+    """Bar versions of one (symbol, timeframe) applied in capture order as the clock advances."""
+
+    def __init__(self, columns):
+        self.captured = columns["captured"]
+        self.versions = np.zeros(len(self.captured), dtype=RATES_DTYPE)
+        for field in RATES_DTYPE.names:
+            self.versions[field] = columns[field]
+        self.applied = 0
+        self.bars = np.zeros(0, dtype=RATES_DTYPE)
+
+    def at(self, now):
+        end = int(np.searchsorted(self.captured, now, side='right'))
+        if end > self.applied:
+            new = self.versions[self.applied:end]
+            merged = np.concatenate([self.bars, new])
+            # Keep the last version of every bar time
+            _, last = np.unique(merged['time'][::-1], return_index=True)
+            self.bars = merged[len(merged) - 1 - last]
+            self.applied = end
+        return self.bars
+
+
+class FakeTerminal:
+    """Drop-in MetaTrader5 module serving a recorded session on a SimClock with a simulated book."""
+
+    TIMEFRAME_M1 = config.TIMEFRAME_M1
+    TIMEFRAME_M5 = config.TIMEFRAME_M5
+    TIMEFRAME_M15 = config.TIMEFRAME_M15
+    TIMEFRAME_H1 = config.TIMEFRAME_H1
+    ORDER_TYPE_BUY = 0
+    ORDER_TYPE_SELL = 1
+    POSITION_TYPE_BUY = 0
+    POSITION_TYPE_SELL = 1
+    TRADE_ACTION_DEAL = 1
+    TRADE_ACTION_SLTP = 6
+    ORDER_TIME_GTC = 0
+    ORDER_FILLING_FOK = 0
+    ORDER_FILLING_IOC = 1
+    ORDER_FILLING_RETURN = 2
+    TRADE_RETCODE_DONE = 10009
+    TRADE_RETCODE_INVALID = 10013
+    TRADE_RETCODE_INVALID_VOLUME = 10014
+    TRADE_RETCODE_INVALID_STOPS = 10016
+    TRADE_RETCODE_NO_MONEY = 10019
+    TRADE_RETCODE_PRICE_OFF = 10021
+    TRADE_RETCODE_POSITION_CLOSED = 10036
+
+    def __init__(self, path, clock=None, balance=None):
+        with np.load(path) as arrays:
+            self._ticks = {key[0]: columns for key, columns in _streams(arrays, "ticks").items()}
+            self._bars = {(key[0], int(key[1])): _BarStream(columns)
+                          for key, columns in _streams(arrays, "rates").items()}
+            symbols = _streams(arrays, "symbols").get((), {})
+            info = _streams(arrays, "symbol_info").get((), {})
+            account = _streams(arrays, "account").get((), {})
+            positions = _streams(arrays, "positions").get((), {})
+            orders = _streams(arrays, "orders").get((), {})
+        self.recorded_orders = orders
+
+        captured = [columns["captured"] for columns in self._ticks.values()]
+        captured += [stream.captured for stream in self._bars.values()]
+        captured = [column for column in captured if len(column)]
+        if not captured:
+            raise ValueError(f"{path} holds no ticks or rates")
+        self.start_time = min(float(column[0]) for column in captured)
+        self.end_time = max(float(column[-1]) for column in captured)
+        self.clock = clock or SimClock(self.start_time)
+
+        names = set(self._ticks) | {symbol for symbol, _ in self._bars}
+        names |= set(symbols.get("name", np.array([])).tolist())
+        self._symbol_info = {}
+        recorded = {name: index for index, name in enumerate(info.get("name", np.array([])).tolist())}
+        for name in sorted(names):
+            jpy = "JPY" in name
+            values = [0.001 if jpy else 0.00001, 3 if jpy else 5, 100000.0, 0, 0.01, 100.0, 0.01,
+                      name[:3], name[3:6], name[:3], 3]  # filling_mode 3: FOK and IOC allowed
+            if name in recorded:
+                # Fields added after a session was recorded keep their defaults
+                values = [info[field][recorded[name]].item() if field in info else default
+                          for field, default in zip(SYMBOL_FIELDS, values)]
+            self._symbol_info[name] = SymbolInfo(name, *values)
+
+        self.login_id = int(account["login"]) if "login" in account else 0
+        self.leverage = int(account["leverage"]) if "leverage" in account else config.leverage
+        self.currency = str(account["currency"]) if "currency" in account else "USD"
+        self.server = str(account["server"]) if "server" in account else "Replay"
+        self.balance = float(balance if balance is not None else account.get("balance", 10000.0))
+        self.starting_balance = self.balance
+
+        self._lock = threading.RLock()
+        self._next_ticket = 1
+        self._positions = {}
+        self._tick_cursor = {}  # Symbol -> index of the next tick whose SL/TP check is pending
+        self.deals = []
+        self.order_results = {}
+        for index in range(len(positions.get("ticket", ()))):
+            row = {field: positions[field][index].item() for field in POSITION_FIELDS}
+            self._positions[row["ticket"]] = row
+            self._next_ticket = max(self._next_ticket, row["ticket"] + 1)
+
+    # Connection
+
+    def initialize(self, *args, **kwargs):
+        return True
+
+    def login(self, *args, **kwargs):
+        return True
+
+    def shutdown(self):
+        return None
+
+    def last_error(self):
+        return (1, "Success")
+
+    # Market data
+
+    def symbols_get(self, group=None):
+        return tuple(self._symbol_info.values())
+
+    def symbol_info(self, symbol):
+        return self._symbol_info.get(symbol)
+
+    def symbol_select(self, symbol, enable=True):
+        return symbol in self._symbol_info
+
+    def _tick_index(self, symbol):
+        columns = self._ticks.get(symbol)
+        if columns is None:
+            return None
+        index = int(np.searchsorted(columns["captured"], self.clock.time(), side='right')) - 1
+        return index if index >= 0 else None
+
+    def symbol_info_tick(self, symbol):
+        with self._lock:
+            self._settle()
+            index = self._tick_index(symbol)
+            if index is None:
+                return None
+            columns = self._ticks[symbol]
+            return Tick(*(columns[field][index].item() for field in TICK_FIELDS))
+
+    def copy_rates_from_pos(self, symbol, timeframe, start_pos, count):
+        stream = self._bars.get((symbol, timeframe))
+        if stream is None:
+            return None
+        with self._lock:
+            bars = stream.at(self.clock.time())
+        end = len(bars) - start_pos
+        if end <= 0:
+            return None
+        return bars[max(end - count, 0):end].copy()
+
+    # Simulated book
+
+    def _quote(self, symbol):
+        index = self._tick_index(symbol)
+        if index is None:
+            return None
+        columns = self._ticks[symbol]
+        return float(columns["bid"][index]), float(columns["ask"][index])
+
+    def _to_account(self, symbol, amount, price):
+        """Convert an amount in the symbol's quote currency to the account currency."""
+        info = self._symbol_info[symbol]
+        if info.currency_profit == self.currency:
+            return amount
+        if info.currency_base == self.currency:
+            return amount / price
+        for name, other in self._symbol_info.items():
+            quote = self._quote(name) if name != symbol else None
+            if quote is None:
+                continue
+            if other.currency_base == info.currency_profit and other.currency_profit == self.currency:
+                return amount * quote[0]
+            if other.currency_base == self.currency and other.currency_profit == info.currency_profit:
+                return amount / quote[1]
+        return amount
+
+    def _profit(self, position, price):
+        info = self._symbol_info[position["symbol"]]
+        direction = 1 if position["type"] == self.POSITION_TYPE_BUY else -1
+        amount = direction * (price - position["price_open"]) * position["volume"] * info.trade_contract_size
+        return self._to_account(position["symbol"], amount, price)
+
+    def _margin(self, symbol, volume, price):
+        info = self._symbol_info[symbol]
+        if info.currency_base == self.currency:
+            return volume * info.trade_contract_size / self.leverage
+        return self._to_account(symbol, volume * info.trade_contract_size * price / self.leverage, price)
+
+    def _close(self, ticket, price, reason, when):
+        position = self._positions.pop(ticket)
+        profit = self._profit(position, price)
+        self.balance += profit
+        self.deals.append({"ticket": ticket, "symbol": position["symbol"], "type": position["type"],
+                           "volume": position["volume"], "open_time": position["time"],
+                           "price_open": position["price_open"], "close_time": when, "price_close": price,
+                           "reason": reason, "profit": profit})
+
+    def _settle(self):
+        """Apply SL/TP to open positions for every tick up to the clock."""
+        now = self.clock.time()
+        for symbol in {position["symbol"] for position in self._positions.values()}:
+            columns = self._ticks.get(symbol)
+            if columns is None:
+                continue
+            end = int(np.searchsorted(columns["captured"], now, side='right'))
+            start = self._tick_cursor.get(symbol, end)
+            self._tick_cursor[symbol] = end
+            if start >= end:
+                continue
+            bids, asks = columns["bid"][start:end], columns["ask"][start:end]
+            for ticket, position in list(self._positions.items()):
+                if position["symbol"] != symbol:
+                    continue
+                buy = position["type"] == self.POSITION_TYPE_BUY
+                prices = bids if buy else asks
+                sl, tp = position["sl"], position["tp"]
+                sl_hit = (prices <= sl) if buy else (prices >= sl)
+                tp_hit = (prices >= tp) if buy else (prices <= tp)
+                hit = (sl_hit & (sl > 0)) | (tp_hit & (tp > 0))
+                if hit.any():
+                    k = int(np.argmax(hit))
+                    reason = "sl" if sl > 0 and sl_hit[k] else "tp"
+                    self._close(ticket, float(prices[k]), reason, int(columns["captured"][start + k]))
+
+    def _position_tuple(self, position):
+        quote = self._quote(position["symbol"])
+        price = position["price_open"] if quote is None else quote[0 if position["type"] == 0 else 1]
+        return TradePosition(position["ticket"], position["time"], position["time"] * 1000, position["type"],
+                             position["magic"], position["ticket"], position["volume"], position["price_open"],
+                             position["sl"], position["tp"], price, 0.0, self._profit(position, price),
+                             position["symbol"], position["comment"])
+
+    def positions_get(self, symbol=None, ticket=None):
+        with self._lock:
+            self._settle()
+            return tuple(self._position_tuple(position) for position in self._positions.values()
+                         if (symbol is None or position["symbol"] == symbol)
+                         and (ticket is None or position["ticket"] == ticket))
+
+    def orders_get(self, symbol=None, ticket=None):
+        """Pending orders: none, market orders are filled or rejected when sent."""
+        return ()
+
+    def positions_total(self):
+        return len(self.positions_get())
+
+    def account_info(self):
+        with self._lock:
+            positions = self.positions_get()
+            profit = sum(position.profit for position in positions)
+            margin = sum(self._margin(position.symbol, position.volume, position.price_open) for position in positions)
+            equity = self.balance + profit
+            return AccountInfo(self.login_id, self.leverage, self.balance, equity, margin, equity - margin,
+                               profit, self.currency, self.server)
+
+    def _result(self, request, retcode, comment, order=0, price=0.0, quote=(0.0, 0.0)):
+        result = OrderSendResult(retcode, order, order, request.get("volume", 0.0), price, quote[0], quote[1],
+                                 comment, 0, request)
+        self.order_results[retcode] = self.order_results.get(retcode, 0) + 1
+        return result
+
+    def order_send(self, request):
+        with self._lock:
+            self._settle()
+            symbol = request.get("symbol")
+            action = request.get("action")
+            if action == self.TRADE_ACTION_SLTP:
+                position = self._positions.get(request.get("position"))
+                if position is None:
+                    return self._result(request, self.TRADE_RETCODE_POSITION_CLOSED, "Position doesn't exist")
+                position["sl"] = float(request.get("sl", position["sl"]))
+                position["tp"] = float(request.get("tp", position["tp"]))
+                return self._result(request, self.TRADE_RETCODE_DONE, "Request executed", position["ticket"])
+            if action != self.TRADE_ACTION_DEAL or symbol not in self._symbol_info:
+                return self._result(request, self.TRADE_RETCODE_INVALID, "Invalid request")
+            quote = self._quote(symbol)
+            if quote is None:
+                return self._result(request, self.TRADE_RETCODE_PRICE_OFF, "No prices")
+            bid, ask = quote
+            order_type = request.get("type")
+            price = ask if order_type == self.ORDER_TYPE_BUY else bid
+            now = int(self.clock.time())
+
+            ticket = request.get("position")
+            if ticket:
+                if ticket not in self._positions:
+                    return self._result(request, self.TRADE_RETCODE_POSITION_CLOSED, "Position doesn't exist")
+                self._close(ticket, price, "request", now)
+                return self._result(request, self.TRADE_RETCODE_DONE, "Request executed", ticket, price, quote)
+
+            info = self._symbol_info[symbol]
+            volume = float(request.get("volume", 0.0))
+            if volume < info.volume_min or volume > info.volume_max:
+                return self._result(request, self.TRADE_RETCODE_INVALID_VOLUME, "Invalid volume")
+            sl, tp = float(request.get("sl", 0.0)), float(request.get("tp", 0.0))
+            if order_type == self.ORDER_TYPE_BUY:
+                valid = (not sl or sl < bid) and (not tp or tp > bid)
+            else:
+                valid = (not sl or sl > ask) and (not tp or tp < ask)
+            if not valid:
+                return self._result(request, self.TRADE_RETCODE_INVALID_STOPS, "Invalid stops")
+            if self._margin(symbol, volume, price) > self.account_info().margin_free:
+                return self._result(request, self.TRADE_RETCODE_NO_MONEY, "No money")
+
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            self._positions[ticket] = {"ticket": ticket, "time": now, "type": order_type,
+                                       "magic": request.get("magic", 0), "volume": volume, "price_open": price,
+                                       "sl": sl, "tp": tp, "symbol": symbol, "comment": request.get("comment", "")}
+            # SL/TP are checked from the next tick on
+            self._tick_cursor[symbol] = int(np.searchsorted(self._ticks[symbol]["captured"], self.clock.time(),
+                                                            side='right'))
+            return self._result(request, self.TRADE_RETCODE_DONE, "Request executed", ticket, price, quote)
+
+    def Close(self, symbol, *args, ticket=None, **kwargs):
+        """The MetaTrader5 package's Close() helper: close a position (or all on the symbol) at market."""
+        with self._lock:
+            tickets = [ticket] if ticket is not None else [
+                position["ticket"] for position in self._positions.values() if position["symbol"] == symbol]
+            closed = False
+            for position_ticket in tickets:
+                position = self._positions.get(position_ticket)
+                if position is None:
+                    continue
+                close_type = self.ORDER_TYPE_SELL if position["type"] == self.ORDER_TYPE_BUY else self.ORDER_TYPE_BUY
+                result = self.order_send({"action": self.TRADE_ACTION_DEAL, "symbol": position["symbol"],
+                                          "volume": position["volume"], "type": close_type,
+                                          "position": position_ticket})
+                closed = closed or result.retcode == self.TRADE_RETCODE_DONE
+            return closed
+
+    def report(self):
+        """Summary of the simulated trading, for regression comparisons between replays."""
+        wins = sum(deal["profit"] > 0 for deal in self.deals)
+        return {
+            "deals": len(self.deals),
+            "wins": wins,
+            "open_positions": len(self._positions),
+            "balance": round(self.balance, 2),
+            "net": round(self.balance - self.starting_balance, 2),
+            "order_results": dict(sorted(self.order_results.items())),
+            "recorded_orders": len(self.recorded_orders.get("retcode", ())),
+        }
@@ -0,0 +1,207 @@
+import math
+import threading
+from collections import deque
+
+import numpy as np
+
+
+class RiskEngine:
+    """Open exposure and margin per symbol in NumPy arrays, for constant-time pre-trade checks.
+
+    Built from the cached SymbolSpecs: contract size and base, profit and margin
+    currency per symbol. Each currency is valued in the account currency through a
+    chain of at most a few symbols found once at startup (GBP through GBPUSD, JPY
+    through USDJPY inverted, ...), so refreshing every rate after new quotes is one
+    vectorized product. Margin per lot is contract size / leverage in the margin
+    currency, converted.
+
+    open() and close() adjust the per-symbol lot totals and the per-currency net
+    exposure in place; sync() applies only the tickets that appeared or disappeared
+    since the last call, which covers stop-outs and manual closes. can_add() checks
+    the position count, the per-trade and total margin caps and the net exposure of
+    the two currencies involved without touching the other symbols. Under the
+    supervisor, external_positions and external_margin carry the totals of the
+    account's other shards so the position and margin caps hold account-wide.
+    """
+
+    def __init__(self, specs, account_currency, leverage, max_open_positions, max_margin_per_trade,
+                 margin_per_trade_equity, max_margin_usage, max_currency_exposure):
+        specs = list(specs)
+        self.leverage = leverage
+        self.max_open_positions = max_open_positions
+        self.max_margin_per_trade = max_margin_per_trade
+        self.margin_per_trade_equity = margin_per_trade_equity
+        self.max_margin_usage = max_margin_usage
+        self.max_currency_exposure = max_currency_exposure  # Multiple of equity, per currency
+        self._lock = threading.Lock()
+
+        self.symbols = [spec.name for spec in specs]
+        self.index = {name: i for i, name in enumerate(self.symbols)}
+        self.currencies = sorted({account_currency} | {c for spec in specs
+                                  for c in (spec.currency_base, spec.currency_profit, spec.currency_margin)})
+        currency_index = {c: k for k, c in enumerate(self.currencies)}
+        self.base = np.array([currency_index[spec.currency_base] for spec in specs], dtype=np.intp)
+        self.quote = np.array([currency_index[spec.currency_profit] for spec in specs], dtype=np.intp)
+        self.margin_currency = np.array([currency_index[spec.currency_margin] for spec in specs], dtype=np.intp)
+        self.contract_size = np.array([spec.contract_size for spec in specs], dtype=np.float64)
+        self.volume_min = np.array([spec.volume_min for spec in specs], dtype=np.float64)
+        self.volume_max = np.array([spec.volume_max for spec in specs], dtype=np.float64)
+        self.volume_step = np.array([spec.volume_step for spec in specs], dtype=np.float64)
+        self._hops, self._invert = self._conversion_paths(account_currency, currency_index)
+
+        self.mid = np.full(len(specs) + 1, np.nan)  # Last slot is the 1.0 used to pad conversion paths
+        self.mid[-1] = 1.0
+        self.rates = np.full(len(self.currencies), np.nan)  # Value of one unit of each currency in the account currency
+        self.margin_per_lot = np.full(len(specs), np.nan)
+        self.lots = np.zeros(len(specs))  # Gross open lots per symbol
+        self.exposure = np.zeros(len(self.currencies))  # Net open amount per currency, in that currency
+        self.margin_used = 0.0
+        self.positions = {}  # Ticket -> (symbol index, lots, base amount, quote amount)
+        self.external_positions = 0  # Open positions and margin of the same account held by other shards
+        self.external_margin = 0.0
+        self._dirty = True
+
+    def _conversion_paths(self, account_currency, currency_index):
+        """(hops, invert) arrays: rate[c] = product over k of mid[hops[c, k]] ** (-1 if invert[c, k] else 1)."""
+        paths = {currency_index[account_currency]: []}
+        queue = deque(paths)
+        while queue:
+            known = queue.popleft()
+            for i, (base, quote) in enumerate(zip(self.base, self.quote)):
+                # One base unit is worth mid quote units
+                if quote == known and base not in paths:
+                    paths[base] = paths[known] + [(i, False)]
+                    queue.append(base)
+                elif base == known and quote not in paths:
+                    paths[quote] = paths[known] + [(i, True)]
+                    queue.append(quote)
+        length = max(1, max(len(path) for path in paths.values()))
+        pad = len(self.symbols)  # Index of the 1.0 slot in mid
+        hops = np.full((len(self.currencies), length), pad, dtype=np.intp)
+        invert = np.zeros((len(self.currencies), length), dtype=bool)
+        for currency in range(len(self.currencies)):
+            path = paths.get(currency)
+            if path is None:
+                hops[currency, 0] = -1  # Unreachable: reads the NaN below
+                continue
+            for k, (i, inverted) in enumerate(path):
+                hops[currency, k] = i
+                invert[currency, k] = inverted
+        return hops, invert
+
+    def update_price(self, symbol, bid, ask):
+        i = self.index.get(symbol)
+        if i is not None and bid > 0 and ask > 0:
+            self.mid[i] = (bid + ask) / 2
+            self._dirty = True
+
+    def _refresh(self):
+        if not self._dirty:
+            return
+        factors = self.mid[self._hops]
+        factors = np.where(self._invert, 1.0 / factors, factors)
+        factors[self._hops == -1] = np.nan
+        self.rates = factors.prod(axis=1)
+        self.margin_per_lot = self.contract_size / self.leverage * self.rates[self.margin_currency]
+        self.margin_used = float(np.nansum(self.lots * self.margin_per_lot))
+        self._dirty = False
+
+    def open(self, ticket, symbol, order_type, lots, price):
+        """Add a filled position; order_type 0 is a buy."""
+        i = self.index.get(symbol)
+        if i is None:
+            return
+        with self._lock:
+            if ticket in self.positions:
+                return
+            base_amount = lots * self.contract_size[i] * (1 if order_type == 0 else -1)
+            quote_amount = -base_amount * price
+            self.positions[ticket] = (i, lots, base_amount, quote_amount)
+            self.lots[i] += lots
+            self.exposure[self.base[i]] += base_amount
+            self.exposure[self.quote[i]] += quote_amount
+            self._dirty = True
+
+    def close(self, ticket):
+        with self._lock:
+            position = self.positions.pop(ticket, None)
+            if position is None:
+                return
+            i, lots, base_amount, quote_amount = position
+            self.lots[i] -= lots
+            self.exposure[self.base[i]] -= base_amount
+            self.exposure[self.quote[i]] -= quote_amount
+            self._dirty = True
+
+    def sync(self, positions):
+        """Apply the positions opened or closed since the last sync (fills, stop-outs, manual closes)."""
+        current = {position.ticket: position for position in positions}
+        for ticket in self.positions.keys() - current.keys():
+            self.close(ticket)
+        for ticket in current.keys() - self.positions.keys():
+            position = current[ticket]
+            self.open(ticket, position.symbol, position.type, position.volume, position.price_open)
+
+    def open_mask(self):
+        """Boolean array over the symbols: True where a position is open."""
+        with self._lock:
+            return self.lots > 1e-9
+
+    def margin(self, symbol, lots):
+        """Margin in the account currency for `lots` of a symbol at the latest quotes."""
+        with self._lock:
+            self._refresh()
+            return lots * float(self.margin_per_lot[self.index[symbol]])
+
+    def total_margin(self):
+        with self._lock:
+            self._refresh()
+            return self.margin_used
+
+    def lot_size(self, symbol, equity):
+        """Largest lot within the per-trade margin budget, min(max_margin_per_trade, equity share), rounded down to the step."""
+        i = self.index[symbol]
+        with self._lock:
+            self._refresh()
+            per_lot = self.margin_per_lot[i]
+        budget = min(self.max_margin_per_trade, equity * self.margin_per_trade_equity)
+        if not per_lot > 0:
+            return float(self.volume_min[i])
+        step = self.volume_step[i]
+        lots = math.floor(budget / per_lot / step + 1e-9) * step
+        return round(float(min(max(lots, self.volume_min[i]), self.volume_max[i])), 8)
+
+    def can_add(self, symbol, order_type, lots, price, equity):
+        """(allowed, reason) for opening `lots` of a symbol; reason is None when allowed."""
+        i = self.index.get(symbol)
+        if i is None:
+            return False, "unknown symbol"
+        with self._lock:
+            self._refresh()
+            if len(self.positions) + self.external_positions >= self.max_open_positions:
+                return False, "max open positions"
+            margin = lots * self.margin_per_lot[i]
+            if not margin >= 0:
+                return False, "no conversion rate"
+            if margin > self.max_margin_per_trade * (1 + 1e-9):
+                return False, "margin per trade"
+            if self.margin_used + self.external_margin + margin > equity * self.max_margin_usage:
+                return False, "total margin"
+            base_amount = lots * self.contract_size[i] * (1 if order_type == 0 else -1)
+            cap = equity * self.max_currency_exposure
+            for currency, amount in ((self.base[i], base_amount), (self.quote[i], -base_amount * price)):
+                before = self.exposure[currency]
+                after = before + amount
+                if abs(after) > abs(before) and abs(after * self.rates[currency]) > cap:
+                    return False, f"{self.currencies[currency]} exposure"
+            return True, None
+
+    def stats(self):
+        with self._lock:
+            self._refresh()
+            exposure = self.exposure * self.rates
+            return {
+                "positions": len(self.positions),
+                "margin_used": round(self.margin_used, 2),
+                **{f"net_{currency}": round(float(value)) for currency, value in zip(self.currencies, exposure) if value},
+            }
@@ -0,0 +1,153 @@
+import logging
+import math
+
+from bars import timeframe_seconds
+from logs import event
+from signals import STRATEGIES
+
+log = logging.getLogger("scheduler")
+
+
+class ServerClock:
+    """Trade server clock minus local clock, estimated from tick times.
+
+    A tick's time is that of the symbol's last quote, minutes or hours old for a quiet
+    symbol (USDINR outside its session), so one tick cannot be trusted on its own: the
+    offset comes from the freshest tick seen on any symbol within the last `window`
+    seconds, rounded to the half hour servers use.
+    """
+
+    def __init__(self, window=3600.0):
+        self.window = window
+        self.offset = 0.0
+        self._lags = {}  # Symbol -> (local time observed, tick time minus local time)
+
+    def observe(self, symbol, server_time, now):
+        """Take in a symbol's tick time; returns the offset."""
+        self._lags[symbol] = (now, server_time - now)
+        freshest = max(lag for seen, lag in self._lags.values() if now - seen <= self.window)
+        self.offset = round(freshest / 1800) * 1800
+        return self.offset
+
+
+class EventScheduler:
+    """Decides which symbols need evaluating and how long the main loop may sleep.
+
+    Bar-based symbols wake when their forming bar closes, tick-based symbols
+    (Strategy.trigger, or "trigger": "tick" in the security config) wake when
+    symbol_info_tick().time_msc changes, and every symbol wakes when it enters or
+    leaves its active_hours. All times are wall-clock seconds (time.time()).
+    """
+
+    def __init__(self, securities, poll_interval=1.0, tick_poll_interval=1.0,
+                 manage_interval=1.0, bar_close_delay=0.2):
+        self.securities = securities
+        self.poll_interval = poll_interval  # Cadence of the old fixed poll, used for fallbacks and reporting
+        # Tick probes never run faster than the old poll, so tick-driven symbols cannot add wake-ups
+        self.tick_poll_interval = max(tick_poll_interval, poll_interval)
+        self.manage_interval = manage_interval  # Cadence while a symbol has open positions to manage
+        self.bar_close_delay = bar_close_delay  # Grace for the first tick of the new bar to arrive
+        self.server_clock = ServerClock()
+        self.state = {}
+        for symbol, config in securities.items():
+            trigger = config.get("trigger") or STRATEGIES[config["strategy"]].trigger
+            self.state[symbol] = {
+                "trigger": trigger,
+                "bar_seconds": timeframe_seconds(config["timeframe"]),
+                "next": 0.0,
+                "last_msc": None,
+                "misses": 0,
+            }
+        self.wakeups = 0
+        self.evaluations = 0
+        self.tick_probes = 0
+        self._report_start = None
+
+    def is_tick_driven(self, symbol):
+        return self.state[symbol]["trigger"] == "tick"
+
+    def due(self, now):
+        """Symbols whose next event has arrived."""
+        if self._report_start is None:
+            self._report_start = now
+        return [symbol for symbol, state in self.state.items() if state["next"] <= now]
+
+    def next_wake(self):
+        return min(state["next"] for state in self.state.values())
+
+    @property
+    def server_offset(self):
+        """Trade server clock minus local clock."""
+        return self.server_clock.offset
+
+    def observe_server_time(self, symbol, server_time, now):
+        """Track the server clock offset from a symbol's tick time."""
+        self.server_clock.observe(symbol, server_time, now)
+
+    def tick_changed(self, symbol, tick, now):
+        """Whether a tick-driven symbol has a new tick; if not, schedule the next probe."""
+        state = self.state[symbol]
+        self.tick_probes += 1
+        changed = tick is None or tick.time_msc != state["last_msc"]
+        if tick is not None:
+            state["last_msc"] = tick.time_msc
+        if not changed:
+            state["next"] = self._grid(now, self.tick_poll_interval)
+        return changed
+
+    def evaluated(self, symbol, now, forming_time=None, has_positions=False, wake_at=None):
+        """Schedule a symbol's next event after it has been evaluated."""
+        state = self.state[symbol]
+        self.evaluations += 1
+        if state["trigger"] == "tick":
+            wake = self._grid(now, self.tick_poll_interval)
+        elif forming_time is None:
+            wake = now + self.poll_interval
+        else:
+            close = forming_time + state["bar_seconds"] - self.server_offset + self.bar_close_delay
+            if close > now:
+                state["misses"] = 0
+                wake = close
+            else:
+                # The new bar has not appeared yet (quiet market or closed session): back off
+                state["misses"] += 1
+                wake = now + min(self.poll_interval * 2 ** (state["misses"] - 1), state["bar_seconds"])
+        wake = min(wake, self._session_boundary(symbol, now))
+        if has_positions:
+            wake = min(wake, self._grid(now, self.manage_interval))
+        if wake_at is not None:
+            wake = min(wake, wake_at)
+        state["next"] = wake
+
+    def _grid(self, now, interval):
+        """First point of the `interval` grid after `now`, in phase with bar-close wakes, so the periodic
+        wakes of different symbols and the bar closes share wake-ups."""
+        phase = self.bar_close_delay
+        return (math.floor((now - phase) / interval) + 1) * interval + phase
+
+    def _session_boundary(self, symbol, now):
+        """Start of the next UTC hour at which the symbol enters or leaves its active hours."""
+        hours = self.securities[symbol]["active_hours"]
+        hour_start = now - now % 3600
+        hour = int(now // 3600) % 24
+        active = hour in hours
+        for ahead in range(1, 25):
+            if (((hour + ahead) % 24) in hours) != active:
+                return hour_start + ahead * 3600
+        return math.inf
+
+    def report(self, now):
+        """Log wake-ups and evaluations against what the fixed 1-second poll would have done (signed), then reset."""
+        if self._report_start is None:
+            return
+        elapsed = now - self._report_start
+        polled_wakeups = int(elapsed / self.poll_interval)
+        polled_evaluations = polled_wakeups * len(self.state)
+        event(log, logging.INFO, "Scheduler", rate_limit=False, wakeups=self.wakeups, evaluations=self.evaluations,
+              tick_probes=self.tick_probes, seconds=round(elapsed),
+              skipped_wakeups=polled_wakeups - self.wakeups,  # Negative when the scheduler woke more often
+              skipped_evaluations=polled_evaluations - self.evaluations)
+        self._report_start = now
+        self.wakeups = 0
+        self.evaluations = 0
+        self.tick_probes = 0
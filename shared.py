@@ -0,0 +1,230 @@
+"""Shared-memory state of a supervised deployment (supervisor.py).
+
+SharedBars holds the latest bars of every (security, timeframe) the deployment trades,
+written by the single feed process and read by every worker through SharedTerminal,
+so N workers cost the terminal one copy_rates call per series instead of N. Each slot
+is a seqlock: the writer makes the sequence odd, copies, and makes it even again, and a
+reader retries, yielding between attempts, when the sequence was odd or moved while it copied.
+
+RiskBoard is a table with one row per process. Each worker writes only its own row
+(heartbeat, open positions, margin, equity, and daily trade counts and last trade times
+per security) and reads the other rows of its account, so limits hold across the shards
+of an account and the counters and cooldowns survive a worker restart. A dead worker's
+row keeps its last values until the restarted worker publishes again: its positions are
+still open at the broker. Single float64 writes are not torn on the 64-bit platforms
+MetaTrader5 runs on, so rows need no lock.
+"""
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from bars import RATES_DTYPE, timeframe_seconds
+
+SEQ, COUNT, FETCHED_AT, EXPIRES = range(4)  # Slot header fields of SharedBars
+
+
+class SharedBars:
+    """The newest `capacity` bars per (security, timeframe) key, in one shared-memory block."""
+
+    def __init__(self, keys, capacity, name=None, create=False):
+        self.keys = [tuple(key) for key in keys]
+        self.index = {key: i for i, key in enumerate(self.keys)}
+        self.capacity = capacity
+        headers = 4 * 8 * len(self.keys)
+        size = headers + len(self.keys) * capacity * RATES_DTYPE.itemsize
+        self.memory = shared_memory.SharedMemory(name=name, create=create, size=size if create else 0)
+        self.headers = np.ndarray((len(self.keys), 4), dtype=np.float64, buffer=self.memory.buf)
+        self.bars = np.ndarray((len(self.keys), capacity), dtype=RATES_DTYPE, buffer=self.memory.buf, offset=headers)
+        if create:
+            self.headers[:] = 0.0
+
+    @classmethod
+    def create(cls, keys, capacity):
+        return cls(keys, capacity, create=True)
+
+    @property
+    def name(self):
+        return self.memory.name
+
+    def publish(self, key, rates, expires, now=None):
+        """Replace a slot with `rates` (oldest first); `expires` is when the forming bar closes, in time.time()."""
+        i = self.index[key]
+        rates = rates[-self.capacity:]
+        header = self.headers[i]
+        header[SEQ] += 1  # Odd: readers retry
+        self.bars[i, :len(rates)] = rates
+        header[COUNT] = len(rates)
+        header[FETCHED_AT] = time.time() if now is None else now
+        header[EXPIRES] = expires
+        header[SEQ] += 1
+
+    def read(self, key, start_pos, count, max_age, now=None):
+        """copy_rates_from_pos() from a slot, or None when the slot is missing, stale or its bar has closed."""
+        i = self.index.get(key)
+        if i is None:
+            return None
+        now = time.time() if now is None else now
+        header = self.headers[i]
+        for attempt in range(100):
+            if attempt:
+                time.sleep(0 if attempt < 10 else 1e-4)  # Yield to the writer, then back off instead of spinning
+            seq = header[SEQ]
+            if seq % 2:
+                continue
+            size = int(header[COUNT])
+            if not size or now - header[FETCHED_AT] > max_age or now >= header[EXPIRES]:
+                return None
+            end = size - start_pos
+            if end <= 0:
+                return None
+            rates = self.bars[i, max(end - count, 0):end].copy()
+            if header[SEQ] == seq:
+                return rates
+        return None
+
+    def close(self, unlink=False):
+        del self.headers, self.bars  # Views must go before the mapping can close
+        self.memory.close()
+        if unlink:
+            self.memory.unlink()
+
+
+class SharedTerminal:
+    """Terminal wrapper serving copy_rates_from_pos() from SharedBars while the feed keeps them fresh.
+
+    Broker symbols are mapped back to security names with map_symbols() once they are
+    resolved; anything not shared or not fresh enough goes to the wrapped terminal.
+    """
+
+    def __init__(self, terminal, bars, max_age=2.0):
+        self._terminal = terminal
+        self._bars = bars
+        self._names = {}
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+
+    def __getattr__(self, name):
+        return getattr(self._terminal, name)
+
+    def map_symbols(self, names):
+        """Set the {broker symbol: security} mapping used to find a symbol's slot."""
+        self._names = dict(names)
+
+    def copy_rates_from_pos(self, symbol, timeframe, start_pos, count):
+        name = self._names.get(symbol)
+        if name is not None:
+            rates = self._bars.read((name, timeframe), start_pos, count, self.max_age)
+            if rates is not None:
+                self.hits += 1
+                return rates
+        self.misses += 1
+        return self._terminal.copy_rates_from_pos(symbol, timeframe, start_pos, count)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
+
+
+def feed_expiry(rates, timeframe, server_offset):
+    """time.time() at which the forming (last) bar of `rates` closes."""
+    return float(rates['time'][-1]) + timeframe_seconds(timeframe) - server_offset
+
+
+ACCOUNT, PID, HEARTBEAT, POSITIONS, MARGIN, EQUITY, DAY = range(7)  # RiskBoard columns before the per-security ones
+
+
+class RiskBoard:
+    """Per-process rows of open risk, daily trade counts, last trade times and open securities, in one shared-memory block."""
+
+    def __init__(self, rows, names, name=None, create=False):
+        self.names = list(names)
+        self.columns = {symbol: DAY + 1 + k for k, symbol in enumerate(self.names)}  # Trade counts
+        self.time_columns = {symbol: DAY + 1 + len(self.names) + k for k, symbol in enumerate(self.names)}
+        self.open_columns = {symbol: DAY + 1 + 2 * len(self.names) + k for k, symbol in enumerate(self.names)}
+        shape = (rows, DAY + 1 + 3 * len(self.names))
+        size = int(np.prod(shape)) * 8
+        self.memory = shared_memory.SharedMemory(name=name, create=create, size=size if create else 0)
+        self.table = np.ndarray(shape, dtype=np.float64, buffer=self.memory.buf)
+        if create:
+            self.table[:] = 0.0
+            self.table[:, ACCOUNT] = -1
+
+    @classmethod
+    def create(cls, rows, names):
+        return cls(rows, names, create=True)
+
+    @property
+    def name(self):
+        return self.memory.name
+
+    def register(self, row, account, pid):
+        self.table[row, ACCOUNT] = account
+        self.table[row, PID] = pid
+        self.table[row, HEARTBEAT] = time.time()
+
+    def beat(self, row):
+        self.table[row, HEARTBEAT] = time.time()
+
+    def heartbeat(self, row):
+        return float(self.table[row, HEARTBEAT])
+
+    def publish(self, row, positions, margin, equity, trade_counts, day, trade_times, open_symbols=()):
+        """Write a worker's open positions, margin, equity, today's trade count and last trade time per security,
+        and the securities it has a position open in."""
+        values = self.table[row]
+        values[HEARTBEAT] = time.time()
+        values[POSITIONS] = positions
+        values[MARGIN] = margin
+        values[EQUITY] = equity
+        for symbol, count in trade_counts.items():
+            values[self.columns[symbol]] = count
+        for symbol, trade_time in trade_times.items():
+            values[self.time_columns[symbol]] = trade_time
+        for symbol, column in self.open_columns.items():
+            values[column] = symbol in open_symbols
+        values[DAY] = day.toordinal()
+
+    def trade_counts(self, row, day):
+        """A row's daily trade counts if they were written on `day` (so a restarted worker resumes them), else {}."""
+        values = self.table[row]
+        if values[DAY] != day.toordinal():
+            return {}
+        return {symbol: int(values[column]) for symbol, column in self.columns.items() if values[column]}
+
+    def trade_times(self, row):
+        """A row's last trade time per security, so a restarted worker keeps its cooldowns; untraded ones omitted."""
+        values = self.table[row]
+        return {symbol: float(values[column]) for symbol, column in self.time_columns.items() if values[column]}
+
+    def account_totals(self, row):
+        """(open positions, margin) of the other rows on the same account as `row`."""
+        others = self.table[(self.table[:, ACCOUNT] == self.table[row, ACCOUNT])
+                            & (np.arange(len(self.table)) != row)]
+        return int(others[:, POSITIONS].sum()), float(others[:, MARGIN].sum())
+
+    def account_open(self, row):
+        """Securities with a position open on the other rows of the same account as `row`."""
+        others = self.table[(self.table[:, ACCOUNT] == self.table[row, ACCOUNT])
+                            & (np.arange(len(self.table)) != row)]
+        return {symbol for symbol, column in self.open_columns.items() if others[:, column].any()}
+
+    def totals(self, accounts):
+        """{account name: {positions, margin, equity, trades}} summed over each account's rows, trades of its latest day."""
+        totals = {}
+        for k, name in enumerate(accounts):
+            rows = self.table[self.table[:, ACCOUNT] == k]
+            today = rows[rows[:, DAY] == rows[:, DAY].max()] if len(rows) else rows
+            totals[name] = {
+                "positions": int(rows[:, POSITIONS].sum()),
+                "margin": round(float(rows[:, MARGIN].sum()), 2),
+                "equity": round(float(rows[:, EQUITY].max()), 2) if len(rows) else 0.0,  # Every shard sees the account's equity
+                "trades": int(today[:, DAY + 1:DAY + 1 + len(self.names)].sum()),
+            }
+        return totals
+
+    def close(self, unlink=False):
+        del self.table
+        self.memory.close()
+        if unlink:
+            self.memory.unlink()
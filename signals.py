@@ -0,0 +1,180 @@
+import numpy as np
+
+from config import min_atr, rrr
+from indicators import lookback
+
+# Order sides, equal to mt5.ORDER_TYPE_BUY / mt5.ORDER_TYPE_SELL
+BUY = 0
+SELL = 1
+
+# Thresholds used by the rules; the optimizer sweeps over copies of this dict
+DEFAULT_PARAMS = {
+    "rsi_buy": 30, "rsi_buy_strong": 20,  # RSI oversold, and the stronger level outside active hours
+    "rsi_sell": 70, "rsi_sell_strong": 80,
+    "stoch_buy": 20, "stoch_buy_strong": 10,
+    "stoch_sell": 80, "stoch_sell_strong": 90,
+    "band_down": 0.999,  # mean_reversion: price below the lower band by this factor outside active hours
+    "breakout_up": 1.001,  # breakout: price above high_20 by this factor outside active hours
+    "macd_margin": 0.0005,
+    "adx_trend": 20, "adx_trend_strong": 30,
+    "atr_surge": 1.5,  # volatility_breakout: ATR over its mean by this factor outside active hours
+    "z_buy": -2, "z_buy_strong": -3,
+    "min_atr": min_atr,
+    "rrr": rrr,
+}
+
+# Every rule takes the indicator values, the current price, whether the symbol is in its
+# active hours and the thresholds, and returns (buy, sell). Values may be scalars (live
+# loop, from IndicatorEngine.latest()) or NumPy columns (backtest); only &, | and
+# comparisons are used so both give the same answer. Outside active hours a stronger
+# signal is required.
+
+
+class Strategy:
+    """An entry rule, the indicators it reads, its stop distances and what triggers an evaluation.
+
+    `indicators` are IndicatorEngine.latest() keys; the data layer computes only their
+    groups over `lookback` bars, together with the keys the stops read and 'atr' for the
+    min_atr volatility filter when `volatility_filter` is set.
+    """
+
+    def __init__(self, name, rule, indicators, stops, trigger="bar", volatility_filter=True):
+        self.name = name
+        self.rule = rule
+        self.volatility_filter = volatility_filter
+        filtered = {"atr"} if volatility_filter else set()
+        self.indicators = tuple(sorted(set(indicators) | set(stops.indicators) | filtered))
+        self.lookback = lookback(self.indicators)
+        self.stops = stops
+        self.trigger = trigger  # "bar": evaluate on bar close, "tick": on every new tick
+
+    def entries(self, ind, price, active, params=DEFAULT_PARAMS):
+        """(buy, sell) for the indicator values at `price`."""
+        return self.rule(ind, price, active, params)
+
+    def stop_levels(self, ind, price, side, pip_multiplier, rrr):
+        """Return (sl, tp) for an entry at `price`."""
+        sl_distance, tp_distance = self.stops(ind, pip_multiplier, rrr)
+        if side == BUY:
+            return price - sl_distance, price + tp_distance
+        return price + sl_distance, price - tp_distance
+
+    def trail_distance(self, ind, pip_multiplier, rrr):
+        """Distance a trailing stop keeps from the price: ATR, or the stop loss distance without it."""
+        if "atr" in self.indicators:
+            return ind['atr']
+        return self.stops(ind, pip_multiplier, rrr)[0]
+
+
+STRATEGIES = {}  # The "strategy" names used in config.securities -> Strategy
+
+
+def _reads(*indicators):
+    """Decorator recording the latest() keys a stops function reads."""
+    def mark(stops):
+        stops.indicators = indicators
+        return stops
+    return mark
+
+
+@_reads("atr")
+def _atr_pip_stops(ind, pip_multiplier, rrr):
+    stop_loss_pips = ind['atr'] * 100
+    take_profit_pips = stop_loss_pips * rrr
+    return stop_loss_pips * pip_multiplier, take_profit_pips * pip_multiplier
+
+
+def _atr_stops(sl_factor, tp_factor):
+    """Stops at fixed multiples of ATR in pips, ignoring rrr."""
+    @_reads("atr")
+    def stops(ind, pip_multiplier, rrr):
+        return ind['atr'] * sl_factor * pip_multiplier, ind['atr'] * tp_factor * pip_multiplier
+    return stops
+
+
+@_reads("high_20", "low_20")
+def _range_stops(ind, pip_multiplier, rrr):
+    breakout_range = ind['high_20'] - ind['low_20']
+    return breakout_range * 0.5, breakout_range * 0.5 * rrr
+
+
+def register(name, indicators, stops=_atr_pip_stops, trigger="bar", volatility_filter=True):
+    """Decorator adding an entry rule to STRATEGIES under `name`."""
+    def add(rule):
+        STRATEGIES[name] = Strategy(name, rule, indicators, stops, trigger, volatility_filter)
+        return rule
+    return add
+
+
+def _divide(numerator, denominator):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.true_divide(numerator, denominator)
+
+
+@register("mean_reversion", ("bb_lower", "ema200"))
+def mean_reversion(ind, price, active, p=DEFAULT_PARAMS):  # EURUSD
+    buy = (price < ind['bb_lower']) & (price > ind['ema200']) & (active | (price < ind['bb_lower'] * p['band_down']))
+    return buy, False
+
+
+def _oversold(ind, active, p):
+    rsi, stoch = ind['rsi'], ind['stoch']
+    return ((rsi < p['rsi_buy']) & (stoch < p['stoch_buy'])
+            & (active | ((rsi < p['rsi_buy_strong']) & (stoch < p['stoch_buy_strong']))))
+
+
+@register("scalping", ("rsi", "stoch"), _atr_stops(0.5, 1.0), trigger="tick")  # Tight SL/TP
+def scalping(ind, price, active, p=DEFAULT_PARAMS):  # USDJPY
+    rsi, stoch = ind['rsi'], ind['stoch']
+    sell = ((rsi > p['rsi_sell']) & (stoch > p['stoch_sell'])
+            & (active | ((rsi > p['rsi_sell_strong']) & (stoch > p['stoch_sell_strong']))))
+    return _oversold(ind, active, p), sell
+
+
+@register("momentum", ("macd", "macd_signal", "macd_prev", "macd_signal_prev"))
+def momentum(ind, price, active, p=DEFAULT_PARAMS):  # GBPUSD
+    crossed = (ind['macd'] > ind['macd_signal']) & (ind['macd_prev'] <= ind['macd_signal_prev'])
+    buy = crossed & (active | ((ind['macd'] - ind['macd_signal']) > p['macd_margin']))
+    return buy, False
+
+
+@register("breakout", ("high_20", "low_20"), _range_stops, volatility_filter=False)  # Range stops, no ATR
+def breakout(ind, price, active, p=DEFAULT_PARAMS):  # USDCHF
+    buy = (price > ind['high_20']) & (active | (price > ind['high_20'] * p['breakout_up']))
+    return buy, False
+
+
+@register("trend_following", ("ema10", "ema50", "adx"))
+def trend_following(ind, price, active, p=DEFAULT_PARAMS):  # USDCAD
+    buy = (ind['ema10'] > ind['ema50']) & (ind['adx'] > p['adx_trend']) & (active | (ind['adx'] > p['adx_trend_strong']))
+    return buy, False
+
+
+@register("rsi_mean_reversion", ("rsi", "ema200"))
+def rsi_mean_reversion(ind, price, active, p=DEFAULT_PARAMS):  # AUDUSD
+    buy = (ind['rsi'] < p['rsi_buy']) & (price > ind['ema200']) & (active | (ind['rsi'] < p['rsi_buy_strong']))
+    return buy, False
+
+
+@register("volatility_breakout", ("high_20", "atr", "atr_mean"))
+def volatility_breakout(ind, price, active, p=DEFAULT_PARAMS):  # NZDUSD
+    buy = ((price > ind['high_20']) & (ind['atr'] > ind['atr_mean'])
+           & (active | (ind['atr'] > ind['atr_mean'] * p['atr_surge'])))
+    return buy, False
+
+
+@register("hft_scalping", ("rsi", "stoch"), _atr_stops(0.3, 0.6), trigger="tick")  # Very tight SL/TP
+def hft_scalping(ind, price, active, p=DEFAULT_PARAMS):  # GBPJPY
+    return _oversold(ind, active, p), False
+
+
+@register("stat_arb", ("close_mean50", "close_std50"))
+def stat_arb(ind, price, active, p=DEFAULT_PARAMS):  # USDINR
+    z_score = _divide(price - ind['close_mean50'], ind['close_std50'])
+    buy = (z_score < p['z_buy']) & (active | (z_score < p['z_buy_strong']))  # Buy if price is 2 std devs below mean
+    return buy, False
+
+
+def pip_size(symbol):
+    return 0.01 if "JPY" in symbol else 0.0001
+
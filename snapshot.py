@@ -0,0 +1,66 @@
+import threading
+
+
+class BrokerSnapshot:
+    """Account, position and tick state read from the terminal at most once per loop iteration.
+
+    Values are fetched lazily on first use. Call invalidate() after any order_send so
+    the next read sees the broker's updated account and positions. Safe to share
+    between the symbol worker threads.
+    """
+
+    def __init__(self, terminal):
+        self.terminal = terminal
+        self._lock = threading.RLock()
+        self._account = None
+        self._positions = None
+        self._by_symbol = None
+        self._by_ticket = None
+        self._ticks = {}
+
+    def invalidate(self):
+        """Forget everything fetched so far."""
+        with self._lock:
+            self._account = None
+            self._positions = None
+            self._by_symbol = None
+            self._by_ticket = None
+            self._ticks = {}
+
+    @property
+    def account(self):
+        with self._lock:
+            if self._account is None:
+                self._account = self.terminal.account_info()
+            return self._account
+
+    @property
+    def positions(self):
+        with self._lock:
+            if self._positions is None:
+                positions = self.terminal.positions_get() or ()
+                self._by_symbol = {}
+                self._by_ticket = {}
+                for pos in positions:
+                    self._by_symbol.setdefault(pos.symbol, []).append(pos)
+                    self._by_ticket[pos.ticket] = pos
+                self._positions = positions
+            return self._positions
+
+    def positions_for(self, symbol):
+        """Open positions on a broker symbol name."""
+        with self._lock:
+            self.positions
+            return self._by_symbol.get(symbol, [])
+
+    def position(self, ticket):
+        with self._lock:
+            self.positions
+            return self._by_ticket.get(ticket)
+
+    def tick(self, symbol):
+        # Ticks are per symbol and only read by that symbol's worker, so no lock is needed
+        tick = self._ticks.get(symbol)
+        if tick is None:
+            tick = self._ticks[symbol] = self.terminal.symbol_info_tick(symbol)
+        return tick
@@ -0,0 +1,355 @@
+"""Supervisor mode: several accounts and symbol sets run as one deployment of worker processes.
+
+Usage:
+    python supervisor.py deployment.json
+    python supervisor.py deployment.json --metrics-port 9100
+    python supervisor.py deployment.json --replay session.npz      # every shard on its own FakeTerminal
+
+deployment.json lists the accounts, the securities each trades (keys of config.securities,
+default all) and how many worker processes ("shards") split them:
+
+    {
+      "feed": "main",
+      "accounts": [
+        {"name": "main", "login": 240065549, "password_env": "FOREX9_MAIN_PASSWORD",
+         "server": "Exness-MT5Trial6", "terminal": "C:/MT5/main/terminal64.exe",
+         "securities": ["EURUSD", "USDJPY", "GBPUSD", "USDCHF", "GBPJPY"], "shards": 2},
+        {"name": "second", "login": 240065550, "password_env": "FOREX9_SECOND_PASSWORD",
+         "server": "Exness-MT5Trial6", "securities": ["AUDUSD", "NZDUSD", "USDCAD", "USDINR"]}
+      ]
+    }
+
+Each shard is forex9's loop in its own process, on its own terminal connection, trading a
+subset of its account's securities: partition() balances the expected evaluations per
+hour and keeps correlated_pairs in the same shard, so adding pairs adds processes rather
+than lengthening anyone's decision cycle. The "feed" account's process (set "feed" to
+null to disable it) refreshes the bars of every security traded on its server once a
+second into shared memory, and the workers on that server read them from there instead
+of asking their terminal (shared.py). Every worker publishes its open positions, margin,
+daily trade counts and the securities it holds to a shared RiskBoard and checks
+max_open_positions and max_margin_usage against its whole account; its correlation
+matrix covers all of its account's securities, so the correlation filter also blocks on
+the positions of the account's other shards. The supervisor logs the account totals.
+
+A worker or feed that exits or stops updating its heartbeat is restarted after a backoff
+(1 s doubling to 60 s, reset once it has run for a minute) without touching the others,
+and picks its daily trade counts and cooldowns back up from the board; until it publishes
+again, its row keeps counting the positions it left open. A replay gives each shard its
+own simulated account and runs without the feed.
+"""
+import argparse
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import sys
+import time
+from collections import namedtuple
+
+import forex9
+from bars import BarCache, timeframe_seconds
+from config import correlated_pairs, correlation_timeframe, correlation_window, securities, symbol_cache
+from indicators import WINDOW
+from logs import event, setup_logging
+from metrics import metrics
+from replay import FakeTerminal
+from scheduler import ServerClock
+from shared import RiskBoard, SharedBars, SharedTerminal, feed_expiry
+from signals import STRATEGIES
+from terminal import CountingTerminal
+
+log = logging.getLogger("supervisor")
+DEBUG, INFO, WARNING, ERROR = logging.DEBUG, logging.INFO, logging.WARNING, logging.ERROR
+
+Account = namedtuple("Account", "name login password server terminal securities shards")
+Shard = namedtuple("Shard", "name account securities")
+
+FEED_INTERVAL = 1.0  # Seconds between feed refreshes of every shared series
+BAR_CAPACITY = max(WINDOW, correlation_window + 2)  # Bars per shared series: the longest any BarCache asks for
+
+
+def load_deployment(path):
+    """(accounts, feed account name or None) from a deployment file; passwords may come from the environment."""
+    with open(path) as handle:
+        spec = json.load(handle)
+    accounts = []
+    for entry in spec["accounts"]:
+        names = entry.get("securities") or list(securities)
+        unknown = [name for name in names if name not in securities]
+        if unknown:
+            raise ValueError(f"account {entry['name']}: unknown securities {unknown}")
+        password = entry.get("password") or os.environ.get(entry.get("password_env", ""), "")
+        accounts.append(Account(entry["name"], int(entry["login"]), password, entry["server"], entry.get("terminal"),
+                                names, max(1, int(entry.get("shards", 1)))))
+    feed = spec.get("feed", accounts[0].name if accounts else None)
+    if feed is not None and feed not in {account.name for account in accounts}:
+        raise ValueError(f"feed account {feed} is not listed")
+    return accounts, feed
+
+
+def evaluations_per_hour(name):
+    """Expected evaluations per hour of a security: one per bar, or about one per second when tick-driven."""
+    config = securities[name]
+    trigger = config.get("trigger") or STRATEGIES[config["strategy"]].trigger
+    return 3600.0 if trigger == "tick" else 3600.0 / timeframe_seconds(config["timeframe"])
+
+
+def partition(names, shards):
+    """Split securities into at most `shards` lists of similar load, keeping correlated_pairs in one list."""
+    group_of = {name: {name} for name in names}
+    for name in names:
+        for other in correlated_pairs.get(name, ()):
+            if other in group_of and group_of[other] is not group_of[name]:
+                merged = group_of[name] | group_of[other]
+                for member in merged:
+                    group_of[member] = merged
+    groups = {id(group): group for group in group_of.values()}.values()
+    groups = sorted(groups, key=lambda group: -sum(evaluations_per_hour(name) for name in group))
+    loads = [[0.0, []] for _ in range(min(shards, len(names)))]
+    for group in groups:
+        # Heaviest group first onto the least loaded shard
+        target = min(loads, key=lambda load: load[0])
+        target[0] += sum(evaluations_per_hour(name) for name in group)
+        target[1].extend(group)
+    order = {name: k for k, name in enumerate(names)}
+    return [sorted(members, key=order.get) for _, members in loads if members]
+
+
+def plan(accounts):
+    """Every shard of every account, named account/k."""
+    shards = []
+    for account in accounts:
+        for k, names in enumerate(partition(account.securities, account.shards)):
+            shards.append(Shard(f"{account.name}/{k}", account, names))
+    return shards
+
+
+def _login(account):
+    """Point forex9's connection settings at an account."""
+    forex9.account, forex9.password, forex9.server = account.login, account.password, account.server
+    forex9.terminal_path = account.terminal
+
+
+def run_feed(account, keys, bars_name, board_name, board_rows, board_names, row, options):
+    """Feed process: refresh the shared series from the feed account's terminal once a second."""
+    setup_logging(options["log_level"], options["log_burst"], options["log_interval"], process_names=True)
+    if forex9.MetaTrader5 is None:
+        event(log, ERROR, "The MetaTrader5 package is not installed")
+        sys.exit(1)
+    bars = SharedBars(keys, BAR_CAPACITY, name=bars_name)
+    board = RiskBoard(board_rows, board_names, name=board_name)
+    _login(account)
+    forex9.select_securities({name for name, _ in keys})
+    forex9.mt5 = mt5 = CountingTerminal(forex9.MetaTrader5)
+    try:
+        if not forex9.connect() or not forex9.init_symbols(symbol_cache):
+            sys.exit(1)
+        caches = {(name, timeframe): BarCache(mt5, securities[name]["symbol"], timeframe, BAR_CAPACITY)
+                  for name, timeframe in keys}
+        server_clock = ServerClock()
+        turns = itertools.cycle(sorted({name for name, _ in keys}))
+        rounds, busy, last_report = 0, 0.0, time.time()
+        while True:
+            started = time.time()
+            board.beat(row)
+            # One tick per round, taking the securities in turn: a quiet one's old tick cannot move the offset
+            name = next(turns)
+            tick = mt5.symbol_info_tick(securities[name]["symbol"])
+            if tick:
+                server_clock.observe(name, tick.time, started)
+            for (name, timeframe), cache in caches.items():
+                if cache.refresh():
+                    rates = cache.last(cache.size)
+                    bars.publish((name, timeframe), rates, feed_expiry(rates, timeframe, server_clock.offset))
+            rounds += 1
+            busy += time.time() - started
+            if started - last_report >= forex9.stats_interval:
+                event(log, INFO, "Feed", rate_limit=False, series=len(caches), rounds=rounds,
+                      mean_ms=busy / rounds * 1e3, calls=mt5.total_calls)
+                rounds, busy, last_report = 0, 0.0, started
+            time.sleep(max(FEED_INTERVAL - (time.time() - started), 0.0))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        mt5.shutdown()
+
+
+def run_worker(shard, keys, bars_name, board_name, board_rows, board_names, row, options):
+    """Worker process: forex9's loop over one shard's securities."""
+    rate_limit = setup_logging(options["log_level"], options["log_burst"], options["log_interval"], process_names=True)
+    _login(shard.account)
+    forex9.select_securities(shard.securities, shard.account.securities)
+    forex9.board, forex9.board_row = RiskBoard(board_rows, board_names, name=board_name), row
+    replay = options["replay"]
+    if replay:
+        terminal = FakeTerminal(replay, balance=options["balance"])
+        forex9.clock = rate_limit.clock = terminal.clock
+    elif forex9.MetaTrader5 is None:
+        event(log, ERROR, "The MetaTrader5 package is not installed; use --replay to run a recorded session")
+        sys.exit(1)
+    else:
+        terminal = forex9.MetaTrader5
+    shared = None
+    if bars_name:
+        shared = forex9.shared_bars = SharedTerminal(terminal, SharedBars(keys, BAR_CAPACITY, name=bars_name),
+                                                     options["max_age"])
+    forex9.setup_terminal(shared or terminal, rate_limit, synchronous=bool(replay))
+    started = time.perf_counter()
+    try:
+        if not forex9.start(None if replay else symbol_cache):
+            sys.exit(1)
+        if shared is not None:
+            shared.map_symbols({config["symbol"]: name for name, config in forex9.correlation_securities.items()})
+        forex9.run(until=terminal.end_time if replay else None, workers=1 if replay else None)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        forex9.mt5.shutdown()
+        if replay:
+            event(log, INFO, "Replay finished", rate_limit=False, securities=",".join(shard.securities),
+                  elapsed_s=round(time.perf_counter() - started, 1), loops=forex9.total_loops, **terminal.report())
+
+
+class Supervisor:
+    """Runs the feed and one process per shard, restarting any that exit or stop beating."""
+
+    def __init__(self, accounts, feed=None, options=None, hang_timeout=3 * forex9.stats_interval,
+                 max_backoff=60.0, stable_seconds=60.0):
+        self.accounts = accounts
+        self.options = options or {}
+        self.replay = self.options.get("replay")
+        self.hang_timeout = hang_timeout
+        self.max_backoff = max_backoff
+        self.stable_seconds = stable_seconds  # A process that ran this long starts its backoff over
+        self.shards = plan(accounts)
+        feed_account = next((account for account in accounts if account.name == feed), None)
+        if self.replay:
+            feed_account = None  # Each replayed shard has its own clock
+        # The feed serves the accounts on its own server; bar data differs between brokers
+        shared = [shard for shard in self.shards
+                  if feed_account is not None and shard.account.server == feed_account.server]
+        self.keys = sorted({(name, timeframe) for shard in shared for name in shard.securities
+                            for timeframe in (securities[name]["timeframe"], correlation_timeframe)})
+        self.bars = SharedBars.create(self.keys, BAR_CAPACITY) if self.keys else None
+        self.board = RiskBoard.create(len(self.shards) + 1, list(securities))
+        account_index = {account.name: k for k, account in enumerate(accounts)}
+        self.processes = []
+        for row, shard in enumerate(self.shards):
+            self.processes.append(self._entry(
+                shard.name, row, account_index[shard.account.name], run_worker,
+                (shard, self.keys, self.bars.name if shard in shared else None),
+                {"securities": ",".join(shard.securities), "shared_bars": shard in shared}))
+        if self.bars is not None:
+            self.processes.append(self._entry("feed", len(self.shards), -1, run_feed,
+                                              (feed_account, self.keys, self.bars.name), {"series": len(self.keys)}))
+
+    def _entry(self, name, row, account, target, args, detail):
+        return {"name": name, "row": row, "account": account, "target": target, "args": args, "detail": detail,
+                "process": None, "started": 0.0, "restart_at": 0.0, "failures": 0, "restarts": 0, "done": False}
+
+    def _spawn(self, entry):
+        args = entry["args"] + (self.board.name, len(self.board.table), self.board.names, entry["row"], self.options)
+        process = multiprocessing.Process(target=entry["target"], args=args, name=entry["name"], daemon=True)
+        self.board.register(entry["row"], entry["account"], 0)  # Heartbeat from now until the process beats itself
+        process.start()
+        self.board.register(entry["row"], entry["account"], process.pid)
+        entry.update(process=process, started=time.time())
+        event(log, INFO, "Process started", worker=entry["name"], pid=process.pid, **entry["detail"])
+
+    def _check(self, entry, now):
+        process = entry["process"]
+        if entry["done"]:
+            return
+        if process is None:
+            if now >= entry["restart_at"]:
+                self._spawn(entry)
+            return
+        if process.is_alive():
+            if now - self.board.heartbeat(entry["row"]) > self.hang_timeout:
+                event(log, ERROR, "Process stalled, killing", worker=entry["name"], pid=process.pid,
+                      silent_s=round(now - self.board.heartbeat(entry["row"])))
+                process.kill()
+            return
+        process.join()
+        if self.replay and process.exitcode == 0:
+            entry["done"] = True
+            return
+        if now - entry["started"] >= self.stable_seconds:
+            entry["failures"] = 0
+        delay = min(2.0 ** entry["failures"], self.max_backoff)
+        entry["failures"] += 1
+        entry["restarts"] += 1
+        # The row keeps counting the dead worker's positions, still open at the broker, until its restart publishes
+        entry.update(process=None, restart_at=now + delay)
+        metrics.inc("worker_restarts", worker=entry["name"])
+        event(log, WARNING, "Process exited, restarting", worker=entry["name"], exitcode=process.exitcode,
+              delay_s=delay)
+
+    def report(self):
+        for name, totals in self.board.totals([account.name for account in self.accounts]).items():
+            event(log, INFO, "Account", rate_limit=False, account=name, **totals)
+        event(log, INFO, "Processes", rate_limit=False,
+              **{entry["name"]: entry["restarts"] for entry in self.processes})
+
+    def run(self):
+        """Start everything and supervise until stopped, or until every replayed shard has finished."""
+        last_report = time.time()
+        while not all(entry["done"] for entry in self.processes):
+            now = time.time()
+            for entry in self.processes:
+                self._check(entry, now)
+            if now - last_report >= forex9.stats_interval:
+                self.report()
+                last_report = now
+            time.sleep(1.0)
+        self.report()
+
+    def stop(self):
+        for entry in self.processes:
+            if entry["process"] is not None and entry["process"].is_alive():
+                entry["process"].terminate()
+        for entry in self.processes:
+            if entry["process"] is not None:
+                entry["process"].join(5)
+                if entry["process"].is_alive():
+                    entry["process"].kill()
+        if self.bars is not None:
+            self.bars.close(unlink=True)
+        self.board.close(unlink=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("deployment", help="JSON file listing the accounts and their securities")
+    parser.add_argument("--replay", metavar="PATH", help="run every shard against a recorded session")
+    parser.add_argument("--balance", type=float, help="starting balance per shard for a replay")
+    parser.add_argument("--max-age", type=float, default=2.0,
+                        help="seconds after which a worker fetches bars itself instead of using the feed's")
+    parser.add_argument("--log-level", default="INFO")
+    parser.add_argument("--log-burst", type=int, default=5)
+    parser.add_argument("--log-interval", type=float, default=60.0)
+    parser.add_argument("--metrics-port", type=int, help="serve the supervisor's metrics (restarts) on PORT")
+    args = parser.parse_args()
+    setup_logging(args.log_level, args.log_burst, args.log_interval, process_names=True)
+
+    accounts, feed = load_deployment(args.deployment)
+    options = {"replay": args.replay, "balance": args.balance, "max_age": args.max_age, "log_level": args.log_level,
+               "log_burst": args.log_burst, "log_interval": args.log_interval}
+    supervisor = Supervisor(accounts, feed, options)
+    for shard in supervisor.shards:
+        event(log, INFO, "Shard", worker=shard.name, login=shard.account.login, securities=",".join(shard.securities))
+    if args.metrics_port:
+        metrics.serve(args.metrics_port)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        supervisor.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        supervisor.stop()
+
+
+if __name__ == "__main__":
+    main()
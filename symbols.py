@@ -0,0 +1,51 @@
+import json
+import os
+
+
+def resolve(names, broker_names, prefixes=("",), suffixes=("",)):
+    """Map each security name to the broker's symbol from one symbols_get() listing.
+
+    Candidates are prefix + name + suffix, tried in the order the rules are given, so
+    the first rule wins and a variant like EURUSDc is never picked ahead of EURUSDm by
+    accident. Returns ({name: broker name}, [names that matched no rule]).
+    """
+    index = set(broker_names)
+    resolved, missing = {}, []
+    for name in names:
+        for prefix in prefixes:
+            match = next((prefix + name + suffix for suffix in suffixes if prefix + name + suffix in index), None)
+            if match is not None:
+                resolved[name] = match
+                break
+        else:
+            missing.append(name)
+    return resolved, missing
+
+
+def load_cache(path, server):
+    """The {name: broker name} resolution cached for a trade server, or {}."""
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with open(path) as handle:
+            return json.load(handle).get(server, {})
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(path, server, resolved):
+    """Store a server's resolution, merged into its entry and keeping the other servers' entries."""
+    if not path:
+        return
+    cache = {}
+    if os.path.exists(path):
+        try:
+            with open(path) as handle:
+                cache = json.load(handle)
+        except (OSError, ValueError):
+            cache = {}
+    cache[server] = {**cache.get(server, {}), **resolved}  # Shards of one account resolve different names
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "w") as handle:
+        json.dump(cache, handle, indent=1, sort_keys=True)
+    os.replace(temporary, path)
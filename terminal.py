@@ -0,0 +1,44 @@
+import threading
+
+
+class CountingTerminal:
+    """Wraps the MetaTrader5 module and counts every function call made through it.
+
+    Constants (TIMEFRAME_*, ORDER_TYPE_*, ...) pass straight through. Counting is
+    thread-safe; the wrapped calls themselves are not serialized. With a metrics
+    registry every call's round trip is also observed as terminal_call{function=...}.
+    """
+
+    def __init__(self, module, metrics=None):
+        self._module = module
+        self._metrics = metrics
+        self._lock = threading.Lock()
+        self._wrapped = {}
+        self.calls = {}
+        self.total_calls = 0
+
+    def __getattr__(self, name):
+        wrapped = self._wrapped.get(name)
+        if wrapped is not None:
+            return wrapped
+        attr = getattr(self._module, name)
+        if not callable(attr):
+            return attr
+        metrics = self._metrics
+
+        def call(*args, **kwargs):
+            with self._lock:
+                self.calls[name] = self.calls.get(name, 0) + 1
+                self.total_calls += 1
+            if metrics is None:
+                return attr(*args, **kwargs)
+            with metrics.timer("terminal_call", function=name):
+                return attr(*args, **kwargs)
+
+        self._wrapped[name] = call
+        return call
+
+    def counts(self):
+        """Snapshot of the per-function call counters."""
+        with self._lock:
+            return dict(self.calls)
@@ -0,0 +1,115 @@
+import threading
+import time
+
+
+class TrailingStopManager:
+    """Desired trailing stop-loss per ticket, sent to the broker in rate-limited batches.
+
+    Symbol workers call update() with each open position and the current ATR; that only
+    recomputes the desired SL in memory. A modification is queued when the SL would
+    improve on the broker's by at least the minimum step: `min_step_atr` x ATR, and never
+    less than the symbol's trade_stops_level. flush() then sends the queued modifications,
+    largest improvement first, through a token bucket of `max_per_second` requests with
+    bursts of `burst`; whatever does not fit waits for the next flush and is replaced by
+    any newer level in the meantime.
+    """
+
+    def __init__(self, terminal, lock, clock=time, min_step_atr=0.25, max_per_second=5.0, burst=10):
+        self.terminal = terminal
+        self.order_lock = lock  # Shared with entry orders so sends stay serialized
+        self.clock = clock  # Anything with monotonic(); replays pass their simulated clock
+        self.min_step_atr = min_step_atr
+        self.max_per_second = max_per_second
+        self.burst = burst
+        self._lock = threading.Lock()
+        self._pending = {}  # Ticket -> (priority, request)
+        self._stops_level = {}  # Broker symbol -> trade_stops_level in price units
+        self._tokens = float(burst)
+        self._tokens_at = None
+        self.sent = 0
+        self.suppressed = 0  # Improvements smaller than the minimum step
+        self.too_close = 0  # Levels inside the symbol's stops level, which the broker would reject
+        self.deferred = 0  # Queued modifications that waited for a later flush
+        self.superseded = 0  # Queued modifications replaced by a newer level before sending
+
+    def _stops_distance(self, symbol):
+        distance = self._stops_level.get(symbol)
+        if distance is None:
+            info = self.terminal.symbol_info(symbol)
+            distance = info.trade_stops_level * info.point if info is not None else 0.0
+            self._stops_level[symbol] = distance
+        return distance
+
+    def update(self, position, atr_value):
+        """Recompute a position's trailed SL and queue a modification if it moved enough."""
+        if position.type == self.terminal.ORDER_TYPE_BUY:
+            new_sl = position.price_current - atr_value
+            improvement = new_sl - position.sl
+        elif position.type == self.terminal.ORDER_TYPE_SELL:
+            new_sl = position.price_current + atr_value
+            improvement = position.sl - new_sl
+        else:
+            return
+        stops_distance = self._stops_distance(position.symbol)
+        with self._lock:
+            if improvement <= 0:
+                self._pending.pop(position.ticket, None)
+                return
+            if improvement < max(self.min_step_atr * atr_value, stops_distance):
+                self.suppressed += 1
+                self._pending.pop(position.ticket, None)
+                return
+            if abs(position.price_current - new_sl) < stops_distance:
+                self.too_close += 1
+                self._pending.pop(position.ticket, None)
+                return
+            if position.ticket in self._pending:
+                self.superseded += 1
+            request = {
+                "action": self.terminal.TRADE_ACTION_SLTP,
+                "position": position.ticket,
+                "symbol": position.symbol,
+                "sl": new_sl,
+                "tp": position.tp,
+            }
+            self._pending[position.ticket] = (improvement / atr_value if atr_value else improvement, request)
+
+    def flush(self, snapshot):
+        """Send queued modifications within the rate limit; returns [(request, result)] for the ones sent."""
+        now = self.clock.monotonic()
+        with self._lock:
+            if self._tokens_at is not None:
+                self._tokens = min(float(self.burst), self._tokens + (now - self._tokens_at) * self.max_per_second)
+            self._tokens_at = now
+            if not self._pending:
+                return []
+            queued = sorted(self._pending.items(), key=lambda item: item[1][0], reverse=True)
+            batch = []
+            for ticket, (_, request) in queued:
+                if self._tokens < 1:
+                    break
+                del self._pending[ticket]
+                if snapshot.position(ticket) is None:
+                    continue  # Closed since it was queued
+                self._tokens -= 1
+                batch.append(request)
+            self.deferred += len(self._pending)
+
+        results = []
+        if batch:
+            with self.order_lock:
+                for request in batch:
+                    results.append((request, self.terminal.order_send(request)))
+                snapshot.invalidate()
+            self.sent += len(batch)
+        return results
+
+    def stats(self):
+        return {
+            "sent": self.sent,
+            "suppressed": self.suppressed,
+            "too_close": self.too_close,
+            "deferred": self.deferred,
+            "superseded": self.superseded,
+            "pending": len(self._pending),
+        }